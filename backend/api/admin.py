@@ -1,8 +1,77 @@
 from django.contrib import admin
-from .models import PasswordResetOTP
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from expense_tracker.profiling import summary
+from .models import OutboundEmail, PasswordResetOTP, RequestProfile
 
 @admin.register(PasswordResetOTP)
 class PasswordResetOTPAdmin(admin.ModelAdmin):
     list_display = ('user', 'otp', 'created_at', 'is_used')
     list_filter = ('is_used', 'created_at')
     search_fields = ('user__email', 'user__username')
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'sent_at')
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'queries', 'user', 'trigger')
+    list_filter = ('trigger', 'route', 'method', 'created_at')
+    search_fields = ('path', 'user__username')
+    list_select_related = ('user',)
+    exclude = ('stats', 'stacks')
+    readonly_fields = (
+        'created_at', 'method', 'path', 'route', 'user', 'status_code', 'trigger',
+        'duration_ms', 'db_ms', 'queries', 'downloads', 'top_functions'
+    )
+
+    def get_queryset(self, request):
+        # Only the change page and downloads read the profile itself.
+        return super().get_queryset(request).defer('stats', 'stacks')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download),
+                name='api_requestprofile_download'
+            ),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind == 'prof':
+            response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+            filename = f'profile-{pk}.prof'
+        elif kind == 'collapsed':
+            response = HttpResponse(profile.stacks, content_type='text/plain; charset=utf-8')
+            filename = f'profile-{pk}.collapsed.txt'
+        else:
+            return HttpResponse(status=404)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @admin.display(description='Downloads')
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">.prof (pstats, snakeviz)</a> &middot; <a href="{}">collapsed stacks (flamegraph.pl, speedscope)</a>',
+            reverse('admin:api_requestprofile_download', args=[obj.pk, 'prof']),
+            reverse('admin:api_requestprofile_download', args=[obj.pk, 'collapsed']),
+        )
+
+    @admin.display(description='Top functions')
+    def top_functions(self, obj):
+        return format_html('<pre style="font-size: 11px">{}</pre>', summary(bytes(obj.stats)))
@@ -0,0 +1,56 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.outbox import process_outbox, prune_outbox
+
+class Command(BaseCommand):
+    help = 'Sends queued outbound email, polling for new messages until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.OUTBOX_POLL_INTERVAL,
+            help='Seconds to wait when no message is due'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no message is due instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            # Finish the batch in hand on SIGTERM (a deploy) rather than
+            # leaving it leased until OUTBOX_LEASE_SECONDS runs out.
+            signal.signal(signal.SIGTERM, self._stop)
+
+        total_sent = total_failed = total_pruned = 0
+        last_pruned = None
+        try:
+            while not self.stopping:
+                if last_pruned is None or time.monotonic() - last_pruned >= settings.OUTBOX_PRUNE_INTERVAL:
+                    total_pruned += prune_outbox()
+                    last_pruned = time.monotonic()
+                sent, failed = process_outbox(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Sent {sent}, failed {failed}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {total_sent} emails, {total_failed} failed attempts, pruned {total_pruned} old messages'
+        ))
+
+    def _stop(self, signum, frame):
+        self.stopping = True
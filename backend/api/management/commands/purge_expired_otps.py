@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from api.models import PasswordResetOTP
+
+class Command(BaseCommand):
+    help = 'Deletes expired and used password reset OTPs in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
+        # Everything older than the expiry (used or not) by walking the
+        # created_at index, then the few used codes that have not expired.
+        deleted = self._purge(PasswordResetOTP.objects.filter(created_at__lt=cutoff), options['batch_size'])
+        deleted += self._purge(
+            PasswordResetOTP.objects.filter(created_at__gte=cutoff, is_used=True), options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired or used OTPs'))
+
+    def _purge(self, queryset, batch_size):
+        deleted = 0
+        # Each batch is its own short transaction, so logins and resets
+        # never wait on one long delete.
+        while True:
+            batch = list(queryset.order_by('created_at').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return deleted
+            deleted += PasswordResetOTP.objects.filter(pk__in=batch).delete()[0]
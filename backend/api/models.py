@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -29,13 +30,104 @@ class PasswordResetOTP(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # verify_otp's lookup (user, otp, newest first) and the UPDATE
+            # that retires a user's codes only ever look at unused rows, of
+            # which there is about one per user. Partial, because Django
+            # writes is_used=False as NOT is_used, which a column in a
+            # regular index cannot be searched on.
+            models.Index(
+                fields=['user', 'otp', 'created_at'],
+                condition=models.Q(is_used=False),
+                name='otp_user_unused_idx'
+            ),
+            # purge_expired_otps walks rows by age.
+            models.Index(fields=['created_at'], name='otp_created_idx'),
+        ]
+
     def __str__(self):
         return f"OTP for {self.user.username}"
 
     def is_valid(self):
-        expiry_time = self.created_at + timezone.timedelta(minutes=10)
+        expiry_time = self.created_at + timezone.timedelta(minutes=settings.OTP_EXPIRY_MINUTES)
         return not self.is_used and timezone.now() <= expiry_time
 
     @classmethod
     def generate_otp(cls):
         return ''.join([str(random.randint(0, 9)) for _ in range(6)])
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent by ``manage.py process_outbox``.
+
+    Rows are written in the same transaction as whatever they report on, so
+    a message exists exactly when its data was committed, and requests never
+    wait on SMTP.
+    """
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a worker may next pick the row up: the retry time after a
+    # failure, or the end of the lease a worker holds while sending it.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)}"
+
+class RequestProfile(models.Model):
+    """
+    A cProfile run of one API request, recorded by
+    ``expense_tracker.profiling.RequestProfilingMiddleware``.
+
+    ``stats`` holds the same marshalled data as a ``.prof`` file, and
+    ``stacks`` the sampled stacks in the collapsed format flamegraph tools
+    read; the admin serves both as downloads.
+    """
+    SAMPLED = 'sampled'
+    TOKEN = 'token'
+    STAFF = 'staff'
+    TRIGGER_CHOICES = [
+        (SAMPLED, 'Sampled'),
+        (TOKEN, 'Profile token'),
+        (STAFF, 'Staff request'),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=255)
+    route = models.CharField(max_length=100)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    status_code = models.PositiveSmallIntegerField()
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    duration_ms = models.FloatField()
+    db_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    stats = models.BinaryField()
+    stacks = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,126 @@
+"""
+Durable outbound email.
+
+``enqueue_email`` stores a message in the OutboundEmail table; it is sent
+once the surrounding transaction commits, by ``manage.py process_outbox``.
+A worker claims a batch of due rows by moving their ``next_attempt_at`` a
+lease into the future (with SKIP LOCKED where the database has it, so
+workers never claim the same row), then sends the whole batch over one
+connection from EMAIL_BACKEND. Sent rows are marked in one UPDATE; a
+failed one is retried with exponential backoff until OUTBOX_MAX_ATTEMPTS,
+then left as failed. A worker that dies mid-batch leaves its rows to be
+picked up again when the lease runs out, so delivery is at least once.
+
+Sent and failed rows still hold the message body (a password reset OTP,
+for one), so ``prune_outbox`` deletes them once they are older than
+OUTBOX_RETENTION_HOURS; ``process_outbox`` runs it every
+OUTBOX_PRUNE_INTERVAL seconds.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff before retry number ``attempts``: base * 2**(attempts - 1), capped."""
+    delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.OUTBOX_RETRY_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status=OutboundEmail.PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at')
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[message.pk for message in batch]).update(
+                next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+            )
+    return batch
+
+
+def send_batch(batch, connection=None):
+    """Send ``batch`` over one connection; return ``(sent, failed)`` counts."""
+    connection = connection or get_connection(fail_silently=False)
+    sent_ids, failed = [], 0
+    try:
+        for message in batch:
+            email = EmailMessage(message.subject, message.body, message.from_email, message.to)
+            try:
+                # A no-op while the connection is up. Without an explicit
+                # open, SMTP send_messages() connects and quits per call.
+                connection.open()
+                connection.send_messages([email])
+            except Exception as e:
+                failed += 1
+                _record_failure(message, e)
+                # The connection may be unusable now; the next send reopens it.
+                connection.close()
+            else:
+                sent_ids.append(message.pk)
+    finally:
+        connection.close()
+        # Record successes even when a failure bookkeeping query raised.
+        if sent_ids:
+            OutboundEmail.objects.filter(pk__in=sent_ids).update(
+                status=OutboundEmail.SENT, sent_at=timezone.now(), last_error=''
+            )
+    return len(sent_ids), failed
+
+
+def _record_failure(message, error):
+    attempts = message.attempts + 1
+    values = {'attempts': attempts, 'last_error': f'{type(error).__name__}: {error}'}
+    if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        values['status'] = OutboundEmail.FAILED
+        logger.error("Giving up on outbound email %s after %s attempts: %s", message.pk, attempts, error)
+    else:
+        values['next_attempt_at'] = timezone.now() + retry_delay(attempts)
+        logger.warning("Outbound email %s failed (attempt %s), will retry: %s", message.pk, attempts, error)
+    OutboundEmail.objects.filter(pk=message.pk).update(**values)
+
+
+def process_outbox(batch_size=None):
+    """Claim and send one batch; return ``(sent, failed)``."""
+    batch = claim_batch(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+    return send_batch(batch)
+
+
+def prune_outbox(hours=None, batch_size=1000):
+    """Delete sent and failed messages created more than ``hours`` ago; return how many."""
+    hours = settings.OUTBOX_RETENTION_HOURS if hours is None else hours
+    finished = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.SENT, OutboundEmail.FAILED],
+        created_at__lt=timezone.now() - timedelta(hours=hours)
+    )
+    deleted = 0
+    # Small batches keep each delete's transaction (and lock) short.
+    while True:
+        batch = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += OutboundEmail.objects.filter(pk__in=batch).delete()[0]
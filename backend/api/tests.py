@@ -0,0 +1,187 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import OutboundEmail, PasswordResetOTP
+from .outbox import claim_batch, enqueue_email, process_outbox, prune_outbox
+
+
+class CountingBackend(EmailBackend):
+    # Opens and closes like the SMTP backend, counting new connections.
+    opened = 0
+
+    def open(self):
+        if getattr(self, 'connected', False):
+            return False
+        self.connected = True
+        CountingBackend.opened += 1
+        return True
+
+    def close(self):
+        self.connected = False
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        if any('fail' in recipient for message in messages for recipient in message.to):
+            raise ConnectionError('SMTP server went away')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    OUTBOX_RETRY_BASE_SECONDS=30,
+    OUTBOX_MAX_ATTEMPTS=3,
+)
+class OutboxTests(TestCase):
+    def test_password_reset_is_queued_not_sent(self):
+        user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        response = APIClient().post(
+            '/api/auth/request-password-reset/', {'email': 'alice@example.com'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mail.outbox, [])
+
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ['alice@example.com'])
+        self.assertIn(PasswordResetOTP.objects.get(user=user).otp, queued.body)
+
+        call_command('process_outbox', once=True, stdout=StringIO())
+        self.assertEqual([message.to for message in mail.outbox], [['alice@example.com']])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.SENT)
+        self.assertIsNotNone(queued.sent_at)
+
+    @override_settings(EMAIL_BACKEND='api.tests.CountingBackend')
+    def test_one_connection_per_batch(self):
+        for index in range(5):
+            enqueue_email('Hello', 'Body', [f'user{index}@example.com'])
+        CountingBackend.opened = 0
+        self.assertEqual(process_outbox(batch_size=10), (5, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    @override_settings(EMAIL_BACKEND='api.tests.FailingBackend')
+    def test_failures_back_off_then_give_up(self):
+        enqueue_email('Hello', 'Body', ['ok@example.com'])
+        failing = enqueue_email('Hello', 'Body', ['fail@example.com'])
+
+        with self.assertLogs('api.outbox', 'WARNING'):
+            self.assertEqual(process_outbox(), (1, 1))
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (OutboundEmail.PENDING, 1))
+        self.assertIn('SMTP server went away', failing.last_error)
+        self.assertAlmostEqual(
+            failing.next_attempt_at, timezone.now() + timedelta(seconds=30), delta=timedelta(seconds=5)
+        )
+        # Not due yet.
+        self.assertEqual(process_outbox(), (0, 0))
+
+        for attempts, delay in ((2, 60), (3, None)):
+            OutboundEmail.objects.filter(pk=failing.pk).update(next_attempt_at=timezone.now())
+            with self.assertLogs('api.outbox', 'WARNING'):
+                self.assertEqual(process_outbox(), (0, 1))
+            failing.refresh_from_db()
+            self.assertEqual(failing.attempts, attempts)
+            if delay:
+                self.assertAlmostEqual(
+                    failing.next_attempt_at, timezone.now() + timedelta(seconds=delay),
+                    delta=timedelta(seconds=5)
+                )
+        self.assertEqual(failing.status, OutboundEmail.FAILED)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claimed_messages_are_leased(self):
+        enqueue_email('Hello', 'Body', ['alice@example.com'])
+        self.assertEqual(len(claim_batch(10)), 1)
+        # A second worker finds nothing until the lease runs out.
+        self.assertEqual(claim_batch(10), [])
+
+    @override_settings(OUTBOX_RETENTION_HOURS=24)
+    def test_prune_finished_messages(self):
+        def message(status, hours_ago):
+            queued = enqueue_email('Your OTP', 'Your OTP is 123456', ['alice@example.com'])
+            OutboundEmail.objects.filter(pk=queued.pk).update(
+                status=status, created_at=timezone.now() - timedelta(hours=hours_ago)
+            )
+            return queued.pk
+
+        old = [message(OutboundEmail.SENT, 25), message(OutboundEmail.FAILED, 48)]
+        kept = [message(OutboundEmail.SENT, 23), message(OutboundEmail.FAILED, 1), message(OutboundEmail.PENDING, 72)]
+        self.assertEqual(prune_outbox(batch_size=1), 2)
+        self.assertEqual(set(OutboundEmail.objects.values_list('pk', flat=True)), set(kept))
+        self.assertFalse(OutboundEmail.objects.filter(pk__in=old).exists())
+        self.assertEqual(prune_outbox(hours=0), 2)
+
+    def test_worker_prunes_sent_messages(self):
+        sent = enqueue_email('Your OTP', 'Your OTP is 123456', ['alice@example.com'])
+        OutboundEmail.objects.filter(pk=sent.pk).update(
+            status=OutboundEmail.SENT, created_at=timezone.now() - timedelta(days=2)
+        )
+        enqueue_email('Hello', 'Body', ['bob@example.com'])
+        output = StringIO()
+        call_command('process_outbox', once=True, stdout=output)
+        self.assertIn('Sent 1 emails, 0 failed attempts, pruned 1 old messages', output.getvalue())
+        self.assertFalse(OutboundEmail.objects.filter(pk=sent.pk).exists())
+
+
+class PasswordResetOTPTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.client = APIClient()
+
+    def request_reset(self):
+        response = self.client.post('/api/auth/request-password-reset/', {'email': 'alice@example.com'})
+        self.assertEqual(response.status_code, 200)
+        return PasswordResetOTP.objects.filter(user=self.user).latest('created_at')
+
+    def test_new_otp_supersedes_older_ones(self):
+        first = self.request_reset()
+        second = self.request_reset()
+        first.refresh_from_db()
+        self.assertTrue(first.is_used)
+        self.assertFalse(second.is_used)
+
+        if first.otp != second.otp:
+            response = self.client.post('/api/auth/verify-otp/', {
+                'email': 'alice@example.com', 'otp': first.otp, 'new_password': 'another-horse-battery',
+            })
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/auth/verify-otp/', {
+            'email': 'alice@example.com', 'otp': second.otp, 'new_password': 'another-horse-battery',
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_purge_expired_otps(self):
+        now = timezone.now()
+        fresh = PasswordResetOTP.objects.create(user=self.user, otp='111111')
+        used = PasswordResetOTP.objects.create(user=self.user, otp='222222', is_used=True)
+        expired = PasswordResetOTP.objects.create(user=self.user, otp='333333')
+        PasswordResetOTP.objects.filter(pk=expired.pk).update(created_at=now - timedelta(minutes=11))
+
+        out = StringIO()
+        call_command('purge_expired_otps', batch_size=1, stdout=out)
+        self.assertIn('Deleted 2 expired or used OTPs', out.getvalue())
+        self.assertEqual(list(PasswordResetOTP.objects.values_list('pk', flat=True)), [fresh.pk])
+        self.assertFalse(PasswordResetOTP.objects.filter(pk=used.pk).exists())
+
+    def test_lookups_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plan check is written for SQLite')
+        verify = PasswordResetOTP.objects.filter(user=self.user, otp='123456', is_used=False).order_by('-created_at')[:1]
+        invalidate = PasswordResetOTP.objects.filter(user=self.user, is_used=False)
+        purge = PasswordResetOTP.objects.filter(created_at__lt=timezone.now()).order_by('created_at')
+        self.assertIn('otp_user_unused_idx', verify.explain())
+        for queryset in (verify, invalidate, purge):
+            plan = queryset.explain()
+            self.assertIn('SEARCH', plan)
+            self.assertNotIn('SCAN', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
@@ -1,11 +1,12 @@
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
+from django.db import transaction
 from django.conf import settings
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from .models import PasswordResetOTP
+from .outbox import enqueue_email
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +18,7 @@ def request_password_reset(request):
     Request a password reset OTP
     """
     email = request.data.get('email')
-    logger.debug(f"Password reset request received for email: {email}")
+    logger.debug("Password reset request received for email: %s", email)
     
     if not email:
         logger.warning("Email not provided in request")
@@ -28,9 +29,9 @@ def request_password_reset(request):
     
     try:
         user = User.objects.get(email=email)
-        logger.debug(f"User found with email: {email}")
+        logger.debug("User found with email: %s", email)
     except User.DoesNotExist:
-        logger.warning(f"No user found with email: {email}")
+        logger.warning("No user found with email: %s", email)
         return Response(
             {'error': 'No user found with this email address'},
             status=status.HTTP_404_NOT_FOUND
@@ -39,15 +40,8 @@ def request_password_reset(request):
     try:
         # Generate OTP
         otp = PasswordResetOTP.generate_otp()
-        logger.debug(f"OTP generated for user: {user.username}")
+        logger.debug("OTP generated for user: %s", user.username)
         
-        # Save OTP in database
-        PasswordResetOTP.objects.create(
-            user=user,
-            otp=otp
-        )
-        logger.debug("OTP saved in database")
-
         # Send email with OTP
         subject = 'Password Reset OTP - Expense Tracker'
         message = f'''
@@ -62,23 +56,25 @@ def request_password_reset(request):
         Best regards,
         Expense Tracker Team
         '''
-        
-        logger.debug("Attempting to send email")
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-            fail_silently=False,
-        )
-        logger.info(f"Password reset OTP sent successfully to {email}")
+
+        # Save the OTP and queue its email together; process_outbox sends
+        # it, so a slow SMTP server never holds up the request.
+        with transaction.atomic():
+            # Only the newest code is valid; retire the others in one UPDATE.
+            PasswordResetOTP.objects.filter(user=user, is_used=False).update(is_used=True)
+            PasswordResetOTP.objects.create(
+                user=user,
+                otp=otp
+            )
+            enqueue_email(subject, message, [email])
+        logger.info("Password reset OTP queued for %s", email)
         
         return Response(
             {'message': 'OTP has been sent to your email'},
             status=status.HTTP_200_OK
         )
     except Exception as e:
-        logger.error(f"Error in password reset process: {str(e)}", exc_info=True)
+        logger.error("Error in password reset process: %s", e, exc_info=True)
         return Response(
             {
                 'error': 'Failed to send OTP email. Please try again later.',
@@ -103,9 +99,9 @@ def verify_otp(request):
 
     try:
         user = User.objects.get(email=email)
-        logger.debug(f"User found with email: {email}")
+        logger.debug("User found with email: %s", email)
     except User.DoesNotExist:
-        logger.warning(f"No user found with email: {email}")
+        logger.warning("No user found with email: %s", email)
         return Response(
             {'error': 'Invalid email'},
             status=status.HTTP_404_NOT_FOUND
@@ -117,16 +113,16 @@ def verify_otp(request):
             otp=otp,
             is_used=False
         ).latest('created_at')
-        logger.debug(f"OTP object found for user: {user.username}")
+        logger.debug("OTP object found for user: %s", user.username)
     except PasswordResetOTP.DoesNotExist:
-        logger.warning(f"Invalid or expired OTP for user: {user.username}")
+        logger.warning("Invalid or expired OTP for user: %s", user.username)
         return Response(
             {'error': 'Invalid or expired OTP'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     if not otp_obj.is_valid():
-        logger.warning(f"OTP has expired for user: {user.username}")
+        logger.warning("OTP has expired for user: %s", user.username)
         return Response(
             {'error': 'OTP has expired'},
             status=status.HTTP_400_BAD_REQUEST
@@ -136,7 +132,7 @@ def verify_otp(request):
         # Set new password
         user.set_password(new_password)
         user.save()
-        logger.info(f"Password reset successful for user: {user.username}")
+        logger.info("Password reset successful for user: %s", user.username)
         
         # Mark OTP as used
         otp_obj.is_used = True
@@ -148,7 +144,7 @@ def verify_otp(request):
             status=status.HTTP_200_OK
         )
     except Exception as e:
-        logger.error(f"Error in password reset process: {str(e)}", exc_info=True)
+        logger.error("Error in password reset process: %s", e, exc_info=True)
         return Response(
             {
                 'error': 'Failed to reset password. Please try again later.',
@@ -0,0 +1,100 @@
+"""
+JWT authentication without a User query per request.
+
+Tokens issued by ``tokens_for_user`` carry the username next to the user
+id. StatelessJWTAuthentication builds ``request.user`` from those claims
+as a User instance whose other fields are deferred: filtering on it,
+assigning it to a foreign key and reading ``pk``/``username`` cost nothing,
+and the first access to any other field (email, password, ...) loads it
+from the database then.
+
+Whether the account still exists and is active is checked against a
+per-process cache that expires after JWT_USER_STATUS_TTL seconds, so a
+deactivated or deleted user is refused within that time on every worker
+(at once on the worker that made the change). Tokens without the username
+claim, issued before this class existed, fall back to a full User lookup.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+USERNAME_CLAIM = 'username'
+
+User = get_user_model()
+
+_status_lock = threading.Lock()
+# user id -> (is_active or None if the user is gone, expiry on the monotonic clock)
+_status_cache = {}
+
+
+def tokens_for_user(user):
+    """A refresh token for ``user``; its access tokens carry the username too."""
+    refresh = RefreshToken.for_user(user)
+    refresh[USERNAME_CLAIM] = user.get_username()
+    return refresh
+
+
+def user_status(user_id):
+    """``is_active`` of the user, or None if it no longer exists; cached briefly."""
+    now = time.monotonic()
+    with _status_lock:
+        cached = _status_cache.get(user_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    is_active = User.objects.filter(pk=user_id).values_list('is_active', flat=True).first()
+    with _status_lock:
+        _status_cache[user_id] = (is_active, now + settings.JWT_USER_STATUS_TTL)
+    return is_active
+
+
+def forget_user_status(user_id=None):
+    """Drop the cached status of one user, or of everyone."""
+    with _status_lock:
+        if user_id is None:
+            _status_cache.clear()
+        else:
+            _status_cache.pop(user_id, None)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    forget_user_status(instance.pk)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if (
+            USERNAME_CLAIM not in validated_token
+            or api_settings.CHECK_REVOKE_TOKEN
+            or api_settings.USER_ID_FIELD != User._meta.pk.name
+        ):
+            return super().get_user(validated_token)
+        try:
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValueError):
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        is_active = user_status(user_id)
+        if is_active is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        # from_db() marks every field not given as deferred.
+        return User.from_db(
+            DEFAULT_DB_ALIAS,
+            [User._meta.pk.attname, User.USERNAME_FIELD, 'is_active'],
+            [user_id, validated_token[USERNAME_CLAIM], is_active],
+        )
@@ -1,3 +1,110 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-# Create your tests here.
+from api.models import PasswordResetOTP
+from authentication.stateless import (
+    StatelessJWTAuthentication, forget_user_status, tokens_for_user, user_status
+)
+from expenses.tests.query_budget import QueryBudgetMixin
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class AuthenticationQueryBudgetTests(QueryBudgetMixin, TestCase):
+    urlconf = 'authentication.urls'
+    query_budgets = {
+        ('login', 'post'): 1,
+        ('register', 'post'): 3,
+        ('request-password-reset', 'post'): 4,
+        ('verify-otp', 'post'): 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'correct-horse-battery')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login(self):
+        response = self.assertQueryBudget('post', '/api/auth/login/', {
+            'username': 'alice',
+            'password': 'correct-horse-battery',
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_register(self):
+        response = self.assertQueryBudget('post', '/api/auth/register/', {
+            'username': 'carol',
+            'password': 'correct-horse-battery',
+            'email': 'carol@example.com',
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def test_request_password_reset(self):
+        response = self.assertQueryBudget('post', '/api/auth/request-password-reset/', {
+            'email': 'alice@example.com',
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_verify_otp(self):
+        PasswordResetOTP.objects.create(user=self.user, otp='123456')
+        response = self.assertQueryBudget('post', '/api/auth/verify-otp/', {
+            'email': 'alice@example.com',
+            'otp': '123456',
+            'new_password': 'another-horse-battery',
+        })
+        self.assertEqual(response.status_code, 200)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'correct-horse-battery')
+
+    def setUp(self):
+        forget_user_status()
+
+    def client_with(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def test_user_status_is_looked_up_once_per_ttl(self):
+        client = self.client_with(tokens_for_user(self.user).access_token)
+        # The category list itself runs two: its validators and the page.
+        with self.assertNumQueries(3):
+            self.assertEqual(client.get('/api/categories/').status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(client.get('/api/categories/').status_code, 200)
+        with override_settings(JWT_USER_STATUS_TTL=0):
+            forget_user_status()
+            client.get('/api/categories/')
+            with self.assertNumQueries(3):
+                client.get('/api/categories/')
+
+    def test_user_is_built_from_claims_and_loads_other_fields_lazily(self):
+        token = AccessToken(str(tokens_for_user(self.user).access_token))
+        user_status(self.user.pk)
+        with self.assertNumQueries(0):
+            user = StatelessJWTAuthentication().get_user(token)
+            self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, 'alice', True))
+            self.assertTrue(user.is_authenticated)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'alice@example.com')
+
+    def test_deactivated_and_deleted_users_are_refused(self):
+        client = self.client_with(tokens_for_user(self.user).access_token)
+        self.assertEqual(client.get('/api/categories/').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(client.get('/api/categories/').status_code, 401)
+
+        self.user.delete()
+        self.assertEqual(client.get('/api/categories/').status_code, 401)
+
+    def test_tokens_without_username_claim_still_work(self):
+        client = self.client_with(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(client.get('/api/categories/').status_code, 200)
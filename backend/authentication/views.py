@@ -1,11 +1,13 @@
 from django.shortcuts import render
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from expenses.seeding import seed_default_categories
+from .stateless import tokens_for_user
 
 # Create your views here.
 
@@ -29,31 +31,18 @@ def register_user(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        user = User.objects.create_user(
-            username=username,
-            password=password,
-            email=email
-        )
-
-        # Create default categories for the new user
-        from expenses.models import Category
-        default_categories = [
-            'Food & Dining',
-            'Transportation',
-            'Shopping',
-            'Entertainment',
-            'Bills & Utilities',
-            'Health & Medical',
-            'Travel',
-            'Education',
-            'Personal Care',
-            'Others'
-        ]
-        for category_name in default_categories:
-            Category.objects.get_or_create(name=category_name, user=user)
+        # The account and its default categories are created together or
+        # not at all.
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=username,
+                password=password,
+                email=email
+            )
+            seed_default_categories([user.pk], check_existing=False)
 
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         
         return Response({
             'message': 'User registered successfully',
@@ -93,7 +82,7 @@ def login_user(request):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         
         return Response({
             'message': 'Login successful',
@@ -1,5 +1,9 @@
 """
 ASGI config for expense_tracker project.
+
+Served by gunicorn with uvicorn workers when SERVER_MODE=asgi (see
+gunicorn.conf.py), or for development with
+``uvicorn expense_tracker.asgi:application``.
 """
 
 import os
@@ -0,0 +1,156 @@
+"""
+Logging off the request path.
+
+``BackgroundHandler`` is the one handler settings.LOGGING installs, on the
+root logger. It puts each record on a bounded in-memory queue; a
+QueueListener thread formats it and writes it to stdout. A request thread
+therefore never waits on stdout. When the queue is full, records are
+dropped and counted, not waited on; /metrics reports the count as
+``log_records_dropped_total``.
+
+``JSONFormatter`` writes one JSON object per line: time, level, logger,
+message, the ``extra`` a call passed, and the traceback, if any.
+``SampledDebugFilter`` keeps 1 in N DEBUG records of the loggers named in
+LOG_SAMPLE and drops the rest before they are queued.
+
+Log calls pass their arguments rather than an f-string
+(``logger.debug('OTP generated for user: %s', username)``), so a
+message that is filtered out is never built.
+"""
+import datetime
+import itertools
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; the others came in through ``extra``.
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_handlers = []
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec='milliseconds'
+            ),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in RESERVED_ATTRS and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(value):
+    """``'name=LEVEL,name=LEVEL'`` (LOG_LEVELS) as a dict."""
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def parse_sample_rates(value):
+    """``'name=N,name=N'`` (LOG_SAMPLE) as a dict of logger names to N."""
+    return {name: int(every) for name, every in parse_levels(value).items()}
+
+
+class SampledDebugFilter(logging.Filter):
+    """
+    Keeps 1 in ``every[name]`` DEBUG records of each logger named in
+    ``every`` or below it (``'api'`` covers ``api.views``); other records
+    pass.
+    """
+
+    def __init__(self, every=None):
+        super().__init__()
+        self.every = every or {}
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or not self.every:
+            return True
+        every = self._rate(record.name)
+        if every <= 1:
+            return True
+        counter = self._counters.get(record.name)
+        if counter is None:
+            # Sharing one counter between threads is fine: next() on an
+            # itertools.count is atomic.
+            counter = self._counters.setdefault(record.name, itertools.count())
+        return next(counter) % every == 0
+
+    def _rate(self, name):
+        while name:
+            if name in self.every:
+                return self.every[name]
+            name = name.rpartition('.')[0]
+        return 1
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    A QueueHandler feeding its own QueueListener thread, which writes to
+    ``stream`` (stdout by default) with this handler's formatter.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        # SimpleQueue is a C queue without the locks queue.Queue takes on
+        # every put; the size bound is checked here instead, loosely.
+        super().__init__(queue.SimpleQueue())
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._listening = True
+        _handlers.append(self)
+
+    def createLock(self):
+        # emit() only puts on a thread-safe queue; Handler.handle() need not
+        # serialise the request threads around it.
+        self.lock = None
+
+    def setFormatter(self, fmt):
+        # Records are formatted by the listener thread.
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Merge the arguments now, while they hold the values logged; the
+        # line itself, traceback included, is built in the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+    def close(self):
+        # logging.shutdown() closes every handler at exit: write out what
+        # is still queued first.
+        if self._listening:
+            self._listening = False
+            self.listener.stop()
+        self.target.close()
+        super().close()
+
+
+def dropped_records():
+    """Records the BackgroundHandlers of this process dropped because their queue was full."""
+    return sum(handler.dropped for handler in _handlers)
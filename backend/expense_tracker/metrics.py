@@ -0,0 +1,440 @@
+"""
+Request instrumentation.
+
+RequestMetricsMiddleware times every request and, through an execute
+wrapper installed on every database connection, each query it runs, in
+whichever thread. It serves WSGI and ASGI alike. A response gets a
+``Server-Timing`` header:
+
+- ``db``: time in the database, with the query count as its description
+- ``serialize``: building response data from objects or rows, the queries
+  that runs left out (serializers' ``.data`` and expenses.representations)
+- ``app``: the rest of the view
+- ``render``: the renderer turning that data into bytes
+- ``total``: the whole request through every middleware
+
+The same numbers are aggregated per route name (``expense-list``,
+``expense-dashboard-stats``, ...) and method, and served in the Prometheus
+text format by ``metrics_view`` at /metrics, along with the response
+cache hits and misses (expenses.cache) and, with DATABASE_POOL on, the
+connection pools (expense_tracker.pool).
+
+Aggregates are kept per process. Behind gunicorn a scrape reaches one
+worker, so with METRICS_DIR set every worker also writes its aggregates to
+``<METRICS_DIR>/metrics-<pid>.json``, at most METRICS_WRITE_INTERVAL
+seconds after they change, and a scrape serves all the files there; the
+``pid`` label keeps workers' series apart. gunicorn.conf.py sets
+METRICS_DIR up and deletes an exited worker's file.
+
+Queries slower than SLOW_QUERY_MS are logged as warnings. A streamed
+response's body is produced after the middleware returns, so its time is
+not included.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from expenses.cache import cache_stats
+
+from . import pool as db_pool
+from .log import dropped_records
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, as Prometheus client libraries default to.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class RouteStats:
+    __slots__ = (
+        'buckets', 'count', 'seconds', 'db_seconds', 'queries', 'serialize_seconds', 'render_seconds', 'statuses'
+    )
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._changed = threading.Event()
+        self._writer_pid = None
+
+    def observe(self, route, method, status, seconds, db_seconds, queries, serialize_seconds, render_seconds):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = RouteStats()
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.count += 1
+            stats.seconds += seconds
+            stats.db_seconds += db_seconds
+            stats.queries += queries
+            stats.serialize_seconds += serialize_seconds
+            stats.render_seconds += render_seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if settings.METRICS_DIR:
+            self._changed.set()
+            self._start_writer()
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for key, stats in self._routes.items():
+                copy = RouteStats()
+                for name in RouteStats.__slots__:
+                    value = getattr(stats, name)
+                    setattr(copy, name, value.copy() if isinstance(value, (list, dict)) else value)
+                snapshot[key] = copy
+            return snapshot
+
+    def collect(self):
+        """Everything this process reports, as JSON-serializable data."""
+        return {
+            'pid': os.getpid(),
+            'routes': [
+                [route, method, {name: getattr(stats, name) for name in RouteStats.__slots__}]
+                for (route, method), stats in sorted(self.snapshot().items())
+            ],
+            'log_records_dropped': dropped_records(),
+            'cache': cache_stats(),
+            'pools': sorted([pool.name, db_pool.stats(pool)] for pool in db_pool.pools()),
+        }
+
+    def _start_writer(self):
+        # Once per process: a thread started before gunicorn forks its
+        # workers (with preload_app) does not run in them.
+        if self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        threading.Thread(target=self._write_changes, name='metrics-writer', daemon=True).start()
+
+    def _write_changes(self):
+        while True:
+            self._changed.wait()
+            self._changed.clear()
+            directory = settings.METRICS_DIR
+            try:
+                if directory:
+                    self.write(directory)
+            except OSError:
+                logger.exception('Could not write metrics to %s', directory)
+            time.sleep(settings.METRICS_WRITE_INTERVAL)
+
+    def write(self, directory):
+        """Write collect() to this process's file in ``directory``."""
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.collect(), f)
+        # Atomic, so a scrape never reads a half-written file.
+        os.replace(f'{path}.tmp', path)
+
+    def gather(self):
+        """collect() of every process writing to METRICS_DIR, or of this one."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return [self.collect()]
+        self.write(directory)
+        processes = []
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    processes.append(json.load(f))
+            except (OSError, ValueError):
+                # Its worker exited and the file went away.
+                continue
+        return sorted(processes, key=lambda process: process['pid'])
+
+    def render(self):
+        """The aggregates of gather() in the Prometheus text exposition format."""
+        processes = self.gather()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        snapshot = [
+            (process['pid'], route, method, stats)
+            for process in processes for route, method, stats in process['routes']
+        ]
+
+        family('http_request_duration_seconds', 'histogram', 'Time to respond, per route.')
+        for pid, route, method, stats in snapshot:
+            labels = f'route="{_escape(route)}",method="{method}",pid="{pid}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {stats["seconds"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+        for name, attribute, help_text in (
+            ('http_request_db_seconds_total', 'db_seconds', 'Time spent in database queries, per route.'),
+            ('http_request_db_queries_total', 'queries', 'Database queries run, per route.'),
+            ('http_request_serialize_seconds_total', 'serialize_seconds',
+             'Time spent building response data, per route.'),
+            ('http_request_render_seconds_total', 'render_seconds', 'Time spent rendering responses, per route.'),
+        ):
+            family(name, 'counter', help_text)
+            for pid, route, method, stats in snapshot:
+                value = stats[attribute]
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{name}{{route="{_escape(route)}",method="{method}",pid="{pid}"}} {value}')
+
+        family('http_responses_total', 'counter', 'Responses sent, per route and status code.')
+        for pid, route, method, stats in snapshot:
+            # JSON object keys are strings.
+            for status, count in sorted((int(status), count) for status, count in stats['statuses'].items()):
+                lines.append(
+                    f'http_responses_total{{route="{_escape(route)}",method="{method}",'
+                    f'status="{status}",pid="{pid}"}} {count}'
+                )
+
+        family('log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full.')
+        for process in processes:
+            lines.append(f'log_records_dropped_total{{pid="{process["pid"]}"}} {process["log_records_dropped"]}')
+
+        family('response_cache_requests_total', 'counter', 'Versioned response cache lookups, per entry and result.')
+        for process in processes:
+            for name, counts in sorted(process['cache'].items()):
+                for result, key in (('hit', 'hits'), ('miss', 'misses')):
+                    lines.append(
+                        f'response_cache_requests_total{{cache="{_escape(name)}",result="{result}",'
+                        f'pid="{process["pid"]}"}} {counts[key]}'
+                    )
+
+        pool_stats = [(process['pid'], name, stats) for process in processes for name, stats in process['pools']]
+        if pool_stats:
+            family('db_pool_connections', 'gauge', 'Open pooled database connections, idle or in use.')
+            for pid, name, stats in pool_stats:
+                for state in ('idle', 'in_use'):
+                    lines.append(
+                        f'db_pool_connections{{database="{_escape(name)}",state="{state}",pid="{pid}"}} {stats[state]}'
+                    )
+            for metric, key, kind, help_text in (
+                ('db_pool_max_connections', 'max_size', 'gauge', 'Connections the pool may open.'),
+                ('db_pool_checkouts_total', 'checkouts', 'counter', 'Connections lent out by the pool.'),
+                ('db_pool_waits_total', 'waits', 'counter', 'Checkouts that waited for a connection to come free.'),
+                ('db_pool_wait_seconds_total', 'wait_seconds', 'counter', 'Time checkouts spent waiting.'),
+                ('db_pool_timeouts_total', 'timeouts', 'counter', 'Checkouts that gave up waiting.'),
+                ('db_pool_connects_total', 'connects', 'counter', 'Connections the pool opened.'),
+                ('db_pool_ping_failures_total', 'ping_failures', 'counter', 'Idle connections found dead on checkout.'),
+                ('db_pool_bad_returns_total', 'bad_returns', 'counter', 'Connections handed back broken.'),
+            ):
+                family(metric, kind, help_text)
+                for pid, name, stats in pool_stats:
+                    value = stats[key]
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{metric}{{database="{_escape(name)}",pid="{pid}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+# The QueryTimers of the requests the current context is serving. A context
+# variable, so the timers follow a request into the threads its queries run
+# in: its own under WSGI, sync_to_async threads under ASGI.
+_active_timers = ContextVar('active_query_timers', default=())
+
+
+class QueryTimer:
+    """Adds up the queries run while it is active; logs slow ones."""
+
+    def __init__(self, slow_query_ms):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow_query_ms = slow_query_ms
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed):
+        # An async view may run queries in several threads at once.
+        with self._lock:
+            self.count += 1
+            self.seconds += elapsed
+        if self.slow_query_ms is not None and elapsed * 1000 >= self.slow_query_ms:
+            logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, sql[:1000])
+
+    @contextmanager
+    def active(self):
+        token = _active_timers.set(_active_timers.get() + (self,))
+        try:
+            yield self
+        finally:
+            _active_timers.reset(token)
+
+
+# The SerializeTimer of the request the current context is serving.
+_serialize_timer = ContextVar('serialize_timer', default=None)
+
+
+class SerializeTimer:
+    """Adds up the time spent in timed_serialization() blocks, less their queries."""
+
+    def __init__(self, query_timer):
+        self.seconds = 0.0
+        self.query_timer = query_timer
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        token = _serialize_timer.set(self)
+        try:
+            yield self
+        finally:
+            _serialize_timer.reset(token)
+
+
+@contextmanager
+def timed_serialization():
+    """Count the block as the current request's serialization time."""
+    timer = _serialize_timer.get()
+    if timer is None:
+        yield
+        return
+    start, db_start = time.perf_counter(), timer.query_timer.seconds
+    try:
+        yield
+    finally:
+        # Querysets are often only evaluated while they are serialized.
+        elapsed = time.perf_counter() - start - (timer.query_timer.seconds - db_start)
+        with timer._lock:
+            timer.seconds += max(elapsed, 0.0)
+
+
+def timed_execute(execute, sql, params, many, context):
+    """The execute_wrapper every connection gets; reports to the active QueryTimers."""
+    timers = _active_timers.get()
+    if not timers:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for timer in timers:
+            timer.record(sql, elapsed)
+
+
+@receiver(connection_created)
+def install_query_timing(sender, connection, **kwargs):
+    # Sent on every (re)connect of a connection object; it keeps its wrappers.
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        request._render_timing = [None, None]
+        timer = QueryTimer(settings.SLOW_QUERY_MS)
+        with timer.active(), SerializeTimer(timer).active() as serialize_timer:
+            response = self.get_response(request)
+        return self.finish(request, response, start, timer, serialize_timer)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        request._render_timing = [None, None]
+        timer = QueryTimer(settings.SLOW_QUERY_MS)
+        with timer.active(), SerializeTimer(timer).active() as serialize_timer:
+            response = await self.get_response(request)
+        return self.finish(request, response, start, timer, serialize_timer)
+
+    def finish(self, request, response, start, timer, serialize_timer):
+        total = time.perf_counter() - start
+
+        render_start, render_end = request._render_timing
+        render = render_end - render_start if render_start is not None and render_end is not None else 0.0
+        serialize = serialize_timer.seconds
+        app = max(total - timer.seconds - serialize - render, 0.0)
+
+        match = request.resolver_match
+        route = match.view_name if match and match.view_name else UNMATCHED_ROUTE
+        registry.observe(
+            route, request.method, response.status_code, total, timer.seconds, timer.count, serialize, render
+        )
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={timer.seconds * 1000:.1f};desc="{timer.count} queries"',
+                f'serialize;dur={serialize * 1000:.1f}',
+                f'app;dur={app * 1000:.1f}',
+                f'render;dur={render * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ])
+        return response
+
+    def process_template_response(self, request, response):
+        # Called just before a DRF Response (a SimpleTemplateResponse) is
+        # rendered; the callback runs once it has been.
+        timing = request._render_timing
+        timing[0] = time.perf_counter()
+
+        def rendered(response):
+            timing[1] = time.perf_counter()
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape target. Requires ``Authorization: Bearer <METRICS_TOKEN>``;
+    without a METRICS_TOKEN it is only served with DEBUG on.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
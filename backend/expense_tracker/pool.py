@@ -0,0 +1,93 @@
+"""
+Database connections shared by the threads of a process.
+
+The pools are psycopg_pool's: ``connection_pool`` keeps one per database
+per process, opened on first use. A pool lends its idle connections and
+opens more, in its own worker threads, while fewer than ``max_size`` are
+open; a caller otherwise waits up to ``timeout`` seconds before
+psycopg_pool.PoolTimeout (an OperationalError). Connections beyond
+``min_size`` are closed after ``max_idle`` seconds unused, and every
+connection once it is about ``max_lifetime`` old. With ``pre_ping`` each
+checkout first sends an empty query: one the server or network dropped
+while it was idle is replaced rather than failing a request.
+
+/metrics reports each pool's ``stats()``. expense_tracker.pooled_postgresql
+is the Django database backend that uses them.
+"""
+import os
+import threading
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Pools this process inherited through fork(); see _forget_inherited_pools.
+_inherited = []
+
+
+def connection_pool(conn_params, name, min_size=0, max_size=4, timeout=10.0, max_idle=300.0, max_lifetime=3600.0,
+                    pre_ping=True):
+    """The process's pool for the database ``conn_params`` connect to, made on first use."""
+    key = repr(sorted(conn_params.items()))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                # Imported here: the SQLite setups need no psycopg.
+                from psycopg_pool import ConnectionPool
+
+                pool = _pools[key] = ConnectionPool(
+                    kwargs=conn_params,
+                    min_size=min_size,
+                    max_size=max_size,
+                    timeout=timeout,
+                    max_idle=max_idle,
+                    max_lifetime=max_lifetime,
+                    check=ConnectionPool.check_connection if pre_ping else None,
+                    name=name,
+                    open=True,
+                )
+    return pool
+
+
+def pools():
+    return list(_pools.values())
+
+
+def stats(pool):
+    """A pool's psycopg_pool counters, under the names /metrics reports them by."""
+    counts = pool.get_stats()
+    return {
+        'idle': counts.get('pool_available', 0),
+        'in_use': counts.get('pool_size', 0) - counts.get('pool_available', 0),
+        'max_size': counts.get('pool_max', 0),
+        'checkouts': counts.get('requests_num', 0),
+        'waits': counts.get('requests_queued', 0),
+        'wait_seconds': counts.get('requests_wait_ms', 0) / 1000,
+        'timeouts': counts.get('requests_errors', 0),
+        'connects': counts.get('connections_num', 0),
+        'ping_failures': counts.get('connections_lost', 0),
+        'bad_returns': counts.get('returns_bad', 0),
+    }
+
+
+def close_pools(name):
+    """Close and forget the pools to database ``name``, so its next connection opens a new one."""
+    with _pools_lock:
+        closing = [key for key, pool in _pools.items() if pool.name == name]
+        closing = [_pools.pop(key) for key in closing]
+    for pool in closing:
+        pool.close()
+
+
+def _forget_inherited_pools():
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    # A forked gunicorn worker shares its parent's sockets, but not the
+    # threads that run its pools. Closing the parent's connections here,
+    # even by garbage collection, would close them for the parent too:
+    # keep them and open new pools.
+    _inherited.extend(_pools.values())
+    _pools.clear()
+
+
+os.register_at_fork(after_in_child=_forget_inherited_pools)
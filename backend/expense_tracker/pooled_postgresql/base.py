@@ -0,0 +1,54 @@
+"""
+PostgreSQL with connections from a pool per process (expense_tracker.pool).
+
+With CONN_MAX_AGE = 0 Django opens a connection when a thread first
+queries and closes it when the request ends. Here opening takes a
+connection from the pool and closing hands it back, where psycopg_pool
+rolls it back if it is still in a transaction. A request therefore pays
+no connect or TLS handshake, and a worker's threads share at most
+``MAX_SIZE`` connections instead of holding one each. The pool is set up
+from the ``POOL`` dict of the database's settings; see DATABASE_POOL in
+settings.py. Needs psycopg 3.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from expense_tracker.pool import connection_pool
+
+from .creation import DatabaseCreation
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+        return connection_pool(
+            conn_params,
+            conn_params.get('dbname', ''),
+            min_size=options.get('MIN_SIZE', 0),
+            max_size=options.get('MAX_SIZE', 4),
+            timeout=options.get('TIMEOUT', 10.0),
+            max_idle=options.get('MAX_IDLE', 300.0),
+            max_lifetime=options.get('MAX_LIFETIME', 3600.0),
+            pre_ping=options.get('PRE_PING', True),
+        )
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.pool(conn_params)
+        # A checkout that times out raises psycopg_pool.PoolTimeout, an
+        # OperationalError, so Django wraps it as a database error.
+        connection = self._pool.getconn()
+        # As super() does when it opens a connection.
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel(
+            IsolationLevel.READ_COMMITTED if isolation_level is None else isolation_level
+        )
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._pool.putconn(self.connection)
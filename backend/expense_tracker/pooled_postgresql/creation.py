@@ -0,0 +1,17 @@
+from django.db.backends.postgresql import creation
+
+from expense_tracker.pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # Postgres will not drop or copy a database while anyone is connected
+    # to it, and closing a pooled connection only hands it back.
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        self.connection.close()
+        close_pools(self.connection.settings_dict['NAME'])
+        super()._clone_test_db(suffix, verbosity, keepdb)
@@ -0,0 +1,225 @@
+"""
+On-demand cProfile runs of API requests.
+
+RequestProfilingMiddleware profiles a request to the expense and category
+viewsets or the auth views when:
+
+- it carries ``X-Profile: <PROFILE_TOKEN>``, so one slow request can be
+  profiled in production by replaying it with the header;
+- it carries ``X-Profile`` with any other value and a JWT of a staff user;
+- or it is picked at random, at PROFILE_SAMPLE_RATE (0 to 1, off by default).
+
+The profile covers everything inside this middleware, rendering included.
+Alongside cProfile, a StackSampler thread records the request's stacks every
+PROFILE_STACK_INTERVAL_MS. Both are stored in a RequestProfile row (the
+newest PROFILE_KEEP are kept), so every worker's profiles can be browsed and
+downloaded from the admin, as a ``.prof`` file for pstats/snakeviz or as
+collapsed stacks for flamegraph.pl and speedscope. Requested profiles get an
+``X-Profile-Id`` response header.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils.crypto import constant_time_compare
+
+from api.models import RequestProfile
+from authentication.stateless import StatelessJWTAuthentication
+
+from .metrics import QueryTimer
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+AUTH_ROUTES = {'login', 'register', 'request-password-reset', 'verify-otp'}
+VIEWSET_ROUTE_PREFIXES = ('expense-', 'category-')
+
+
+def profiled_route(route):
+    return route in AUTH_ROUTES or route.startswith(VIEWSET_ROUTE_PREFIXES)
+
+
+class _StatsHolder:
+    # pstats.Stats loads anything with create_stats() and a ``stats`` dict.
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def load_stats(data, stream=None):
+    """A pstats.Stats for the marshalled data of a RequestProfile."""
+    return pstats.Stats(_StatsHolder(marshal.loads(data)), stream=stream or io.StringIO())
+
+
+def summary(data, limit=40):
+    """The ``limit`` most expensive functions by cumulative time, as pstats prints them."""
+    stream = io.StringIO()
+    load_stats(data, stream).sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+class StackSampler(threading.Thread):
+    """
+    Records the stack of one thread, below its frame ``root``, every
+    ``interval`` seconds until stopped, for collapsed stacks.
+
+    cProfile only keeps caller/callee pairs, which cannot tell apart the
+    levels of the middleware chain (every level calls the same wrapper);
+    sampled stacks are the real ones. The sampler needs the GIL to take a
+    sample, so samples land where the request releases it (in queries) or
+    at the interpreter's switch interval.
+    """
+
+    def __init__(self, thread_id, root, interval):
+        super().__init__(name='request-profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.samples = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root:
+                code = frame.f_code
+                # The file with its directory: views.py alone is ambiguous.
+                filename = '/'.join(code.co_filename.rsplit(os.sep, 2)[-2:])
+                stack.append((code.co_name, filename, code.co_firstlineno))
+                frame = frame.f_back
+            # An empty stack, one that does not reach ``root`` or one taken
+            # once stop() was called is from before or after the request.
+            if stack and frame is self.root and not self._done.is_set():
+                self.samples[tuple(reversed(stack))] += 1
+            del frame
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def collapsed(self):
+        """The samples as ``frame;frame;frame count`` lines, for flamegraph tools."""
+        return ''.join(
+            ';'.join(f'{name} ({filename}:{line})' for name, filename, line in stack) + f' {count}\n'
+            for stack, count in sorted(self.samples.items())
+        )
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return self.profile(request, trigger, self.get_response)
+
+    async def __acall__(self, request):
+        if not request.headers.get(PROFILE_HEADER) and not settings.PROFILE_SAMPLE_RATE:
+            return await self.get_response(request)
+        trigger = await sync_to_async(self.trigger)(request)
+        if trigger is None:
+            return await self.get_response(request)
+        # The profile runs in the request's sync thread, where sync views and
+        # the queries of async ones run too; async code on the event loop is
+        # not in it.
+        return await sync_to_async(self.profile)(request, trigger, async_to_sync(self.get_response))
+
+    def profile(self, request, trigger, get_response):
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), sys._getframe(), settings.PROFILE_STACK_INTERVAL_MS / 1000)
+        start = time.perf_counter()
+        with QueryTimer(None).active() as timer:
+            sampler.start()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+                sampler.stop()
+        duration = time.perf_counter() - start
+
+        profile_id = self.save(request, response, trigger, profiler, sampler, duration, timer)
+        if profile_id is not None and trigger != RequestProfile.SAMPLED:
+            response['X-Profile-Id'] = str(profile_id)
+        return response
+
+    def trigger(self, request):
+        """How this request was picked for profiling, or None."""
+        value = request.headers.get(PROFILE_HEADER)
+        if value:
+            if settings.PROFILE_TOKEN and constant_time_compare(value, settings.PROFILE_TOKEN):
+                trigger = RequestProfile.TOKEN
+            elif self.is_staff(request):
+                trigger = RequestProfile.STAFF
+            else:
+                trigger = None
+        elif settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            trigger = RequestProfile.SAMPLED
+        else:
+            return None
+
+        if trigger is not None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return None
+            if not match.view_name or not profiled_route(match.view_name):
+                return None
+        return trigger
+
+    def is_staff(self, request):
+        # The view authenticates the request again; this only runs for
+        # requests that ask to be profiled.
+        try:
+            authenticated = StatelessJWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        return authenticated is not None and authenticated[0].is_staff
+
+    def save(self, request, response, trigger, profiler, sampler, duration, timer):
+        profiler.create_stats()
+        # DRF puts the user it authenticated on the Django request as well.
+        user = getattr(request, 'user', None)
+        try:
+            profile = RequestProfile.objects.create(
+                method=request.method,
+                path=request.path[:255],
+                route=request.resolver_match.view_name if request.resolver_match else '',
+                user_id=user.pk if user is not None and user.is_authenticated else None,
+                status_code=response.status_code,
+                trigger=trigger,
+                duration_ms=duration * 1000,
+                db_ms=timer.seconds * 1000,
+                queries=timer.count,
+                stats=marshal.dumps(profiler.stats),
+                stacks=sampler.collapsed(),
+            )
+            RequestProfile.objects.filter(pk__lte=profile.pk - settings.PROFILE_KEEP).delete()
+        except Exception as e:
+            logger.error("Could not save the profile of %s %s: %s", request.method, request.path, e)
+            return None
+        return profile.pk
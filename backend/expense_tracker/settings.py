@@ -1,9 +1,12 @@
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
 import dj_database_url
 
+from expense_tracker.log import parse_levels, parse_sample_rates
+
 # Load environment variables
 load_dotenv()
 
@@ -32,6 +35,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover every other middleware.
+    'expense_tracker.metrics.RequestMetricsMiddleware',
+    'expense_tracker.profiling.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -62,14 +68,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'expense_tracker.wsgi.application'
+ASGI_APPLICATION = 'expense_tracker.asgi.application'
+
+# 'wsgi' (sync gunicorn workers) or 'asgi' (uvicorn workers); see
+# gunicorn.conf.py.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
 
 DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///' + str(BASE_DIR / 'db.sqlite3'),
-        conn_max_age=600
+        # Under ASGI a request's queries run in a thread that ends with the
+        # request, so a persistent connection would never be reused.
+        conn_max_age=0 if SERVER_MODE == 'asgi' else 600
     )
 }
 
+# Postgres only: with DATABASE_POOL=True each worker process lends its
+# threads connections from a psycopg_pool pool
+# (expense_tracker.pooled_postgresql) and each request hands its connection
+# back when it ends. A worker holds at most DATABASE_POOL_MAX_SIZE
+# connections, and only DATABASE_POOL_MIN_SIZE once it has been quiet for
+# DATABASE_POOL_MAX_IDLE seconds, so workers x MAX_SIZE may exceed the
+# server's max_connections as long as the workers are not all busy at once.
+# A request waits up to DATABASE_POOL_TIMEOUT seconds for a connection
+# before failing.
+DATABASE_POOL = os.getenv('DATABASE_POOL', 'False') == 'True'
+if DATABASE_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'expense_tracker.pooled_postgresql',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DATABASE_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DATABASE_POOL_MAX_SIZE', 4)),
+            'TIMEOUT': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+            'MAX_IDLE': float(os.getenv('DATABASE_POOL_MAX_IDLE', 300)),
+            'MAX_LIFETIME': float(os.getenv('DATABASE_POOL_MAX_LIFETIME', 3600)),
+            # An empty query on every checkout: a round trip per request, in
+            # exchange for never handing out a connection the server dropped.
+            'PRE_PING': os.getenv('DATABASE_POOL_PRE_PING', 'True') == 'True',
+        },
+    })
+
+# SQLite only: SQLITE_TUNED=True sets up every connection for several
+# workers sharing the database file (WAL, synchronous=NORMAL, a memory map,
+# a page cache of SQLITE_CACHE_KB, a busy timeout and BEGIN IMMEDIATE); see
+# expense_tracker/sqlite.py. WAL mode stays on in the file once set.
+SQLITE_TUNED = os.getenv('SQLITE_TUNED', 'False') == 'True'
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', 32 * 1024))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+# Cache settings: local memory per process by default, or a directory shared
+# by all workers on the host with CACHE_BACKEND=file. Either is safe with
+# several workers: the per-user data versions cached responses are keyed on
+# are kept in the database (see expenses.cache).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'expense_tracker_cache')),
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'expense-tracker',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))},
+        }
+    }
+
+# Seconds a versioned response (e.g. the dashboard) stays cached. Writes never
+# serve stale data regardless, as they change the per-user version.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 3600))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -122,6 +196,9 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'access-control-allow-origin',
+    'if-none-match',
+    'if-modified-since',
+    'x-profile',
 ]
 
 # Set CORS_ORIGIN_WHITELIST if needed
@@ -131,7 +208,6 @@ CORS_ORIGIN_WHITELIST = [
 ]
 
 # CORS middleware settings
-CORS_REPLACE_HTTPS_REFERER = True
 CORS_URLS_REGEX = r'^/api/.*$'
 
 # Security settings - disable for now to debug CORS
@@ -139,6 +215,11 @@ SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
 CSRF_COOKIE_HTTPONLY = False
+# Railway terminates TLS at its proxy and says so in X-Forwarded-Proto;
+# trust it so request.is_secure() and absolute URLs (pagination links) use
+# https. Turn off where clients can reach the app without the proxy.
+if os.getenv('BEHIND_TLS_PROXY', 'True') == 'True':
+    SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 CSRF_TRUSTED_ORIGINS = [
     'https://expensive-tracker-beta.vercel.app',
     'http://localhost:3000',
@@ -148,42 +229,85 @@ CSRF_TRUSTED_ORIGINS = [
 CORS_EXPOSE_HEADERS = [
     'access-control-allow-origin',
     'access-control-allow-credentials',
+    'x-cache',
+    'etag',
+    'last-modified',
+    'server-timing',
 ]
 
-# Logging configuration
+# Logging configuration (see expense_tracker.log). Records go through a
+# queue to a background thread that writes them to stdout, as JSON lines
+# (LOG_FORMAT=json) or text (LOG_FORMAT=text).
+# LOG_LEVEL is the root level and LOG_LEVELS overrides it per logger, e.g.
+# LOG_LEVELS=api=DEBUG,django.db.backends=DEBUG. LOG_SAMPLE keeps 1 in N
+# DEBUG records of a logger, e.g. LOG_SAMPLE=api=10.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
+        'json': {
+            '()': 'expense_tracker.log.JSONFormatter',
+        },
+        'text': {
+            'format': '{levelname} {asctime} {name} {message}',
             'style': '{',
         },
     },
+    'filters': {
+        'sampled_debug': {
+            '()': 'expense_tracker.log.SampledDebugFilter',
+            'every': parse_sample_rates(os.getenv('LOG_SAMPLE', '')),
+        },
+    },
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+        'background': {
+            'class': 'expense_tracker.log.BackgroundHandler',
+            'formatter': 'text' if LOG_FORMAT == 'text' else 'json',
+            'filters': ['sampled_debug'],
+            'queue_size': LOG_QUEUE_SIZE,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console'],
-            'level': 'INFO',
-            'propagate': True,
+            'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO').upper(),
         },
-        'api': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': True,
+        **{
+            name: {'level': level}
+            for name, level in parse_levels(os.getenv('LOG_LEVELS', '')).items()
         },
     },
     'root': {
-        'handlers': ['console'],
-        'level': 'DEBUG',
+        'handlers': ['background'],
+        'level': LOG_LEVEL,
     },
 }
 
+# Request metrics (see expense_tracker.metrics)
+# Queries slower than this many milliseconds are logged; unset to disable.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS')) if os.getenv('SLOW_QUERY_MS') else None
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'True') == 'True'
+# Bearer token Prometheus sends to /metrics; without one, /metrics is only
+# served when DEBUG is on.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Directory every worker process writes its metrics to, so a scrape of any
+# one of them reports all; gunicorn.conf.py sets it up. Unset, /metrics
+# reports the process that serves it.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_WRITE_INTERVAL = float(os.getenv('METRICS_WRITE_INTERVAL', 5))
+
+# Request profiling (see expense_tracker.profiling)
+# Share of API requests profiled at random, from 0 to 1.
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# Requests sending this value in an X-Profile header are always profiled.
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+# How often a profiled request's stack is sampled for flamegraphs.
+PROFILE_STACK_INTERVAL_MS = float(os.getenv('PROFILE_STACK_INTERVAL_MS', 1))
+# Number of stored profiles kept; older ones are deleted as new ones arrive.
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 200))
+
 # Email settings
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -200,20 +324,79 @@ DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER', 'noreply@expensetracker.com')
 # OTP settings
 OTP_EXPIRY_MINUTES = 10
 
+# Outbound email queue (see api.outbox; sent by `manage.py process_outbox`,
+# which gunicorn.conf.py runs beside the web workers unless OUTBOX_WORKER=False)
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 2))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 30))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 3600))
+# How long a worker may hold a batch before another worker retries it
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', 300))
+# Sent and failed messages (OTPs included) are deleted after this long
+OUTBOX_RETENTION_HOURS = int(os.getenv('OUTBOX_RETENTION_HOURS', 24))
+OUTBOX_PRUNE_INTERVAL = int(os.getenv('OUTBOX_PRUNE_INTERVAL', 3600))
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.stateless.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'expenses.renderers.FastJSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'expenses.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
+# JSON library of the API's renderer and parser: auto (orjson when it is
+# installed), orjson or stdlib (see expenses.renderers.FastJSONRenderer)
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+# Expense list pagination (see expenses.pagination.ExpenseCursorPagination);
+# opt-in per request unless EXPENSE_PAGINATE_BY_DEFAULT is on
+EXPENSE_PAGINATE_BY_DEFAULT = os.getenv('EXPENSE_PAGINATE_BY_DEFAULT', 'False') == 'True'
+EXPENSE_PAGE_SIZE = int(os.getenv('EXPENSE_PAGE_SIZE', 50))
+EXPENSE_MAX_PAGE_SIZE = int(os.getenv('EXPENSE_MAX_PAGE_SIZE', 500))
+
+# Largest list accepted by /api/expenses/bulk/
+EXPENSE_BULK_MAX_ITEMS = int(os.getenv('EXPENSE_BULK_MAX_ITEMS', 10000))
+
+# Default number of results from /api/expenses/search/
+EXPENSE_SEARCH_LIMIT = int(os.getenv('EXPENSE_SEARCH_LIMIT', 20))
+# Newest matches ranked per search on SQLite; older matches are not returned (see expenses.search)
+EXPENSE_SEARCH_CANDIDATES = int(os.getenv('EXPENSE_SEARCH_CANDIDATES', 200))
+
+# Delta sync (/api/expenses/changes/, see expenses.sync)
+EXPENSE_SYNC_PAGE_SIZE = int(os.getenv('EXPENSE_SYNC_PAGE_SIZE', 1000))
+EXPENSE_SYNC_SAFETY_WINDOW = int(os.getenv('EXPENSE_SYNC_SAFETY_WINDOW', 5))
+EXPENSE_TOMBSTONE_RETENTION_DAYS = int(os.getenv('EXPENSE_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Rows fetched per database round trip by the streaming export
+EXPENSE_EXPORT_CHUNK_SIZE = int(os.getenv('EXPENSE_EXPORT_CHUNK_SIZE', 2000))
+
+# Async read views (see expenses.async_views): run a view's independent
+# queries at the same time, each on a connection of its own. The reads run
+# in ASYNC_READ_THREADS threads per process, each keeping one connection for
+# ASYNC_READ_CONN_MAX_AGE seconds (CONN_MAX_AGE is 0 under ASGI). With
+# DATABASE_POOL they hand it back after every read instead: taking it out
+# again is cheap, and holding it would shrink the pool for requests.
+ASYNC_PARALLEL_READS = os.getenv('ASYNC_PARALLEL_READS', 'True') == 'True'
+ASYNC_READ_THREADS = int(os.getenv('ASYNC_READ_THREADS', '4'))
+ASYNC_READ_CONN_MAX_AGE = int(os.getenv(
+    'ASYNC_READ_CONN_MAX_AGE', 0 if DATABASES['default']['ENGINE'] == 'expense_tracker.pooled_postgresql' else 600
+))
+
 # JWT settings
+# Seconds a worker trusts its cached is_active for a token's user (see
+# authentication.stateless); how long a deactivated account keeps access.
+JWT_USER_STATUS_TTL = int(os.getenv('JWT_USER_STATUS_TTL', 30))
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -0,0 +1,58 @@
+"""
+SQLite set up for several worker processes sharing one database file.
+
+With SQLITE_TUNED on, each new SQLite connection gets:
+
+- ``journal_mode=WAL``: readers and the writer no longer block each
+  other. Writes still happen one at a time.
+- ``synchronous=NORMAL``: in WAL mode a commit is not fsynced, only each
+  checkpoint is. A power loss can lose the last commits but cannot corrupt
+  the file.
+- ``mmap_size``: pages are read from the OS page cache without a copy.
+- ``cache_size``: a larger page cache per connection.
+- ``busy_timeout``: a write waits up to SQLITE_BUSY_TIMEOUT_MS for the
+  write lock instead of failing with "database is locked".
+
+Transactions (``transaction.atomic``) also start with ``BEGIN IMMEDIATE``
+instead of ``BEGIN``. A deferred transaction takes the write lock at its
+first write. If another connection has written since the transaction
+began, SQLite cannot let it wait for the lock, and the write fails at
+once whatever the busy timeout. Taking the lock at BEGIN means the busy
+timeout applies. The atomic blocks in this project all write, so no reader
+is made to queue behind writers.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def pragmas(in_memory=False):
+    """The PRAGMA statements the profile runs on a new connection."""
+    statements = [
+        'PRAGMA synchronous = NORMAL',
+        f'PRAGMA cache_size = -{int(settings.SQLITE_CACHE_KB)}',
+        f'PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT_MS)}',
+    ]
+    if not in_memory:
+        # An in-memory database has no file to map or journal beside.
+        statements[:0] = ['PRAGMA journal_mode = WAL', f'PRAGMA mmap_size = {int(settings.SQLITE_MMAP_SIZE)}']
+    return statements
+
+
+def begin_immediate(execute, sql, params, many, context):
+    """Execute wrapper turning the BEGIN Django starts a transaction with into BEGIN IMMEDIATE."""
+    if sql == 'BEGIN':
+        sql = 'BEGIN IMMEDIATE'
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def apply_sqlite_profile(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNED:
+        return
+    for statement in pragmas(connection.is_in_memory_db()):
+        # On the sqlite3 connection itself: no transaction is open yet,
+        # and these are not the request's queries.
+        connection.connection.execute(statement).close()
+    if begin_immediate not in connection.execute_wrappers:
+        connection.execute_wrappers.append(begin_immediate)
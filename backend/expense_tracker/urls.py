@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('expenses.urls')),
     path('api/auth/', include('authentication.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
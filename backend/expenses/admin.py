@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Category, Expense
+from .search import matching, search_terms
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -15,3 +16,10 @@ class ExpenseAdmin(admin.ModelAdmin):
     search_fields = ('description',)
     ordering = ('-date', '-created_at')
     date_hierarchy = 'date'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index rather than LIKE '%...%' over descriptions.
+        terms = search_terms(search_term)
+        if not terms:
+            return super().get_search_results(request, queryset, search_term)
+        return matching(queryset, terms), False
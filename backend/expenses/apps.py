@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenses'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import ensure_installed
+        from expense_tracker import sqlite  # noqa: F401
+        # Migrations that rebuild the expense table drop the search triggers.
+        post_migrate.connect(ensure_installed, sender=self, dispatch_uid='expenses.search.ensure_installed')
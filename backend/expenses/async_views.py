@@ -0,0 +1,226 @@
+"""
+Async variants of the read endpoints, for ASGI deployments (SERVER_MODE=asgi).
+
+- ``/api/async/expenses/``: the expense list, with the filters, cursor
+  pagination and conditional GET of ``/api/expenses/``
+- ``/api/async/expenses/dashboard/``: the dashboard, sharing its cache
+- ``/api/async/categories/``: the category list
+
+With SERVER_MODE=asgi the endpoints the frontend calls (``/api/expenses/``,
+``/api/expenses/dashboard/``, ``/api/categories/``) are routed through
+``read_or_sync`` to these views for GET and HEAD, and to the viewsets for
+everything else.
+
+They answer like their DRF counterparts but are plain Django async views,
+so under uvicorn a request waiting on the database or a slow client holds
+no worker thread. Queries go through the async ORM. On Django 4.2 that runs
+each query through sync_to_async in the request's own thread, so queries
+awaited together still run one after the other; the dashboard's two
+independent reads are therefore run by ``gather_reads`` in a pool of
+ASYNC_READ_THREADS threads, on connections of their own, when
+ASYNC_PARALLEL_READS is on.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from authentication.stateless import StatelessJWTAuthentication
+
+from .cache import aget_or_compute
+from .conditional import auser_state, list_validators, set_validators
+from .filters import ExpenseFilterBackend
+from .models import Category, Expense
+from .pagination import ExpenseCursorPagination
+from .renderers import FastJSONRenderer
+from .representations import expense_representation
+from .serializers import CategorySerializer
+from .views import dashboard_data, dashboard_rollups, recent_expenses
+
+logger = logging.getLogger(__name__)
+
+authenticator = StatelessJWTAuthentication()
+
+# A pool of our own rather than the event loop's default executor: its
+# threads, and so the connections they hold, live as long as the process,
+# and there are never more than ASYNC_READ_THREADS of them.
+read_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_READ_THREADS, thread_name_prefix='async-read')
+
+
+def _render(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def async_api_view(view):
+    """
+    GET/HEAD only, authenticated the way the DRF views are, with DRF's error
+    responses. The view is called as ``view(request, user)``.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = _render({'detail': f'Method "{request.method}" not allowed.'}, 405)
+            response['Allow'] = 'GET, HEAD'
+            return response
+        try:
+            authenticated = await sync_to_async(authenticator.authenticate)(request)
+            if authenticated is None:
+                raise exceptions.NotAuthenticated()
+            # As DRF does, for the middleware (profiling, logging).
+            request.user = authenticated[0]
+            return await view(request, authenticated[0], *args, **kwargs)
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = _render(data, exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+    return wrapper
+
+
+def read_or_sync(view, sync_view):
+    """
+    Answer GET and HEAD with the async ``view`` and other methods with the
+    sync ``sync_view`` (a viewset's ``as_view()``), in a thread.
+    """
+    sync_view = sync_to_async(sync_view)
+
+    @functools.wraps(view)
+    async def dispatch(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    # As the viewsets are: JWT requests carry no CSRF token, and DRF checks
+    # session-authenticated ones itself.
+    dispatch.csrf_exempt = True
+    return dispatch
+
+
+async def gather_reads(*querysets):
+    """
+    Evaluate independent querysets, returning a list of rows for each: at
+    the same time on connections of their own when ASYNC_PARALLEL_READS is
+    on, otherwise one after the other on the request's connection. The
+    latter also inside a transaction, whose uncommitted rows other
+    connections would not see.
+    """
+    if settings.ASYNC_PARALLEL_READS and not await sync_to_async(_in_transaction)():
+        return await asyncio.gather(*(
+            sync_to_async(_read_on_own_connection, thread_sensitive=False, executor=read_executor)(queryset)
+            for queryset in querysets
+        ))
+    results = []
+    for queryset in querysets:
+        # Not aiterator(): on Django 4.2 it runs values_list() queries
+        # synchronously, on the event loop.
+        results.append([row async for row in queryset])
+    return results
+
+
+def _in_transaction():
+    return connection.in_atomic_block
+
+
+_read_thread = threading.local()
+
+
+def _read_on_own_connection(queryset):
+    # Pool threads keep their connection between reads and drop it only
+    # once it is broken or older than ASYNC_READ_CONN_MAX_AGE.
+    connection.close_if_unusable_or_obsolete()
+    try:
+        return list(queryset)
+    finally:
+        _keep_connection()
+        connection.close_if_unusable_or_obsolete()
+
+
+def _keep_connection():
+    # connect() sets the connection's close_at from CONN_MAX_AGE, which is
+    # 0 under ASGI because request threads don't outlive their request.
+    # These threads do, so a new connection gets an age of its own.
+    if connection.connection is not None and connection.connection is not getattr(_read_thread, 'connection', None):
+        _read_thread.connection = connection.connection
+        connection.close_at = time.monotonic() + settings.ASYNC_READ_CONN_MAX_AGE
+
+
+def close_read_connections(executor=None, threads=None):
+    """
+    Close the connections held by the threads of ``executor`` (read_executor
+    with ASYNC_READ_THREADS threads by default); PostgreSQL will not drop a
+    test database while they are open. Each close has to run in its own
+    thread, so every call waits until all ``threads`` threads have one.
+    """
+    executor = executor or read_executor
+    barrier = threading.Barrier(threads or settings.ASYNC_READ_THREADS)
+
+    def close():
+        barrier.wait()
+        connection.close()
+
+    for future in [executor.submit(close) for _ in range(barrier.parties)]:
+        future.result()
+
+
+@async_api_view
+async def expense_list(request, user):
+    etag, last_modified = list_validators(request, user, 'json', await auser_state(user))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        api_request = Request(request)
+        queryset = expense_representation.rows(
+            ExpenseFilterBackend().filter_queryset(api_request, Expense.objects.filter(user=user), None)
+        )
+        paginator = ExpenseCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, api_request)
+        if page is None:
+            data = expense_representation.many([row async for row in queryset])
+        else:
+            data = paginator.get_paginated_data(expense_representation.many(page))
+        response = _render(data)
+    return set_validators(response, etag, last_modified)
+
+
+@async_api_view
+async def category_list(request, user):
+    etag, last_modified = list_validators(
+        request, user, 'json', await auser_state(user, include_expenses=False)
+    )
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        categories = [category async for category in Category.objects.filter(user=user).aiterator()]
+        response = _render(CategorySerializer(categories, many=True).data)
+    return set_validators(response, etag, last_modified)
+
+
+@async_api_view
+async def dashboard_stats(request, user):
+    now = timezone.now()
+    current_month = date(now.year, now.month, 1)
+
+    async def compute():
+        rollups, recent = await gather_reads(dashboard_rollups(user), recent_expenses(user))
+        return dashboard_data(rollups, recent, current_month)
+
+    try:
+        # The same cache entry as ExpenseViewSet.dashboard_stats.
+        data, hit = await aget_or_compute('dashboard', user.pk, compute, vary=current_month.isoformat())
+    except Exception as e:
+        logger.error("Error fetching dashboard stats: %s", e)
+        return _render({"error": "Failed to fetch dashboard statistics"}, 500)
+    response = _render(data)
+    response['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
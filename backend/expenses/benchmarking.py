@@ -0,0 +1,803 @@
+"""
+Endpoint benchmarks.
+
+``run_benchmark`` drives every route of ``expenses.urls`` and
+``authentication.urls`` as one user (typically made by
+``manage.py generate_synthetic_data``), either in process through DRF's
+test client or over HTTP against a running server such as a local
+gunicorn. For each scenario it reports p50/p95/p99 latency, queries per
+request and peak RSS, as a JSON-serialisable dict that
+``manage.py benchmark_endpoints`` saves and compares across commits.
+
+Query counts come from counting executions in process, and from the
+``db`` entry of the Server-Timing header (see expense_tracker.metrics)
+over HTTP. Peak RSS is this process's in process; over HTTP it is read
+from /proc for ``server_pid`` and its children, where available. The
+uncached dashboard scenario invalidates the user's cached responses by
+bumping their data version, which lives in the database, so it works
+over HTTP too.
+
+Writes use data the scenario sets up and removes itself, outside the
+timed request: created expenses are dated MARK_DATE and deleted after
+each request, created categories and accounts are deleted, and updates
+write back the values already stored. Cleanups only delete rows created
+after the run started, and the user's password hash is put back after
+the password reset scenario. Still, the scenarios that write change the
+configured database and the user's account, so run_benchmark() only runs
+them with ``throwaway=True``: for a disposable database and a user from
+``generate_synthetic_data``, never production data.
+
+``run_concurrency`` (``manage.py benchmark_concurrency``) instead loads a
+running server with slow clients and measures one read endpoint alongside
+them, to compare the sync and ASGI serving modes. ``run_json_benchmark``
+(``manage.py benchmark_json``) times the JSON renderers and parsers alone.
+``run_sqlite_benchmark`` (``manage.py benchmark_sqlite``) runs a read/write
+mix from several processes against SQLite files of their own, with and
+without SQLITE_TUNED (expense_tracker.sqlite).
+"""
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlparse
+from urllib.request import Request, urlopen
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import URLResolver
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.models import OutboundEmail, PasswordResetOTP
+from authentication.stateless import tokens_for_user
+from expense_tracker.metrics import QueryTimer
+
+from .cache import bump_data_version
+from .models import Category, Expense
+from .parsers import FastJSONParser
+from .renderers import JSON_BACKENDS, FastJSONRenderer, orjson
+from .representations import expense_representation
+from .serializers import ExpenseSerializer
+from .synthetic import create_users, generate
+
+URLCONFS = ('expenses.urls', 'authentication.urls')
+MARK_DATE = date(1990, 1, 1)
+BULK_ITEMS = 100
+
+
+def route_names(urlconf):
+    """Every named route declared by ``urlconf``, following include()s."""
+    names = set()
+    patterns = list(import_module(urlconf).urlpatterns)
+    while patterns:
+        pattern = patterns.pop()
+        if isinstance(pattern, URLResolver):
+            patterns.extend(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of ``values`` (``fraction`` in 0..1)."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Scenario:
+    """
+    One request to benchmark. ``prepare(context)`` returns the request as a
+    dict (``path`` plus optional ``data`` and ``format``); ``cleanup`` undoes
+    what the request wrote. Neither is timed.
+    """
+
+    def __init__(self, route, method, prepare, cleanup=None, label=None, writes=False):
+        self.route = route
+        self.method = method
+        self.prepare = prepare
+        self.cleanup = cleanup
+        self.label = label or f'{method.upper()} {route}'
+        self.writes = writes
+
+
+class BenchmarkContext:
+    def __init__(self, user, password):
+        self.user = user
+        self.password = password
+        self.expense = Expense.objects.filter(user=user).order_by('-date', '-id').first()
+        self.category = Category.objects.filter(user=user).first()
+        if self.expense is None or self.category is None:
+            raise ValueError(f'{user.username} needs at least one expense and one category')
+        recent = Expense.objects.filter(user=user).order_by('-date', '-id')[:BULK_ITEMS]
+        self.recent = list(recent.values('id', 'description'))
+        self.search_term = self.expense.description.split()[0][:4]
+        # Cleanups delete only rows created after these.
+        self.last_expense = Expense.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.last_category = Category.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.last_otp = PasswordResetOTP.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.password_hash = user.password
+
+    def marked_expense(self, index=0):
+        return {
+            'amount': '9.99',
+            'description': f'Benchmark {index}',
+            'date': MARK_DATE.isoformat(),
+            'category': self.category.pk,
+        }
+
+    def delete_marked(self, *args):
+        Expense.objects.filter(user=self.user, date=MARK_DATE, pk__gt=self.last_expense).delete()
+
+    def delete_categories(self, *args):
+        Category.objects.filter(user=self.user, name__startswith='benchmark-', pk__gt=self.last_category).delete()
+
+    def delete_otps(self, *args):
+        PasswordResetOTP.objects.filter(user=self.user, pk__gt=self.last_otp).delete()
+
+    def unique_name(self):
+        return f'benchmark-{uuid.uuid4().hex[:12]}'
+
+
+def _statement(context):
+    rows = ['date,description,amount']
+    rows += [f'{MARK_DATE.isoformat()},Benchmark import {index},9.99' for index in range(BULK_ITEMS)]
+    return ('\n'.join(rows) + '\n').encode()
+
+
+def _prepare_delete_expense(context):
+    expense = Expense.objects.create(user=context.user, **{
+        **context.marked_expense(), 'category': context.category
+    })
+    return {'path': f'/api/expenses/{expense.pk}/'}
+
+
+def _prepare_delete_category(context):
+    category = Category.objects.create(user=context.user, name=context.unique_name())
+    return {'path': f'/api/categories/{category.pk}/'}
+
+
+def _prepare_register(context):
+    context.registered = context.unique_name()
+    return {'path': '/api/auth/register/', 'data': {'username': context.registered, 'password': context.password}}
+
+
+def _prepare_password_reset(context):
+    context.last_email = OutboundEmail.objects.aggregate(last=Max('pk'))['last'] or 0
+    return {'path': '/api/auth/request-password-reset/', 'data': {'email': context.user.email}}
+
+
+def _cleanup_password_reset(context, status):
+    OutboundEmail.objects.filter(pk__gt=context.last_email, to=[context.user.email]).delete()
+    context.delete_otps()
+
+
+def _prepare_verify_otp(context):
+    PasswordResetOTP.objects.create(user=context.user, otp='246810')
+    return {'path': '/api/auth/verify-otp/', 'data': {
+        'email': context.user.email, 'otp': '246810', 'new_password': context.password,
+    }}
+
+
+def _cleanup_verify_otp(context, status):
+    context.delete_otps()
+    # The reset stored a new hash (of the same password); keep the old one.
+    User.objects.filter(pk=context.user.pk).update(password=context.password_hash)
+
+
+def _prepare_cold_dashboard(context, path='/api/expenses/dashboard/'):
+    # A new data version, as after any write: the next read recomputes.
+    bump_data_version(context.user.pk)
+    return {'path': path}
+
+
+def default_scenarios():
+    """Reads first, then writes, then the authentication endpoints."""
+    return [
+        Scenario('api-root', 'get', lambda c: {'path': '/api/'}),
+        Scenario('expense-list', 'get', lambda c: {'path': '/api/expenses/'}),
+        Scenario('expense-list', 'get', lambda c: {'path': f'/api/expenses/?page_size=500&category={c.category.pk}'},
+                 label='GET expense-list (500, one category)'),
+        Scenario('expense-detail', 'get', lambda c: {'path': f'/api/expenses/{c.expense.pk}/'}),
+        Scenario('expense-export', 'get', lambda c: {'path': '/api/expenses/export/?format=csv'}),
+        Scenario('expense-search', 'get', lambda c: {'path': f'/api/expenses/search/?q={c.search_term}'}),
+        Scenario('expense-changes', 'get', lambda c: {'path': '/api/expenses/changes/'}),
+        Scenario('expense-dashboard-stats', 'get', lambda c: {'path': '/api/expenses/dashboard/'}),
+        Scenario('expense-dashboard-stats', 'get', _prepare_cold_dashboard,
+                 label='GET expense-dashboard-stats (uncached)'),
+        Scenario('category-list', 'get', lambda c: {'path': '/api/categories/'}),
+        Scenario('category-detail', 'get', lambda c: {'path': f'/api/categories/{c.category.pk}/'}),
+        Scenario('async-expense-list', 'get', lambda c: {'path': '/api/async/expenses/'}),
+        Scenario('async-expense-dashboard-stats', 'get',
+                 lambda c: _prepare_cold_dashboard(c, '/api/async/expenses/dashboard/'),
+                 label='GET async-expense-dashboard-stats (uncached)'),
+        Scenario('async-category-list', 'get', lambda c: {'path': '/api/async/categories/'}),
+
+        Scenario('expense-list', 'post', lambda c: {'path': '/api/expenses/', 'data': c.marked_expense()},
+                 BenchmarkContext.delete_marked, writes=True),
+        Scenario('expense-detail', 'patch', lambda c: {
+            'path': f'/api/expenses/{c.expense.pk}/', 'data': {'description': c.expense.description},
+        }, writes=True),
+        Scenario('expense-detail', 'delete', _prepare_delete_expense, writes=True),
+        Scenario('expense-bulk', 'post', lambda c: {
+            'path': '/api/expenses/bulk/', 'data': [c.marked_expense(index) for index in range(BULK_ITEMS)],
+        }, BenchmarkContext.delete_marked, writes=True),
+        Scenario('expense-bulk', 'patch', lambda c: {'path': '/api/expenses/bulk/', 'data': c.recent}, writes=True),
+        Scenario('expense-import-statement', 'post', lambda c: {
+            'path': '/api/expenses/import/', 'format': 'multipart',
+            'data': {'file': _named_file('statement.csv', _statement(c))},
+        }, BenchmarkContext.delete_marked, writes=True),
+        Scenario('category-list', 'post', lambda c: {'path': '/api/categories/', 'data': {'name': c.unique_name()}},
+                 BenchmarkContext.delete_categories, writes=True),
+        Scenario('category-detail', 'put', lambda c: {
+            'path': f'/api/categories/{c.category.pk}/', 'data': {'name': c.category.name},
+        }, writes=True),
+        Scenario('category-detail', 'delete', _prepare_delete_category, writes=True),
+
+        Scenario('login', 'post', lambda c: {
+            'path': '/api/auth/login/', 'data': {'username': c.user.username, 'password': c.password},
+        }),
+        Scenario('register', 'post', _prepare_register,
+                 lambda c, status: User.objects.filter(username=c.registered).delete(), writes=True),
+        Scenario('request-password-reset', 'post', _prepare_password_reset, _cleanup_password_reset, writes=True),
+        Scenario('verify-otp', 'post', _prepare_verify_otp, _cleanup_verify_otp, writes=True),
+    ]
+
+
+def uncovered_routes(scenarios):
+    """Routes of URLCONFS that no scenario requests."""
+    routes = set().union(*(route_names(urlconf) for urlconf in URLCONFS))
+    return routes - {scenario.route for scenario in scenarios}
+
+
+def _named_file(name, content):
+    return SimpleUploadedFile(name, content, content_type='text/csv')
+
+
+class InProcessTarget:
+    """Requests through DRF's APIClient in this process."""
+    name = 'client'
+
+    def __init__(self, user):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(user).access_token}')
+
+    def request(self, method, path, data=None, format='json'):
+        # Counts queries in every thread the request uses, as the metrics do.
+        with QueryTimer(None).active() as timer:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(path, data, format=format)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, timer.count
+
+    def peak_rss_kb(self):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class HTTPTarget:
+    """Requests over HTTP to a running server at ``base_url``."""
+    name = 'http'
+
+    def __init__(self, user, base_url, server_pid=None, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.server_pid = server_pid
+        self.timeout = timeout
+        self.authorization = f'Bearer {tokens_for_user(user).access_token}'
+
+    def request(self, method, path, data=None, format='json'):
+        headers = {'Authorization': self.authorization, 'Accept': 'application/json, text/csv'}
+        body = None
+        if method == 'get':
+            if data:
+                path = f'{path}{"&" if "?" in path else "?"}{urlencode(data)}'
+        elif format == 'multipart':
+            body = encode_multipart(BOUNDARY, data or {})
+            headers['Content-Type'] = MULTIPART_CONTENT
+        else:
+            body = json.dumps(data).encode() if data is not None else None
+            headers['Content-Type'] = 'application/json'
+
+        request = Request(self.base_url + path, data=body, headers=headers, method=method.upper())
+        start = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status, server_timing = response.status, response.headers.get('Server-Timing', '')
+        except HTTPError as error:
+            error.read()
+            status, server_timing = error.code, error.headers.get('Server-Timing', '')
+        elapsed = time.perf_counter() - start
+        return status, elapsed, _queries_from_server_timing(server_timing)
+
+    def peak_rss_kb(self):
+        if not self.server_pid:
+            return None
+        return sum(filter(None, (_vm_hwm_kb(pid) for pid in _process_tree(self.server_pid)))) or None
+
+
+def _queries_from_server_timing(header):
+    for entry in header.split(','):
+        name, *params = [part.strip() for part in entry.split(';')]
+        if name == 'db':
+            for param in params:
+                if param.startswith('desc='):
+                    try:
+                        return int(param[5:].strip('"').split()[0])
+                    except (ValueError, IndexError):
+                        return None
+    return None
+
+
+def _process_tree(pid):
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as children:
+            pids += [int(child) for child in children.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def _vm_hwm_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_scenario(scenario, context, target, iterations, warmup):
+    latencies, queries, statuses = [], [], {}
+    for run in range(warmup + iterations):
+        request = scenario.prepare(context)
+        status, elapsed, count = target.request(
+            scenario.method, request['path'], request.get('data'), request.get('format', 'json')
+        )
+        if scenario.cleanup:
+            scenario.cleanup(context, status)
+        if run < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        if count is not None:
+            queries.append(count)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'route': scenario.route,
+        'method': scenario.method.upper(),
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+        'statuses': statuses,
+        'peak_rss_kb': target.peak_rss_kb(),
+    }
+
+
+def run_benchmark(user, password, target, scenarios=None, iterations=30, warmup=3, progress=None,
+                  throwaway=False):
+    """
+    Run ``scenarios`` (default: all) against ``target``; return the report.
+    Scenarios that write need ``throwaway``: the database and the user are
+    disposable.
+    """
+    scenarios = default_scenarios() if scenarios is None else scenarios
+    writes = sorted({scenario.label for scenario in scenarios if scenario.writes})
+    if writes and not throwaway:
+        raise ValueError(
+            f"{', '.join(writes)} write to the database and to {user.username}'s account; "
+            'run them only against a throwaway database and user'
+        )
+    context = BenchmarkContext(user, password)
+    results = {}
+    for scenario in scenarios:
+        results[scenario.label] = run_scenario(scenario, context, target, iterations, warmup)
+        if progress:
+            progress(scenario.label, results[scenario.label])
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'target': target.name,
+            'url': getattr(target, 'base_url', None),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'pid': os.getpid(),
+            'user': user.username,
+            'expenses': Expense.objects.filter(user=user).count(),
+            'iterations': iterations,
+            'warmup': warmup,
+        },
+        'results': results,
+        'peak_rss_kb': target.peak_rss_kb(),
+    }
+
+
+def compare(previous, current, metric='p50_ms'):
+    """``(label, before, after, change)`` rows for the scenarios in both reports."""
+    rows = []
+    for label, result in current['results'].items():
+        before = previous['results'].get(label, {}).get(metric)
+        after = result.get(metric)
+        change = (after - before) / before if before and after is not None else None
+        rows.append((label, before, after, change))
+    return rows
+
+
+async def _slow_client(host, port, path, seconds, stop):
+    # Dribbles the request line and headers over ``seconds``, like a client on
+    # a bad connection; a sync worker is held for all of it.
+    lines = [f'GET {path} HTTP/1.1\r\n', f'Host: {host}\r\n', 'X-Slow-Client: 1\r\n', 'Connection: close\r\n']
+    errors = 0
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                for line in lines:
+                    writer.write(line.encode())
+                    await writer.drain()
+                    await asyncio.sleep(seconds / len(lines))
+                writer.write(b'\r\n')
+                await writer.drain()
+                await reader.read()
+            finally:
+                writer.close()
+        except OSError:
+            errors += 1
+            await asyncio.sleep(0.1)
+    return errors
+
+
+async def _probe(host, port, path, authorization, stop, latencies, statuses):
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAuthorization: {authorization}\r\n'
+        'Connection: close\r\n\r\n'
+    ).encode()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                await reader.read()
+            finally:
+                writer.close()
+            status = status_line.split()[1].decode() if len(status_line.split()) > 1 else 'error'
+        except OSError:
+            status = 'error'
+        if status != 'error':
+            latencies.append((time.perf_counter() - start) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def _run_concurrency(host, port, path, authorization, slow_clients, slow_seconds, probes, duration):
+    stop = asyncio.Event()
+    latencies, statuses = [], {}
+    slow = [asyncio.create_task(_slow_client(host, port, path, slow_seconds, stop)) for _ in range(slow_clients)]
+    # Let the slow clients take their connections before probing.
+    await asyncio.sleep(min(1.0, slow_seconds / 2))
+    fast = [
+        asyncio.create_task(_probe(host, port, path, authorization, stop, latencies, statuses))
+        for _ in range(probes)
+    ]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*fast)
+    slow_errors = sum(await asyncio.gather(*slow))
+    return latencies, statuses, slow_errors
+
+
+def run_concurrency(user, base_url, path, slow_clients=50, slow_seconds=5.0, probes=4, duration=10.0):
+    """
+    Measure ``path`` under load from slow clients: ``slow_clients``
+    connections that each take ``slow_seconds`` to send their headers, while
+    ``probes`` clients request ``path`` back to back for ``duration``
+    seconds. Reports the probes' latency percentiles and throughput, to
+    compare a sync worker pool (where slow clients hold workers) with
+    SERVER_MODE=asgi.
+    """
+    url = urlparse(base_url)
+    host, port = url.hostname, url.port or 80
+    authorization = f'Bearer {tokens_for_user(user).access_token}'
+    latencies, statuses, slow_errors = asyncio.run(_run_concurrency(
+        host, port, path, authorization, slow_clients, slow_seconds, probes, duration
+    ))
+    if not latencies:
+        raise ValueError(f'No request to {base_url}{path} completed')
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'url': base_url,
+            'path': path,
+            'slow_clients': slow_clients,
+            'slow_seconds': slow_seconds,
+            'probes': probes,
+            'duration_s': duration,
+        },
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / duration, 2),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(max(latencies), 3),
+        'statuses': statuses,
+        'slow_client_errors': slow_errors,
+    }
+
+
+def synthetic_expenses(rows):
+    """``rows`` unsaved expenses, with categories, as the list endpoint reads them."""
+    categories = [Category(id=index + 1, name=name) for index, name in enumerate(('Groceries', 'Rent', 'Café & Bakery'))]
+    created = timezone.now()
+    return [
+        Expense(
+            id=index + 1, amount=Decimal(index % 50000 + 1) / 100, description=f'Synthetic expense {index}',
+            category=categories[index % 4] if index % 4 < 3 else None,
+            date=date(2024, 1, 1) + timedelta(days=index % 365), created_at=created, updated_at=created,
+        )
+        for index in range(rows)
+    ]
+
+
+def synthetic_rows(expenses):
+    """The ``values()`` rows expense_representation reads for ``expenses``."""
+    return [
+        {
+            'id': expense.id, 'amount': expense.amount, 'description': expense.description,
+            'category': expense.category_id, 'category__name': expense.category.name if expense.category else None,
+            'date': expense.date, 'created_at': expense.created_at, 'updated_at': expense.updated_at,
+        }
+        for expense in expenses
+    ]
+
+
+def json_payload(rows):
+    """ExpenseSerializer data for ``rows`` unsaved expenses, as the list endpoint renders them."""
+    return ExpenseSerializer(synthetic_expenses(rows), many=True).data
+
+
+def _time(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_json_benchmark(rows=(10000, 100000), iterations=5, backends=None):
+    """
+    Time rendering and parsing ExpenseSerializer payloads of each size in
+    ``rows`` with DRF's JSONRenderer/JSONParser ('drf') and with
+    FastJSONRenderer/FastJSONParser on each backend, and building them with
+    ExpenseSerializer and with expense_representation.
+    """
+    backends = backends or [backend for backend in JSON_BACKENDS if backend != 'orjson' or orjson is not None]
+    results, build = {}, {}
+    for size in rows:
+        expenses = synthetic_expenses(size)
+        data = ExpenseSerializer(expenses, many=True).data
+        expected = JSONRenderer().render(data)
+
+        # Building the payload, before any rendering: the serializer or
+        # expense_representation (expenses.representations).
+        records = synthetic_rows(expenses)
+        serializer_ms = _time(lambda: ExpenseSerializer(expenses, many=True).data, iterations)
+        representation_ms = _time(lambda: expense_representation.many(records), iterations)
+        build[str(size)] = {
+            'serializer_p50_ms': round(percentile(serializer_ms, 0.50), 3),
+            'representation_p50_ms': round(percentile(representation_ms, 0.50), 3),
+        }
+        implementations = {'drf': (JSONRenderer(), JSONParser())}
+        for backend in backends:
+            renderer, parser = FastJSONRenderer(), FastJSONParser()
+            renderer.backend = parser.backend = backend
+            implementations[backend] = (renderer, parser)
+
+        results[str(size)] = {}
+        for name, (renderer, parser) in implementations.items():
+            body = renderer.render(data)
+            if body != expected:
+                raise ValueError(f'{name} renders {size} rows differently from JSONRenderer')
+            render_ms = _time(lambda: renderer.render(data), iterations)
+            parse_ms = _time(lambda: parser.parse(io.BytesIO(body)), iterations)
+            results[str(size)][name] = {
+                'bytes': len(body),
+                'render_p50_ms': round(percentile(render_ms, 0.50), 3),
+                'render_min_ms': round(min(render_ms), 3),
+                'parse_p50_ms': round(percentile(parse_ms, 0.50), 3),
+                'parse_min_ms': round(min(parse_ms), 3),
+            }
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'orjson': getattr(orjson, '__version__', None),
+            'iterations': iterations,
+        },
+        'results': results,
+        'build': build,
+    }
+
+
+SQLITE_PROFILES = ('default', 'tuned')
+SQLITE_READ_PATHS = ('/api/expenses/', '/api/expenses/?page=2', '/api/expenses/dashboard/')
+
+
+@contextmanager
+def _sqlite_database(path, tuned):
+    """Point the default database at the SQLite file ``path``, with or without SQLITE_TUNED."""
+    if connection.vendor != 'sqlite':
+        raise ValueError('The SQLite benchmark needs the default database to be SQLite')
+    connections.close_all()
+    settings_dict = connection.settings_dict
+    name = settings_dict['NAME']
+    settings_dict['NAME'] = path
+    try:
+        with override_settings(SQLITE_TUNED=tuned):
+            yield
+    finally:
+        connections.close_all()
+        settings_dict['NAME'] = name
+
+
+def _sqlite_worker(user_id, category_id, start_at, duration, write_share, seed, results):
+    target = InProcessTarget(User.objects.get(pk=user_id))
+    rng = random.Random(seed)
+    reads, writes, errors = [], [], {}
+    time.sleep(max(start_at - time.time(), 0))
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        write = rng.random() < write_share
+        try:
+            if write:
+                status, elapsed, _ = target.request('post', '/api/expenses/', {
+                    'amount': '9.99', 'description': f'Benchmark {seed}', 'date': MARK_DATE.isoformat(),
+                    'category': category_id,
+                })
+            else:
+                status, elapsed, _ = target.request('get', rng.choice(SQLITE_READ_PATHS))
+        except Exception as exc:
+            # "database is locked" surfaces here, as the test client re-raises.
+            error = f'{type(exc).__name__}: {exc}'
+            errors[error] = errors.get(error, 0) + 1
+            continue
+        if status >= 400:
+            errors[f'HTTP {status}'] = errors.get(f'HTTP {status}', 0) + 1
+        else:
+            (writes if write else reads).append(elapsed * 1000)
+    results.put((reads, writes, errors))
+
+
+def _rounded_percentile(values, fraction):
+    value = percentile(values, fraction)
+    return None if value is None else round(value, 3)
+
+
+def run_sqlite_profile(path, tuned, processes=4, duration=10.0, write_share=0.2, expenses=2000):
+    """
+    Seed a new SQLite database at ``path``, then have ``processes`` forked
+    processes, one user each, send requests through the test client back
+    to back for ``duration`` seconds, as that many sync gunicorn workers
+    would. A ``write_share`` of requests create an expense; the rest read
+    the expense list or the dashboard.
+    """
+    with _sqlite_database(path, tuned):
+        call_command('migrate', verbosity=0, interactive=False)
+        user_ids = create_users(processes, 'sqlite-benchmark', 'sqlite-benchmark-password')
+        generate(user_ids, max(expenses // processes, 1), years=1, seed=1)
+        categories = dict(Category.objects.filter(user_id__in=user_ids).values_list('user_id', 'pk'))
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        # Each process opens its own connection.
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        start_at = time.time() + 0.5
+        workers = [
+            context.Process(target=_sqlite_worker, args=(
+                user_id, categories[user_id], start_at, duration, write_share, index, results
+            ))
+            for index, user_id in enumerate(user_ids)
+        ]
+        for worker in workers:
+            worker.start()
+        reads, writes, errors = [], [], {}
+        for _ in workers:
+            worker_reads, worker_writes, worker_errors = results.get(timeout=duration + 60)
+            reads.extend(worker_reads)
+            writes.extend(worker_writes)
+            for error, count in worker_errors.items():
+                errors[error] = errors.get(error, 0) + count
+        for worker in workers:
+            worker.join()
+
+    return {
+        'journal_mode': journal_mode,
+        'throughput_rps': round((len(reads) + len(writes)) / duration, 2),
+        'reads': len(reads),
+        'writes': len(writes),
+        'read_p50_ms': _rounded_percentile(reads, 0.50),
+        'read_p95_ms': _rounded_percentile(reads, 0.95),
+        'write_p50_ms': _rounded_percentile(writes, 0.50),
+        'write_p95_ms': _rounded_percentile(writes, 0.95),
+        'write_p99_ms': _rounded_percentile(writes, 0.99),
+        'errors': errors,
+    }
+
+
+def run_sqlite_benchmark(processes=4, duration=10.0, write_share=0.2, expenses=2000, profiles=SQLITE_PROFILES):
+    """``run_sqlite_profile`` for each of ``profiles``, each on a new database file."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='sqlite-benchmark-') as directory:
+        for profile in profiles:
+            if profile not in SQLITE_PROFILES:
+                raise ValueError(f'Unknown SQLite profile {profile!r}; use one of {", ".join(SQLITE_PROFILES)}')
+            results[profile] = run_sqlite_profile(
+                os.path.join(directory, f'{profile}.sqlite3'), profile == 'tuned',
+                processes=processes, duration=duration, write_share=write_share, expenses=expenses,
+            )
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'processes': processes,
+            'duration_s': duration,
+            'write_share': write_share,
+            'expenses': expenses,
+        },
+        'results': results,
+    }
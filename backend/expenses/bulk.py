@@ -0,0 +1,236 @@
+"""
+Bulk expense writes.
+
+Rows are validated with ExpenseSerializer's own field objects, so error
+messages match the single-item endpoints. Category ownership is checked
+against one query for all of the user's category ids rather than a
+PrimaryKeyRelatedField lookup per row. Rows are written in a single
+transaction and the rollups are adjusted once per (month, category) pair
+touched.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+
+from .cache import bump_data_version
+from .models import Category, Expense, ExpenseRollup
+from .serializers import ExpenseSerializer
+
+
+class ExpenseRowValidator:
+    def __init__(self, request):
+        self.user = request.user
+        serializer = ExpenseSerializer(context={'request': request})
+        self.fields = {name: serializer.fields[name] for name in ('amount', 'description', 'date')}
+        self.validate_amount = serializer.validate_amount
+        self.category_ids = set(
+            Category.objects.filter(user=self.user).values_list('pk', flat=True)
+        )
+        # Valid amounts and dates, by input: imports repeat them a lot.
+        self.memos = {'amount': {}, 'date': {}}
+
+    def validate(self, name, raw):
+        memo = self.memos.get(name)
+        # By type too, or True would share 1's entry.
+        key = (type(raw), raw) if isinstance(raw, (str, int, float)) else None
+        if memo is not None and key in memo:
+            return memo[key]
+        value = self.fields[name].run_validation(raw)
+        if name == 'amount':
+            value = self.validate_amount(value)
+        if memo is not None and key is not None:
+            memo[key] = value
+        return value
+
+    def clean(self, item, partial=False):
+        """Return ``(values, errors)`` for one row of input."""
+        if not isinstance(item, dict):
+            return {}, {'non_field_errors': ['Expected an object.']}
+
+        values, errors = {}, {}
+        for name, field in self.fields.items():
+            if name not in item:
+                if not partial:
+                    errors[name] = [field.error_messages['required']]
+                continue
+            try:
+                values[name] = self.validate(name, item[name])
+            except SkipField:
+                pass
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail if isinstance(exc.detail, list) else [exc.detail]
+
+        if 'category' in item:
+            category_id = item['category']
+            if category_id in (None, ''):
+                values['category_id'] = None
+            else:
+                try:
+                    category_id = int(category_id)
+                except (TypeError, ValueError):
+                    errors['category'] = ['Incorrect type. Expected pk value.']
+                else:
+                    if category_id in self.category_ids:
+                        values['category_id'] = category_id
+                    else:
+                        errors['category'] = ['Invalid category selected.']
+        return values, errors
+
+
+def check_batch_size(items):
+    """Return an error message if ``items`` is not an acceptable bulk payload."""
+    if not isinstance(items, list):
+        return 'Expected a list of expenses.'
+    if not items:
+        return 'Expected at least one expense.'
+    if len(items) > settings.EXPENSE_BULK_MAX_ITEMS:
+        return f'At most {settings.EXPENSE_BULK_MAX_ITEMS} expenses can be sent at once.'
+    return None
+
+
+INSERT_FIELDS = ('user', 'category', 'amount', 'description', 'date', 'created_at', 'updated_at')
+
+
+class _ValuePreparer:
+    """
+    get_db_prep_save() for a list of fields, memoized per field: bulk rows
+    share most of their user, category, date and timestamp values.
+    """
+    def __init__(self, fields):
+        self.fields = [(field, {}) for field in fields]
+
+    def __call__(self, expense):
+        values = []
+        for field, memo in self.fields:
+            raw = getattr(expense, field.attname)
+            try:
+                value = memo[raw]
+            except KeyError:
+                value = memo[raw] = field.get_db_prep_save(raw, connection)
+            values.append(value)
+        return values
+
+
+def _insert_one_by_one(expenses):
+    # Without INSERT ... RETURNING (SQLite before 3.35) bulk_create() leaves
+    # the pks unset; a single-row INSERT's lastrowid is the only safe source.
+    fields = [Expense._meta.get_field(name) for name in INSERT_FIELDS]
+    quote = connection.ops.quote_name
+    insert = (
+        f"INSERT INTO {quote(Expense._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+    prepare = _ValuePreparer(fields)
+    with connection.cursor() as cursor:
+        for expense in expenses:
+            cursor.execute(insert, prepare(expense))
+            expense.pk = cursor.lastrowid
+            expense._state.adding = False
+
+
+def _executemany_update(expenses, names):
+    fields = [Expense._meta.get_field(name) for name in names]
+    quote = connection.ops.quote_name
+    assignments = ', '.join(f'{quote(field.column)} = %s' for field in fields)
+    prepare = _ValuePreparer(fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(Expense._meta.db_table)} SET {assignments} '
+            f'WHERE {quote(Expense._meta.pk.column)} = %s',
+            [prepare(expense) + [expense.pk] for expense in expenses]
+        )
+
+
+def insert_expenses(user, expenses, batch_size=1000):
+    """Insert unsaved ``expenses`` for ``user`` and keep rollups and caches in step."""
+    with transaction.atomic():
+        now = timezone.now()
+        for expense in expenses:
+            expense.created_at = expense.updated_at = now
+        if connection.features.can_return_rows_from_bulk_insert:
+            Expense.objects.bulk_create(expenses, batch_size=batch_size)
+        else:
+            _insert_one_by_one(expenses)
+        ExpenseRollup.objects.add_expenses(expenses)
+        # Neither path sends post_save signals.
+        transaction.on_commit(lambda: bump_data_version(user.pk))
+    return expenses
+
+
+def bulk_create_expenses(request, items):
+    """
+    Validate and insert every item, or nothing.
+
+    Returns ``(expenses, errors)``; ``errors`` has one dict per item (empty for
+    valid ones) when anything failed validation.
+    """
+    validator = ExpenseRowValidator(request)
+    expenses, errors = [], []
+    for item in items:
+        values, item_errors = validator.clean(item)
+        errors.append(item_errors)
+        if not item_errors:
+            expenses.append(Expense(user=request.user, **values))
+    if any(errors):
+        return [], errors
+    return insert_expenses(request.user, expenses), []
+
+
+def bulk_update_expenses(request, items):
+    """
+    Apply partial updates, each item identified by its ``id``, or nothing.
+
+    Returns ``(expenses, errors)`` like bulk_create_expenses.
+    """
+    validator = ExpenseRowValidator(request)
+    ids = []
+    for item in items:
+        try:
+            ids.append(int(item['id']))
+        except (TypeError, ValueError, KeyError):
+            ids.append(None)
+    with transaction.atomic():
+        # Locked, in pk order so that concurrent batches queue rather than
+        # deadlock, until the rollup deltas worked out from them are applied.
+        existing = Expense.objects.filter(user=request.user).select_for_update().order_by('pk').in_bulk(
+            [pk for pk in ids if pk is not None]
+        )
+
+        previous, changed_fields, errors = {}, set(), []
+        for pk, item in zip(ids, items):
+            if pk is None:
+                errors.append({'id': ['A valid expense id is required.']})
+                continue
+            if pk not in existing:
+                errors.append({'id': ['Expense not found.']})
+                continue
+            values, item_errors = validator.clean(item, partial=True)
+            errors.append(item_errors)
+            if item_errors:
+                continue
+            expense = existing[pk]
+            previous.setdefault(pk, expense.rollup_state())
+            for name, value in values.items():
+                setattr(expense, name, value)
+            changed_fields.update(values)
+        if any(errors):
+            return [], errors
+
+        expenses = [existing[pk] for pk in previous]
+        if not changed_fields:
+            return expenses, []
+        now = timezone.now()
+        for expense in expenses:
+            expense.updated_at = now
+        # A prepared per-row UPDATE rather than bulk_update(), whose CASE
+        # expressions are far slower, and which would also go through
+        # ExpenseQuerySet.update()'s full per-user rollup rebuild. The exact
+        # rollup deltas are applied right after instead.
+        _executemany_update(expenses, sorted(changed_fields) + ['updated_at'])
+        ExpenseRollup.objects.record_changes(
+            (previous[expense.pk], expense.rollup_state()) for expense in expenses
+        )
+        transaction.on_commit(lambda: bump_data_version(request.user.pk))
+    return expenses, []
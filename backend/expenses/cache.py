@@ -0,0 +1,98 @@
+"""
+Per-user versioned response caching.
+
+Every Expense/Category write increments the owning user's data version
+(see ``expenses.signals``). Cached entries are keyed on that version, so
+an entry computed before a write is simply never looked up again and
+expires on its own; nothing has to be purged explicitly.
+
+The version is a DataVersion row rather than a cache key: with the
+default per-process cache, a version kept in the cache would only change
+in the worker that handled the write, and the others would keep serving
+their entries for RESPONSE_CACHE_TIMEOUT. Reading it is one primary key
+lookup per cached response. Entries themselves can stay per process; a
+worker that has not seen a version yet just computes it once.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+ENTRY_KEY = 'expenses:{name}:{user_id}:{version}:{vary}'
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def get_data_version(user_id):
+    return DataVersion.objects.current(user_id)
+
+
+async def aget_data_version(user_id):
+    return await DataVersion.objects.acurrent(user_id)
+
+
+def bump_data_version(user_id):
+    DataVersion.objects.bump(user_id)
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        counts = _stats.setdefault(name, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+
+def cache_stats():
+    """Return ``{name: {'hits': n, 'misses': n}}`` for this process."""
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+
+def get_or_compute(name, user_id, compute, vary='', timeout=None):
+    """
+    Return ``(data, hit)`` for the cached entry ``name`` of a user, calling
+    ``compute()`` and storing the result on a miss.
+    """
+    key = ENTRY_KEY.format(
+        name=name,
+        user_id=user_id,
+        version=get_data_version(user_id),
+        vary=vary
+    )
+    data = cache.get(key)
+    if data is not None:
+        _record(name, 'hits')
+        return data, True
+
+    _record(name, 'misses')
+    data = compute()
+    if timeout is None:
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+    cache.set(key, data, timeout)
+    return data, False
+
+
+async def aget_or_compute(name, user_id, compute, vary='', timeout=None):
+    """get_or_compute for async views; ``compute`` is a coroutine function."""
+    key = ENTRY_KEY.format(
+        name=name,
+        user_id=user_id,
+        version=await aget_data_version(user_id),
+        vary=vary
+    )
+    data = await cache.aget(key)
+    if data is not None:
+        _record(name, 'hits')
+        return data, True
+
+    _record(name, 'misses')
+    data = await compute()
+    if timeout is None:
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+    await cache.aset(key, data, timeout)
+    return data, False
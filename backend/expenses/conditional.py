@@ -0,0 +1,107 @@
+"""
+Conditional GET for the expense and category lists.
+
+Validators come from one query of per-user aggregates: the latest
+updated_at and the row count of each model, plus the user's
+DeletionCounter, since a delete leaves no timestamp behind. Expense counts
+are summed from ExpenseRollup rather than counted row by row. When the
+client's If-None-Match / If-Modified-Since still match, the view answers
+304 without running its list query or serializer.
+"""
+import hashlib
+
+from django.contrib.auth.models import User
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Category, Expense, ExpenseRollup
+
+
+def _aggregate(queryset, expression, output_field=None):
+    # A scalar subquery: the aggregate over the outer user's rows.
+    return Subquery(
+        queryset.filter(user=OuterRef('pk')).order_by().values('user')
+        .annotate(value=expression).values('value')[:1],
+        output_field=output_field
+    )
+
+
+def _user_state_query(user, include_expenses):
+    annotations = {
+        'category_updated': _aggregate(Category.objects.all(), Max('updated_at')),
+        'category_count': _aggregate(Category.objects.all(), Count('id'), IntegerField()),
+    }
+    if include_expenses:
+        annotations['expense_updated'] = _aggregate(Expense.objects.all(), Max('updated_at'))
+        annotations['expense_count'] = _aggregate(
+            ExpenseRollup.objects.all(), Sum('expense_count'), IntegerField()
+        )
+    return (
+        User.objects.filter(pk=user.pk)
+        .annotate(**annotations)
+        # A LEFT JOIN: there is no DeletionCounter until the first delete.
+        .values('deletion_counter__deletions', 'deletion_counter__last_deleted_at', *annotations)
+    )
+
+
+def user_state(user, include_expenses=True):
+    """The aggregates the validators of ``user``'s lists are built from."""
+    return _user_state_query(user, include_expenses).get()
+
+
+async def auser_state(user, include_expenses=True):
+    return await _user_state_query(user, include_expenses).aget()
+
+
+def list_validators(request, user, renderer_format, state):
+    """The ``(etag, last_modified)`` of a list response built from ``state``."""
+    # The path and query string pick the page and filters; the renderer
+    # tells JSON from the browsable API.
+    key = repr((
+        request.get_full_path(),
+        renderer_format,
+        user.pk,
+        sorted(state.items()),
+    ))
+    etag = '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+    timestamps = [
+        value for name, value in state.items()
+        if name.endswith(('_updated', '_deleted_at')) and value is not None
+    ]
+    # HTTP dates have whole seconds; If-None-Match, which clients send
+    # along with If-Modified-Since, catches changes within one.
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return etag, last_modified
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Browsers must revalidate, and shared caches never store it.
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class ConditionalListMixin:
+    """
+    Adds ETag / Last-Modified to a viewset's ``list`` and answers matching
+    conditional requests with 304 Not Modified.
+
+    Set ``conditional_include_expenses`` to False for lists that do not show
+    expense data.
+    """
+    conditional_include_expenses = True
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.list_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def list_validators(self, request):
+        state = user_state(request.user, self.conditional_include_expenses)
+        return list_validators(request, request.user, request.accepted_renderer.format, state)
@@ -0,0 +1,128 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .pagination import FALSE_VALUES, MAX_INTEGER, MIN_INTEGER, TRUE_VALUES
+
+
+class ExpenseFilterBackend(BaseFilterBackend):
+    """
+    Server-side filters for the expense list.
+
+    ``date_after`` / ``date_before`` (inclusive) or ``month=YYYY-MM``,
+    ``category`` (repeated or comma separated ids), ``uncategorized``,
+    ``amount_min`` / ``amount_max`` and ``ordering``.
+
+    Only orderings that an index on ``Expense`` serves are accepted, each
+    mapped to the full index order, ending in ``id``: ties come back in the
+    same order with or without ExpenseCursorPagination's keyset, which
+    walks the index without a sort:
+
+    - ``-date`` (default) / ``date``: expense_user_date_idx, or
+      expense_user_category_date_idx when filtering on a single category.
+    - ``-amount`` / ``amount``: expense_user_amount_idx.
+
+    An amount range in date order is read through the amount index and the
+    matching rows sorted; order by amount to page through a wide range
+    without the sort.
+    """
+    ordering_param = 'ordering'
+    orderings = {
+        'date': ['date', 'created_at', 'id'],
+        '-date': ['-date', '-created_at', '-id'],
+        'amount': ['amount', 'id'],
+        '-amount': ['-amount', '-id'],
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        conditions = Q()
+
+        if 'month' in params:
+            first, following = self._month(params['month'])
+            conditions &= Q(date__gte=first, date__lt=following)
+        if 'date_after' in params:
+            conditions &= Q(date__gte=self._date('date_after', params['date_after']))
+        if 'date_before' in params:
+            conditions &= Q(date__lte=self._date('date_before', params['date_before']))
+
+        if 'amount_min' in params:
+            conditions &= Q(amount__gte=self._amount('amount_min', params['amount_min']))
+        if 'amount_max' in params:
+            conditions &= Q(amount__lte=self._amount('amount_max', params['amount_max']))
+
+        category_ids = self._category_ids(params.getlist('category'))
+        uncategorized = self._boolean('uncategorized', params.get('uncategorized'))
+        if category_ids and uncategorized:
+            conditions &= Q(category_id__in=category_ids) | Q(category__isnull=True)
+        elif category_ids:
+            conditions &= Q(category_id__in=category_ids)
+        elif uncategorized is not None:
+            conditions &= Q(category__isnull=uncategorized)
+
+        queryset = queryset.filter(conditions)
+        ordering = params.get(self.ordering_param)
+        if ordering:
+            if ordering not in self.orderings:
+                raise ValidationError({
+                    self.ordering_param: [f"Choose one of: {', '.join(self.orderings)}."]
+                })
+            queryset = queryset.order_by(*self.orderings[ordering])
+        return queryset
+
+    @staticmethod
+    def _date(name, value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({name: ['Enter a date as YYYY-MM-DD.']})
+
+    @staticmethod
+    def _month(value):
+        """The first day of the month ``value`` and of the month after it."""
+        try:
+            year, month = value.split('-')
+            first = date(int(year), int(month), 1)
+            # December 9999 has no following month in a date.
+            return first, date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        except ValueError:
+            raise ValidationError({'month': ['Enter a month between 0001-01 and 9999-11 as YYYY-MM.']})
+
+    @staticmethod
+    def _amount(name, value):
+        try:
+            amount = Decimal(value)
+        except InvalidOperation:
+            raise ValidationError({name: ['Enter a number.']})
+        if not amount.is_finite():
+            raise ValidationError({name: ['Enter a number.']})
+        return amount
+
+    @staticmethod
+    def _category_ids(values):
+        ids = set()
+        for value in values:
+            for part in value.split(','):
+                if not part.strip():
+                    continue
+                try:
+                    ids.add(int(part))
+                except ValueError:
+                    raise ValidationError({'category': ['Enter category ids.']})
+        if any(not MIN_INTEGER <= pk <= MAX_INTEGER for pk in ids):
+            raise ValidationError({'category': ['Category id out of range.']})
+        return sorted(ids)
+
+    @staticmethod
+    def _boolean(name, value):
+        if value is None or value == '':
+            return None
+        value = value.lower()
+        if value in TRUE_VALUES:
+            return True
+        if value in FALSE_VALUES:
+            return False
+        raise ValidationError({name: ['Enter true or false.']})
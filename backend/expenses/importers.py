@@ -0,0 +1,297 @@
+"""
+Streaming bank-statement import.
+
+Parsers are generators over a text stream and yield one transaction at a
+time, so a statement is never held in memory as a whole. StatementImporter
+resolves categories against a name -> id map built once per user and writes
+expenses with insert_expenses() in fixed-size chunks, each in its own
+transaction. After every chunk it reports progress and the number of input
+rows it has fully handled, which is the checkpoint an interrupted import
+resumes from.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+
+from .bulk import insert_expenses
+from .models import Category, Expense
+
+FORMATS = ('csv', 'ofx', 'qif')
+# Bank formats record money leaving the account as a negative amount; a
+# spreadsheet of expenses (or our own export) lists them as positive.
+DEBITS_NEGATIVE = {'csv': False, 'ofx': True, 'qif': True}
+# Year-first dates read only one way. Day-first and month-first ones are
+# tried in the statement's date order; without one, a date that reads
+# both ways (02/03/2024) is refused rather than guessed. Two-digit years
+# are for QIF, whose dates read like 1/15'24 (parse_date turns the
+# apostrophe into a slash).
+YEAR_FIRST_FORMATS = ('%Y-%m-%d', '%Y%m%d')
+DATE_ORDER_FORMATS = {
+    'dmy': ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y'),
+    'mdy': ('%m/%d/%Y', '%m-%d-%Y', '%m.%d.%Y', '%m/%d/%y'),
+}
+DATE_ORDERS = tuple(DATE_ORDER_FORMATS)
+# QIF comes from US software and is month-first; OFX dates are YYYYMMDD.
+DEFAULT_DATE_ORDER = {'csv': None, 'ofx': None, 'qif': 'mdy'}
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'value date'),
+    'description': ('description', 'narration', 'details', 'payee', 'memo'),
+    'amount': ('amount', 'debit', 'withdrawal'),
+    # An export's category column holds ids; prefer its category_name.
+    'category': ('category_name', 'category'),
+}
+AMOUNT_PLACES = Decimal('0.01')
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in FORMATS else 'csv'
+
+
+def parse_csv(stream):
+    reader = csv.DictReader(stream)
+    try:
+        yield from _csv_rows(reader)
+    except csv.Error as exc:
+        # E.g. a field past csv.field_size_limit(): the file is not a CSV
+        # we can read, which is the uploader's to fix.
+        raise ImportRowError(f'Malformed CSV at line {reader.line_num}: {exc}')
+
+
+def _csv_rows(reader):
+    headers = {name.strip().lower(): name for name in reader.fieldnames or []}
+    columns = {}
+    for target, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[target] = headers[alias]
+                break
+    for target in ('date', 'description', 'amount'):
+        if target not in columns:
+            raise ImportRowError(f"CSV header has no '{target}' column")
+
+    for row in reader:
+        yield {
+            'date': row.get(columns['date']),
+            'description': row.get(columns['description']),
+            'amount': row.get(columns['amount']),
+            'category': row.get(columns['category']) if 'category' in columns else None,
+        }
+
+
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def parse_ofx(stream):
+    # OFX 1.x is SGML with optional closing tags and OFX 2.x is XML; both
+    # delimit transactions with <STMTTRN>...</STMTTRN>, which is all we need.
+    fields = None
+    for line in stream:
+        upper = line.upper()
+        if '<STMTTRN>' in upper:
+            fields = {}
+        if fields is not None:
+            for tag, value in OFX_FIELD.findall(line):
+                fields.setdefault(tag.upper(), value.strip())
+        if '</STMTTRN>' in upper and fields is not None:
+            yield {
+                'date': fields.get('DTPOSTED', '')[:8],
+                'description': fields.get('NAME') or fields.get('MEMO'),
+                'amount': fields.get('TRNAMT'),
+                'category': None,
+            }
+            fields = None
+
+
+def parse_qif(stream):
+    record = {}
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if record:
+                yield {
+                    'date': record.get('D'),
+                    'description': record.get('P') or record.get('M'),
+                    'amount': record.get('T') or record.get('U'),
+                    'category': record.get('L', '').split(':')[0] or None,
+                }
+            record = {}
+        else:
+            record.setdefault(code, value)
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx, 'qif': parse_qif}
+
+
+def read_statement(binary_file, statement_format):
+    """Yield parsed rows from an open binary file, decoding it lazily."""
+    stream = io.TextIOWrapper(binary_file, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        yield from PARSERS[statement_format](stream)
+    finally:
+        # Don't let the wrapper close a file the caller owns.
+        stream.detach()
+
+
+def _strptime(value, date_formats):
+    for date_format in date_formats:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date(value, date_formats=None, date_order=None):
+    """
+    Parse ``value`` with ``date_formats`` if given, else as a year-first
+    date or in ``date_order`` ('dmy' or 'mdy'; None refuses dates that
+    read both ways).
+    """
+    value = (value or '').strip().replace("'", '/')
+    if date_formats:
+        parsed = _strptime(value, date_formats)
+    else:
+        parsed = _strptime(value, YEAR_FIRST_FORMATS)
+        if parsed is None and date_order:
+            parsed = _strptime(value, DATE_ORDER_FORMATS[date_order])
+        elif parsed is None:
+            day_first = _strptime(value, DATE_ORDER_FORMATS['dmy'])
+            month_first = _strptime(value, DATE_ORDER_FORMATS['mdy'])
+            if day_first and month_first and day_first != month_first:
+                raise ImportRowError(f'Ambiguous date: {value!r}; say whether days or months come first')
+            parsed = day_first or month_first
+    if parsed is None:
+        raise ImportRowError(f'Unrecognised date: {value!r}')
+    return parsed
+
+
+def parse_amount(value, debits_negative):
+    text = (value or '').strip().replace(',', '')
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ImportRowError(f'Unrecognised amount: {value!r}')
+    # Decimal() also reads NaN and Infinity, which no comparison survives.
+    if not amount.is_finite():
+        raise ImportRowError(f'Unrecognised amount: {value!r}')
+    if debits_negative:
+        # Statement debits are negative; deposits and refunds aren't expenses.
+        amount = -amount
+    try:
+        amount = amount.quantize(AMOUNT_PLACES)
+    except InvalidOperation:
+        # More digits than Decimal's precision, e.g. 1e999999.
+        raise ImportRowError(f'Amount too large: {value!r}')
+    if amount <= 0:
+        return None
+    if amount > MAX_AMOUNT:
+        raise ImportRowError(f'Amount too large: {value!r}')
+    return amount
+
+
+class StatementImporter:
+    """
+    Import parsed statement rows for one user.
+
+    ``date_formats`` (strptime formats) or ``date_order`` ('dmy' or 'mdy')
+    say how to read dates; see parse_date. ``progress`` is called after
+    every committed chunk with the running
+    counts; its ``rows`` value is safe to pass back as ``resume_from``.
+    """
+
+    def __init__(self, user, chunk_size=1000, create_categories=False,
+                 debits_negative=True, date_formats=None, date_order=None,
+                 progress=None, max_errors=100):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.create_categories = create_categories
+        self.debits_negative = debits_negative
+        self.date_formats = date_formats
+        self.date_order = date_order
+        self.progress = progress
+        self.max_errors = max_errors
+        self.categories = {
+            name.lower(): pk
+            for pk, name in Category.objects.filter(user=user).values_list('pk', 'name')
+        }
+        self.stats = {'rows': 0, 'imported': 0, 'skipped': 0, 'failed': 0}
+        self.errors = []
+
+    def run(self, rows, resume_from=0):
+        self.stats['rows'] = resume_from
+        chunk = []
+        for index, row in enumerate(rows, start=1):
+            if index <= resume_from:
+                continue
+            try:
+                expense = self.build_expense(row)
+            except ImportRowError as exc:
+                self.stats['failed'] += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append({'row': index, 'error': str(exc)})
+                expense = None
+            else:
+                if expense is None:
+                    self.stats['skipped'] += 1
+            if expense is not None:
+                chunk.append(expense)
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk, index)
+                chunk = []
+            elif not chunk:
+                self.stats['rows'] = index
+        if chunk:
+            self._flush(chunk, index)
+        return self.stats
+
+    def build_expense(self, row):
+        amount = parse_amount(row['amount'], self.debits_negative)
+        if amount is None:
+            return None
+        description = (row['description'] or '').strip()
+        if not description:
+            raise ImportRowError('Missing description')
+        return Expense(
+            user=self.user,
+            amount=amount,
+            description=description,
+            date=parse_date(row['date'], self.date_formats, self.date_order),
+            category_id=self.resolve_category(row.get('category')),
+        )
+
+    def resolve_category(self, name):
+        name = (name or '').strip()[:100]
+        if not name:
+            return None
+        key = name.lower()
+        if key not in self.categories:
+            if not self.create_categories:
+                self.categories[key] = None
+            else:
+                try:
+                    with transaction.atomic():
+                        category = Category.objects.create(user=self.user, name=name)
+                except IntegrityError:
+                    category = Category.objects.get(user=self.user, name=name)
+                self.categories[key] = category.pk
+        return self.categories[key]
+
+    def _flush(self, chunk, rows):
+        insert_expenses(self.user, chunk)
+        self.stats['imported'] += len(chunk)
+        self.stats['rows'] = rows
+        if self.progress:
+            self.progress(dict(self.stats))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from expenses.seeding import seed_default_categories
+
+class Command(BaseCommand):
+    help = 'Gives every existing user the default categories they are missing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users seeded per transaction (one read and one insert each)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+
+        processed = created = 0
+        # Keyset over the primary key rather than OFFSET, so each batch is
+        # an index range however far into the table it is.
+        last_pk = 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            created += seed_default_categories(batch)
+            processed += len(batch)
+            last_pk = batch[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{processed} users processed, {created} categories created')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {created} default categories for {processed} users')
+        )
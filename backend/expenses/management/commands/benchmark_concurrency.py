@@ -0,0 +1,45 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses.benchmarking import run_concurrency
+
+class Command(BaseCommand):
+    help = 'Measures a read endpoint of a running server while slow clients hold connections open'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='The running server')
+        parser.add_argument('--user', default='synthetic1', help='User to request as (see generate_synthetic_data)')
+        parser.add_argument('--path', default='/api/expenses/', help='Endpoint to measure, e.g. /api/async/expenses/')
+        parser.add_argument('--slow-clients', type=int, default=50, help='Connections sending their headers slowly')
+        parser.add_argument('--slow-seconds', type=float, default=5.0, help='Seconds each slow client takes per request')
+        parser.add_argument('--probes', type=int, default=4, help='Clients requesting the endpoint back to back')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to measure for')
+        parser.add_argument('--output', help='Write the JSON report here (default: stdout only)')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f"User {options['user']} does not exist; create one with generate_synthetic_data"
+            )
+
+        try:
+            report = run_concurrency(
+                user, options['url'], options['path'],
+                slow_clients=options['slow_clients'], slow_seconds=options['slow_seconds'],
+                probes=options['probes'], duration=options['duration']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"{report['requests']} requests ({report['throughput_rps']}/s)  p50 {report['p50_ms']:.2f} ms  "
+            f"p95 {report['p95_ms']:.2f} ms  p99 {report['p99_ms']:.2f} ms  statuses {report['statuses']}"
+        )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,87 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from expenses.benchmarking import (
+    HTTPTarget, InProcessTarget, compare, default_scenarios, run_benchmark, uncovered_routes
+)
+
+class Command(BaseCommand):
+    help = 'Benchmarks every API endpoint and writes p50/p95/p99 latency, query counts and peak RSS as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='synthetic1', help='User to benchmark as (see generate_synthetic_data)')
+        parser.add_argument('--password', default='synthetic-password', help="That user's password")
+        parser.add_argument('--url', help='Benchmark a running server (e.g. http://127.0.0.1:8000) instead of in process')
+        parser.add_argument('--server-pid', type=int, help='Server process whose peak RSS to report with --url')
+        parser.add_argument('--iterations', type=int, default=30, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario first')
+        parser.add_argument('--only', help='Comma separated route names to run, e.g. expense-dashboard-stats')
+        parser.add_argument('--read-only', action='store_true', help='Skip scenarios that write')
+        parser.add_argument(
+            '--throwaway', action='store_true',
+            help='The database and user are disposable: also run the scenarios that write to them'
+        )
+        parser.add_argument('--output', help='Write the JSON report here (default: stdout only)')
+        parser.add_argument('--compare', help='An earlier JSON report to compare p50/p95 against')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f"User {options['user']} does not exist; create one with generate_synthetic_data"
+            )
+
+        scenarios = default_scenarios()
+        missing = uncovered_routes(scenarios)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"No benchmark for routes: {', '.join(sorted(missing))}"))
+        if options['only']:
+            routes = {route.strip() for route in options['only'].split(',')}
+            scenarios = [scenario for scenario in scenarios if scenario.route in routes]
+        if options['read_only']:
+            scenarios = [scenario for scenario in scenarios if not scenario.writes]
+        if not scenarios:
+            raise CommandError('No scenarios selected')
+        if not options['throwaway'] and any(scenario.writes for scenario in scenarios):
+            raise CommandError(
+                f"Some scenarios write to the {connection.settings_dict['NAME']} database and to "
+                f"{user.username}'s account; pass --throwaway if both are disposable, or --read-only"
+            )
+
+        if options['url']:
+            target = HTTPTarget(user, options['url'], options['server_pid'])
+        else:
+            target = InProcessTarget(user)
+
+        def progress(label, result):
+            self.stdout.write(
+                f"{label:<45} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                f"p99 {result['p99_ms']:>9.2f} ms  queries {result['queries']}"
+            )
+
+        try:
+            report = run_benchmark(
+                user, options['password'], target, scenarios,
+                iterations=options['iterations'], warmup=options['warmup'], progress=progress,
+                throwaway=options['throwaway']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['compare']:
+            with open(options['compare']) as previous_file:
+                previous = json.load(previous_file)
+            self.stdout.write(f"\nCompared with {options['compare']} ({previous['meta'].get('commit')}):")
+            for metric in ('p50_ms', 'p95_ms'):
+                for label, before, after, change in compare(previous, report, metric):
+                    if change is not None:
+                        self.stdout.write(f'{label:<45} {metric} {before:>9.2f} -> {after:>9.2f} ms ({change:+.1%})')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
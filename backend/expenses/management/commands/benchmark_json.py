@@ -0,0 +1,40 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from expenses.benchmarking import run_json_benchmark
+
+class Command(BaseCommand):
+    help = 'Times building, rendering and parsing expense list payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10000,100000', help='Comma separated payload sizes, in expenses')
+        parser.add_argument('--iterations', type=int, default=5, help='Timed runs per payload and backend')
+        parser.add_argument('--output', help='Write the JSON report here (default: stdout only)')
+
+    def handle(self, *args, **options):
+        try:
+            rows = [int(size) for size in options['rows'].split(',')]
+        except ValueError:
+            raise CommandError('--rows must be comma separated numbers')
+
+        try:
+            report = run_json_benchmark(rows, iterations=options['iterations'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for size, results in report['results'].items():
+            for name, result in results.items():
+                self.stdout.write(
+                    f"{size:>7} rows  {name:<7} render {result['render_p50_ms']:>9.2f} ms  "
+                    f"parse {result['parse_p50_ms']:>9.2f} ms  {result['bytes']} bytes"
+                )
+        for size, result in report['build'].items():
+            self.stdout.write(
+                f"{size:>7} rows  build   serializer {result['serializer_p50_ms']:>9.2f} ms  "
+                f"representation {result['representation_p50_ms']:>9.2f} ms"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
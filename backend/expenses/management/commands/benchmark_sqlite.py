@@ -0,0 +1,39 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from expenses.benchmarking import SQLITE_PROFILES, run_sqlite_benchmark
+
+class Command(BaseCommand):
+    help = 'Compares read/write throughput of several processes on SQLite with and without SQLITE_TUNED'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes, one user each')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds each profile runs for')
+        parser.add_argument('--write-share', type=float, default=0.2, help='Share of requests that create an expense')
+        parser.add_argument('--expenses', type=int, default=2000, help='Expenses seeded in each database')
+        parser.add_argument('--profiles', default=','.join(SQLITE_PROFILES), help='Comma separated: default,tuned')
+        parser.add_argument('--output', help='Write the JSON report here (default: stdout only)')
+
+    def handle(self, *args, **options):
+        try:
+            report = run_sqlite_benchmark(
+                processes=options['processes'], duration=options['duration'], write_share=options['write_share'],
+                expenses=options['expenses'], profiles=[profile.strip() for profile in options['profiles'].split(',')],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for profile, result in report['results'].items():
+            self.stdout.write(
+                f"{profile:<8} {result['journal_mode']:<7} {result['throughput_rps']:>8.1f} req/s  "
+                f"{result['reads']} reads (p95 {result['read_p95_ms']} ms)  "
+                f"{result['writes']} writes (p95 {result['write_p95_ms']} ms)  "
+                f"{sum(result['errors'].values())} errors"
+            )
+            for error, count in result['errors'].items():
+                self.stdout.write(self.style.WARNING(f'  {count} x {error}'))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from expenses.models import Category
+from expenses.seeding import seed_default_categories
 
 class Command(BaseCommand):
     help = 'Creates default user and categories'
@@ -20,27 +20,5 @@ class Command(BaseCommand):
         # Get or create the default user
         default_user = User.objects.get(username=username)
 
-        # Default categories
-        default_categories = [
-            'Food & Dining',
-            'Transportation',
-            'Shopping',
-            'Entertainment',
-            'Bills & Utilities',
-            'Health & Medical',
-            'Travel',
-            'Education',
-            'Personal Care',
-            'Others'
-        ]
-
-        # Create categories
-        for category_name in default_categories:
-            category, created = Category.objects.get_or_create(
-                name=category_name,
-                user=default_user
-            )
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'Created category: {category_name}'))
-            else:
-                self.stdout.write(self.style.WARNING(f'Category {category_name} already exists'))
+        created = seed_default_categories([default_user.pk])
+        self.stdout.write(self.style.SUCCESS(f'Created {created} default categories'))
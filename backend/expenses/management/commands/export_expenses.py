@@ -0,0 +1,32 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from expenses.exporters import FORMATS, stream_export
+
+class Command(BaseCommand):
+    help = 'Exports each user\'s expenses to its own CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Only export this username')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output-dir', type=str, default='exports', help='Directory for the export files')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User {options['user']} does not exist")
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        exported = 0
+        for user in users.only('pk', 'username').iterator():
+            path = os.path.join(options['output_dir'], f"{user.username}.{options['format']}")
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                for block in stream_export(user, options['format'], options['chunk_size']):
+                    f.write(block)
+            exported += 1
+            self.stdout.write(f'Exported expenses for user: {user.username} -> {path}')
+
+        self.stdout.write(self.style.SUCCESS(f'Exported expenses for {exported} users'))
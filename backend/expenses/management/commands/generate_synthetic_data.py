@@ -0,0 +1,45 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from expenses.synthetic import create_users, generate
+
+class Command(BaseCommand):
+    help = 'Creates users with realistic categories and expenses for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users to create')
+        parser.add_argument('--expenses', type=int, default=1000, help='Expenses per user')
+        parser.add_argument('--years', type=float, default=2, help='Years of history, ending today')
+        parser.add_argument('--prefix', default='synthetic', help='Usernames are <prefix><n>')
+        parser.add_argument('--start', type=int, default=1, help='First <n> in the usernames')
+        parser.add_argument('--password', default='synthetic-password', help='Password of every user')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for a reproducible dataset')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Expenses inserted per transaction')
+
+    def handle(self, *args, **options):
+        usernames = [f"{options['prefix']}{n}" for n in range(options['start'], options['start'] + options['users'])]
+        taken = User.objects.filter(username__in=usernames).count()
+        if taken:
+            raise CommandError(f'{taken} of these users already exist; pick another --prefix or --start')
+
+        started = time.monotonic()
+        user_ids = create_users(options['users'], options['prefix'], options['password'], options['start'])
+        total = options['users'] * options['expenses']
+
+        def progress(created):
+            if options['verbosity'] > 1:
+                rate = created / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(f'{created}/{total} expenses ({rate:,.0f}/s)')
+
+        created = generate(
+            user_ids,
+            options['expenses'],
+            years=options['years'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(user_ids)} users and {created} expenses in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,115 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from expenses.importers import (
+    DATE_ORDERS, DEBITS_NEGATIVE, DEFAULT_DATE_ORDER, FORMATS, ImportRowError, StatementImporter, guess_format,
+    read_statement
+)
+
+class Command(BaseCommand):
+    help = 'Imports a CSV, OFX or QIF bank statement into a user\'s expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', type=str)
+        parser.add_argument('path', type=str)
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per committed batch')
+        parser.add_argument(
+            '--amount-sign',
+            choices=('negative', 'positive'),
+            help='Sign of expenses in the file (default: negative for OFX/QIF, positive for CSV)'
+        )
+        parser.add_argument(
+            '--date-format',
+            action='append',
+            dest='date_formats',
+            help='strptime format for dates; may be repeated'
+        )
+        parser.add_argument(
+            '--date-order',
+            choices=DATE_ORDERS,
+            help='Whether dates like 02/03/2024 are day-first (dmy) or month-first (mdy); '
+                 'default: mdy for QIF, ambiguous dates are refused for CSV'
+        )
+        parser.add_argument(
+            '--create-categories',
+            action='store_true',
+            help='Create categories named in the statement that the user does not have yet'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Checkpoint file used to resume an interrupted import (default: PATH.checkpoint)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f'No such file: {path}')
+        statement_format = options['format'] or guess_format(path)
+        amount_sign = options['amount_sign']
+        debits_negative = (
+            amount_sign == 'negative' if amount_sign else DEBITS_NEGATIVE[statement_format]
+        )
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+
+        resume_from = self._read_checkpoint(checkpoint, path, user)
+        if resume_from:
+            self.stdout.write(f'Resuming after row {resume_from}')
+
+        def progress(stats):
+            self._write_checkpoint(checkpoint, path, user, stats['rows'])
+            self.stdout.write(
+                f"Row {stats['rows']}: {stats['imported']} imported, "
+                f"{stats['skipped']} skipped, {stats['failed']} failed"
+            )
+
+        importer = StatementImporter(
+            user,
+            chunk_size=options['chunk_size'],
+            create_categories=options['create_categories'],
+            debits_negative=debits_negative,
+            date_formats=options['date_formats'],
+            date_order=options['date_order'] or DEFAULT_DATE_ORDER[statement_format],
+            progress=progress,
+        )
+        with open(path, 'rb') as statement:
+            try:
+                stats = importer.run(read_statement(statement, statement_format), resume_from=resume_from)
+            except ImportRowError as e:
+                raise CommandError(str(e))
+
+        for error in importer.errors:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['error']}"))
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} expenses for {user.username} "
+            f"({stats['skipped']} skipped, {stats['failed']} failed)"
+        ))
+
+    def _read_checkpoint(self, checkpoint, path, user):
+        try:
+            with open(checkpoint) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            raise CommandError(f'Unreadable checkpoint file: {checkpoint}')
+        if state.get('path') != path or state.get('user') != user.pk:
+            raise CommandError(f'Checkpoint {checkpoint} belongs to a different import')
+        return state['rows']
+
+    def _write_checkpoint(self, checkpoint, path, user, rows):
+        # Written beside the target and renamed over it, so a crash never
+        # leaves a half-written checkpoint behind.
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'path': path, 'user': user.pk, 'rows': rows}, f)
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from expenses.models import Tombstone
+
+class Command(BaseCommand):
+    help = 'Deletes tombstones older than the sync retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.EXPENSE_TOMBSTONE_RETENTION_DAYS,
+            help='Keep tombstones from this many days (default: EXPENSE_TOMBSTONE_RETENTION_DAYS)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Sync tokens are good for the retention period; pruning sooner would
+        # hide deletes from clients whose tokens are still accepted.
+        retention = settings.EXPENSE_TOMBSTONE_RETENTION_DAYS
+        if options['days'] < retention:
+            raise CommandError(f'--days must be at least EXPENSE_TOMBSTONE_RETENTION_DAYS ({retention})')
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = Tombstone.objects.filter(deleted_at__lt=cutoff)
+        deleted = 0
+        # Small batches keep each delete's transaction (and lock) short.
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            deleted += Tombstone.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones older than {cutoff:%Y-%m-%d %H:%M}'))
@@ -0,0 +1,57 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from expenses.models import ExpenseRollup
+
+CENTS = Decimal('0.01')
+
+class Command(BaseCommand):
+    help = 'Rebuilds (or verifies) the per-user monthly/category expense rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Only process this username')
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compare rollups against the expense table without changing anything'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User {options['user']} does not exist")
+
+        mismatched = 0
+        processed = 0
+        for user_id, username in users.values_list('pk', 'username').iterator():
+            processed += 1
+            if options['verify']:
+                if not self._matches(user_id):
+                    mismatched += 1
+                    self.stdout.write(self.style.WARNING(f'Rollups out of date for user: {username}'))
+            else:
+                ExpenseRollup.objects.rebuild_for_user(user_id)
+
+        if options['verify']:
+            if mismatched:
+                raise CommandError(f'{mismatched} of {processed} users have stale rollups')
+            self.stdout.write(self.style.SUCCESS(f'Rollups verified for {processed} users'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {processed} users'))
+
+    def _matches(self, user_id):
+        # SQLite sums decimals as floats and only rounds plain columns on
+        # the way out, so round the aggregated totals like the stored ones.
+        expected = {
+            (row['month'], row['category_id']): (row['total'].quantize(CENTS), row['expense_count'])
+            for row in ExpenseRollup.objects.expected_for_user(user_id)
+        }
+        actual = {
+            (month, category_id): (total, count)
+            for month, category_id, total, count in ExpenseRollup.objects.filter(
+                user_id=user_id
+            ).values_list('month', 'category_id', 'total', 'expense_count')
+        }
+        return expected == actual
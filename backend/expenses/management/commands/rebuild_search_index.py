@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from expenses.search import install, uninstall
+
+class Command(BaseCommand):
+    help = 'Recreates the expense full-text search index and repopulates it'
+
+    def handle(self, *args, **options):
+        # The schema editor runs both steps in one transaction.
+        with connection.schema_editor() as schema_editor:
+            uninstall(schema_editor)
+            install(schema_editor)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the expense search index ({connection.vendor})'))
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from expenses.search import install
+    install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from expenses.search import uninstall
+    uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_expense_filter_indexes'),
+    ]
+
+    operations = [
+        # An FTS5 table with sync triggers on SQLite, a GIN index on
+        # PostgreSQL; see expenses.search.
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
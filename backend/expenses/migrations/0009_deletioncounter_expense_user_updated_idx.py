@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('expenses', '0008_expense_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='deletion_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('deletions', models.PositiveBigIntegerField(default=0)),
+                ('last_deleted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'updated_at'], name='expense_user_updated_idx'),
+        ),
+    ]
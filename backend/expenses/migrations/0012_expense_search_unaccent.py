@@ -0,0 +1,33 @@
+from django.db import migrations
+
+PLAIN_INDEX = (
+    "CREATE INDEX IF NOT EXISTS expense_description_search_idx "
+    "ON expenses_expense USING gin (to_tsvector('simple', description))"
+)
+
+
+def unaccent_search_index(apps, schema_editor):
+    from expenses.search import install, uninstall
+    if schema_editor.connection.vendor == 'postgresql':
+        uninstall(schema_editor)
+        install(schema_editor)
+
+
+def plain_search_index(apps, schema_editor):
+    from expenses.search import uninstall
+    if schema_editor.connection.vendor == 'postgresql':
+        uninstall(schema_editor)
+        schema_editor.execute(PLAIN_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0011_dataversion'),
+    ]
+
+    operations = [
+        # Rebuild the PostgreSQL index over unaccented descriptions, as
+        # queries are folded the same way; see expenses.search.
+        migrations.RunPython(unaccent_search_index, plain_search_index),
+    ]
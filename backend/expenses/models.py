@@ -1,14 +1,44 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q, Sum, Count
+from django.db.models.functions import TruncMonth
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from collections import defaultdict
+from datetime import datetime
 from decimal import Decimal
 
+ROLLUP_FIELDS = ('user_id', 'date', 'category_id', 'amount')
+# Rollup changes touching more (month, category) pairs than this are written
+# with bulk queries rather than one UPDATE per pair.
+BATCHED_ROLLUP_THRESHOLD = 4
+
+
+def month_start(value):
+    """Return the first day of the month containing ``value``."""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = models.DateField().to_python(value)
+    return value.replace(day=1)
+
+class CategoryQuerySet(models.QuerySet):
+    def delete(self):
+        with transaction.atomic():
+            removed = list(self.order_by().values_list('user_id', 'pk'))
+            result = super().delete()
+            record_deletions(Tombstone.Kind.CATEGORY, removed)
+        return result
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Categories'
         unique_together = ['user', 'name']
@@ -17,6 +47,51 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            pk = self.pk
+            result = super().delete(*args, **kwargs)
+            record_deletions(Tombstone.Kind.CATEGORY, [(self.user_id, pk)])
+        return result
+
+class ExpenseQuerySet(models.QuerySet):
+    def delete(self):
+        # Bulk deletes (e.g. the admin "delete selected" action) bypass
+        # Expense.delete(), so take the removed totals off the rollups here.
+        with transaction.atomic():
+            removed = list(
+                self.order_by()
+                .annotate(month=TruncMonth('date'))
+                .values('user_id', 'month', 'category_id')
+                .annotate(total=Sum('amount'), expense_count=Count('id'))
+            )
+            deleted = list(self.order_by().values_list('user_id', 'pk'))
+            result = super().delete()
+            ExpenseRollup.objects.apply_deltas({
+                (row['user_id'], row['month'], row['category_id']): (-row['total'], -row['expense_count'])
+                for row in removed
+            })
+            record_deletions(Tombstone.Kind.EXPENSE, deleted)
+        return result
+
+    def update(self, **kwargs):
+        if not set(kwargs) & {'user', 'user_id', 'date', 'category', 'category_id', 'amount'}:
+            return super().update(**kwargs)
+        with transaction.atomic():
+            user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+            result = super().update(**kwargs)
+            if 'user' in kwargs or 'user_id' in kwargs:
+                # The queryset may filter on the old owner, so take the new
+                # one from the arguments rather than re-reading the rows.
+                new_owner = kwargs.get('user', kwargs.get('user_id'))
+                user_ids.add(getattr(new_owner, 'pk', new_owner))
+            for user_id in user_ids:
+                ExpenseRollup.objects.rebuild_for_user(user_id)
+                # update() sends no post_save signals.
+                transaction.on_commit(lambda user_id=user_id: DataVersion.objects.bump(user_id))
+        return result
+
+
 class Expense(models.Model):
     amount = models.DecimalField(
         max_digits=10, 
@@ -30,7 +105,8 @@ class Expense(models.Model):
         on_delete=models.PROTECT,
         related_name='expenses',
         null=True,  # Allow null for existing records
-        blank=True  # Allow blank in forms
+        blank=True,  # Allow blank in forms
+        db_index=False  # Covered by expense_category_date_idx
     )
     user = models.ForeignKey(
         User, 
@@ -40,8 +116,339 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ExpenseQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Per-user listing in Meta.ordering (scanned backwards) with id as
+            # the pagination tie-breaker; also date/month range filters.
+            models.Index(fields=['user', 'date', 'created_at', 'id'], name='expense_user_date_idx'),
+            # Per-user category filters and category breakdowns by date; the
+            # trailing columns serve a single category's list in date order.
+            models.Index(
+                fields=['user', 'category', 'date', 'created_at', 'id'],
+                name='expense_user_category_date_idx'
+            ),
+            # Per-user amount ranges and ordering by amount.
+            models.Index(fields=['user', 'amount', 'id'], name='expense_user_amount_idx'),
+            # A user's latest change (conditional GET validators) and the
+            # delta-sync keyset, which orders by (updated_at, id).
+            models.Index(fields=['user', 'updated_at', 'id'], name='expense_user_updated_idx'),
+            # A category's expenses in Meta.ordering (related managers and
+            # the PROTECT check when deleting a category).
+            models.Index(fields=['category', 'date', 'created_at'], name='expense_category_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.description} - ₹{self.amount}"
+
+    def save(self, *args, **kwargs):
+        # Keep ExpenseRollup in step with this row in the same transaction,
+        # including moves between months, categories and users.
+        with transaction.atomic():
+            previous = None if self._state.adding else self._locked_rollup_state()
+            super().save(*args, **kwargs)
+            ExpenseRollup.objects.record_change(previous, self.rollup_state())
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._locked_rollup_state()
+            pk = self.pk
+            result = super().delete(*args, **kwargs)
+            ExpenseRollup.objects.record_change(previous, None)
+            record_deletions(Tombstone.Kind.EXPENSE, [(self.user_id, pk)])
+        return result
+
+    def rollup_state(self):
+        return {field: getattr(self, field) for field in ROLLUP_FIELDS}
+
+    def _locked_rollup_state(self):
+        if self.pk is None:
+            return None
+        # Ordered by pk, as Meta.ordering would sort even this one row.
+        return (
+            Expense.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values(*ROLLUP_FIELDS)
+            .order_by('pk')
+            .first()
+        )
+
+
+class ExpenseRollupManager(models.Manager):
+    def record_change(self, previous, current):
+        """
+        Apply the difference between two expense states to the rollups.
+
+        Each state is a dict of ``ROLLUP_FIELDS`` values, or ``None`` when the
+        expense did not exist before (create) or no longer exists (delete).
+        """
+        self.record_changes([(previous, current)])
+
+    def record_changes(self, changes):
+        """Apply many ``(previous, current)`` pairs with one update per rollup row."""
+        deltas = defaultdict(lambda: [Decimal('0'), 0])
+        for previous, current in changes:
+            for state, sign in ((previous, -1), (current, 1)):
+                if state is None:
+                    continue
+                key = (state['user_id'], month_start(state['date']), state['category_id'])
+                deltas[key][0] += sign * Decimal(str(state['amount']))
+                deltas[key][1] += sign
+        self.apply_deltas(deltas)
+
+    def add_expenses(self, expenses):
+        """Add a batch of newly inserted expenses (e.g. from bulk_create)."""
+        self.record_changes((None, expense.rollup_state()) for expense in expenses)
+
+    def apply_deltas(self, deltas):
+        """Apply ``{(user_id, month, category_id): (amount, count)}`` deltas."""
+        deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+        if len(deltas) > BATCHED_ROLLUP_THRESHOLD:
+            self._apply_deltas_batched(deltas)
+            return
+        for key, (amount, count) in deltas.items():
+            self._apply_delta(key, amount, count)
+
+    def _apply_delta(self, key, amount, count):
+        user_id, month, category_id = key
+        rows = self.filter(user_id=user_id, month=month, category_id=category_id)
+        updated = rows.update(
+            total=F('total') + amount,
+            expense_count=F('expense_count') + count
+        )
+        if updated:
+            if count < 0:
+                rows.filter(expense_count__lte=0).delete()
+            return
+        if count <= 0:
+            # Nothing to subtract from; `rebuild_expense_rollups --verify`
+            # reports this kind of drift.
+            return
+        try:
+            with transaction.atomic():
+                self.create(
+                    user_id=user_id, month=month, category_id=category_id,
+                    total=amount, expense_count=count
+                )
+        except IntegrityError:
+            # Another transaction created the row first.
+            rows.update(
+                total=F('total') + amount,
+                expense_count=F('expense_count') + count
+            )
+
+    def _apply_deltas_batched(self, deltas):
+        # Bulk writes touch many (month, category) pairs at once: lock the
+        # affected rollup rows, then write them back in a handful of queries
+        # instead of one or two per pair.
+        existing = {
+            (row.user_id, row.month, row.category_id): row
+            for row in self.select_for_update().filter(
+                user_id__in={key[0] for key in deltas},
+                month__in={key[1] for key in deltas}
+            )
+        }
+        changed, created, emptied = [], [], []
+        for key, (amount, count) in deltas.items():
+            row = existing.get(key)
+            if row is None:
+                if count > 0:
+                    created.append(ExpenseRollup(
+                        user_id=key[0], month=key[1], category_id=key[2],
+                        total=amount, expense_count=count
+                    ))
+                continue
+            row.total += amount
+            row.expense_count += count
+            (emptied if row.expense_count <= 0 else changed).append(row)
+
+        self.bulk_update(changed, ['total', 'expense_count'], batch_size=500)
+        if emptied:
+            self.filter(pk__in=[row.pk for row in emptied]).delete()
+        try:
+            with transaction.atomic():
+                self.bulk_create(created, batch_size=500)
+        except IntegrityError:
+            # Another transaction created some of these rows first.
+            for row in created:
+                self._apply_delta(
+                    (row.user_id, row.month, row.category_id),
+                    row.total, row.expense_count
+                )
+
+    def expected_for_user(self, user_id):
+        """Aggregate the rollup rows for a user straight from Expense."""
+        return (
+            Expense.objects.filter(user_id=user_id)
+            .order_by()
+            .annotate(month=TruncMonth('date'))
+            .values('month', 'category_id')
+            .annotate(total=Sum('amount'), expense_count=Count('id'))
+        )
+
+    def rebuild_for_user(self, user_id):
+        with transaction.atomic():
+            self.filter(user_id=user_id).delete()
+            self.bulk_create(
+                ExpenseRollup(user_id=user_id, **row)
+                for row in self.expected_for_user(user_id)
+            )
+
+
+class ExpenseRollup(models.Model):
+    """
+    Per-user totals for each (month, category) pair, maintained by Expense
+    writes so the dashboard never has to aggregate the expense table.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_rollups')
+    month = models.DateField()
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        null=True,
+        blank=True
+    )
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    expense_count = models.PositiveIntegerField(default=0)
+
+    objects = ExpenseRollupManager()
+
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'category'],
+                name='expenses_rollup_user_month_category_uniq'
+            ),
+            # NULLs are distinct in the constraint above, so uncategorized
+            # rows need their own.
+            models.UniqueConstraint(
+                fields=['user', 'month'],
+                condition=Q(category__isnull=True),
+                name='expenses_rollup_user_month_uncategorized_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.month:%Y-%m} {self.category} - ₹{self.total}"
+
+
+class DeletionCounterManager(models.Manager):
+    def record(self, user_id, count=1):
+        """Count ``count`` deleted expenses or categories of a user."""
+        now = timezone.now()
+        changes = {'deletions': F('deletions') + count, 'last_deleted_at': now}
+        if self.filter(user_id=user_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, deletions=count, last_deleted_at=now)
+        except IntegrityError:
+            # Another transaction created the row first.
+            self.filter(user_id=user_id).update(**changes)
+
+
+class DeletionCounter(models.Model):
+    """
+    How many expenses and categories a user has deleted, and when the last
+    one went. Deleted rows leave no updated_at behind, so conditional GET
+    validators (see expenses.conditional) need this to notice them.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='deletion_counter'
+    )
+    deletions = models.PositiveBigIntegerField(default=0)
+    last_deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = DeletionCounterManager()
+
+    def __str__(self):
+        return f"{self.user} - {self.deletions} deletions"
+
+
+class DataVersionManager(models.Manager):
+    def current(self, user_id):
+        return self.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+    async def acurrent(self, user_id):
+        return await self.filter(user_id=user_id).values_list('version', flat=True).afirst() or 0
+
+    def bump(self, user_id):
+        if self.filter(user_id=user_id).update(version=F('version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, version=1)
+        except IntegrityError:
+            # Another transaction created the row first.
+            self.filter(user_id=user_id).update(version=F('version') + 1)
+
+
+class DataVersion(models.Model):
+    """
+    A counter of a user's writes to expenses and categories, which cached
+    responses are keyed on (see expenses.cache). It lives in the database,
+    not the cache, so a write in one worker is seen by all of them.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    objects = DataVersionManager()
+
+    def __str__(self):
+        return f"{self.user} - version {self.version}"
+
+
+class Tombstone(models.Model):
+    """
+    A deleted expense or category, kept for EXPENSE_TOMBSTONE_RETENTION_DAYS
+    so delta-sync clients (see expenses.sync) learn about the delete.
+    """
+    class Kind(models.IntegerChoices):
+        EXPENSE = 1, 'Expense'
+        CATEGORY = 2, 'Category'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones', db_index=False)
+    kind = models.PositiveSmallIntegerField(choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+            # Pruning by age across all users.
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id} deleted {self.deleted_at}"
+
+
+def record_deletions(kind, rows):
+    """
+    Record deleted rows, given as ``(user_id, pk)`` pairs, in the tombstones
+    and the per-user deletion counters.
+    """
+    if not rows:
+        return
+    now = timezone.now()
+    Tombstone.objects.bulk_create(
+        [Tombstone(user_id=user_id, kind=kind, object_id=pk, deleted_at=now) for user_id, pk in rows],
+        batch_size=1000
+    )
+    per_user = defaultdict(int)
+    for user_id, pk in rows:
+        per_user[user_id] += 1
+    for user_id, count in per_user.items():
+        DeletionCounter.objects.record(user_id, count)
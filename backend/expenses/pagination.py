@@ -0,0 +1,212 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+FALSE_VALUES = ('false', '0', 'no', 'off')
+TRUE_VALUES = ('true', '1', 'yes', 'on')
+# What a 64-bit integer column (ids are BigAutoField) holds; the database
+# drivers cannot send a larger integer at all.
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+class ExpenseCursorPagination(BasePagination):
+    """
+    Keyset pagination over the queryset's ordering (``Expense.Meta.ordering``
+    unless the view orders it otherwise), with ``id`` as the final tie-breaker.
+
+    The cursor is an opaque token holding the sort key of the row at the edge
+    of the current page. Each page is therefore a bounded index range scan
+    that costs the same at any depth, unlike OFFSET.
+
+    Pagination is opt-in, so clients that expect the plain list keep it: a
+    request asks for pages with ``?paginate=true``, a ``page_size`` or a
+    ``cursor`` (which the next/previous links carry). With
+    ``EXPENSE_PAGINATE_BY_DEFAULT=True`` it is on unless ``?paginate=false``.
+    Links are absolute, with the scheme the client used; behind a TLS proxy
+    that needs SECURE_PROXY_SSL_HEADER.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    paginate_query_param = 'paginate'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.finish_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request):
+        """paginate_queryset for async views, reading the page with the async ORM."""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.finish_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request):
+        """The query for the requested page, or None when pagination is off."""
+        if not self.is_enabled(request):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.fields = [self._get_field(queryset.model, name.lstrip('-')) for name in self.ordering]
+
+        self.position, self.reverse = self.decode_cursor(request)
+        ordering = self._reversed(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self._after(ordering, self.position))
+
+        # One extra row tells us whether there is anything beyond this page.
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, results):
+        """Trim the rows page_queryset() read to the page and set up its links."""
+        position = self.position
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.first_position = self._position(results[0]) if results else position
+        self.last_position = self._position(results[-1]) if results else position
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def is_enabled(self, request):
+        value = request.query_params.get(self.paginate_query_param, '').lower()
+        if value in FALSE_VALUES:
+            return False
+        if value in TRUE_VALUES:
+            return True
+        if request.query_params.get(self.cursor_query_param) or request.query_params.get(self.page_size_query_param):
+            return True
+        return settings.EXPENSE_PAGINATE_BY_DEFAULT
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.EXPENSE_PAGE_SIZE
+        if page_size <= 0:
+            return settings.EXPENSE_PAGE_SIZE
+        return min(page_size, settings.EXPENSE_MAX_PAGE_SIZE)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self._link(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self._link(self.first_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': [self._dump(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        token = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(token).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values = payload['p']
+            if len(values) != len(self.fields):
+                raise ValueError
+            position = [field.to_python(value) for field, value in zip(self.fields, values)]
+            if any(isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER for value in position):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get('r'))
+
+    def _link(self, position, reverse):
+        url = remove_query_param(self.base_url, self.paginate_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
+
+    def _after(self, ordering, position):
+        # (a, b, c) after (x, y, z) expands to
+        #   a <= x AND (a < x OR (a = x AND (b < y OR (b = y AND c < z))))
+        # for descending keys; the leading bound lets the database seek
+        # straight into the index instead of filtering from the start.
+        names = [name.lstrip('-') for name in ordering]
+        lookups = ['lt' if name.startswith('-') else 'gt' for name in ordering]
+        condition = Q(**{f'{names[-1]}__{lookups[-1]}': position[-1]})
+        for name, lookup, value in reversed(list(zip(names[:-1], lookups[:-1], position[:-1]))):
+            condition = Q(**{f'{name}__{lookup}': value}) | (Q(**{name: value}) & condition)
+        return Q(**{f'{names[0]}__{lookups[0]}e': position[0]}) & condition
+
+    def _position(self, row):
+        names = [name.lstrip('-') for name in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in names]
+        return [getattr(row, name) for name in names]
+
+    @staticmethod
+    def _reversed(ordering):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+    @staticmethod
+    def _get_field(model, name):
+        try:
+            return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(f"Cannot paginate on unknown field '{name}'")
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
@@ -0,0 +1,30 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, json_backend, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser with orjson, chosen like FastJSONRenderer's (``backend`` or
+    JSON_BACKEND). Bodies orjson rejects are parsed again by JSONParser, so
+    errors read as before and what only the stdlib accepts (integers past
+    64 bits, NaN without STRICT_JSON) still parses.
+    """
+    renderer_class = FastJSONRenderer
+    backend = None
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if json_backend(self.backend) != 'orjson' or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKENDS = ('orjson', 'stdlib')
+
+
+def json_backend(name=None):
+    """
+    The JSON library to use: ``name``, or else the JSON_BACKEND setting,
+    where 'auto' means orjson when it is installed and the stdlib otherwise.
+    """
+    name = name or settings.JSON_BACKEND
+    if name == 'auto':
+        return 'stdlib' if orjson is None else 'orjson'
+    if name not in JSON_BACKENDS:
+        raise ImproperlyConfigured(f"JSON_BACKEND must be 'auto', 'orjson' or 'stdlib', not {name!r}")
+    if name == 'orjson' and orjson is None:
+        raise ImproperlyConfigured('JSON_BACKEND is orjson, but orjson is not installed')
+    return name
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Lets content negotiation accept ``?format=csv``. Export data itself is
+    streamed by the view; this only renders error payloads.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(data.keys())
+        writer.writerow(data.values())
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON; as with CSVRenderer, only errors go through it."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+# DRF's conversions for what JSON has no type for. orjson passes datetimes
+# through to it too: it writes UTC as +00:00 where DRF writes Z.
+_drf_default = encoders.JSONEncoder().default
+# The encoder json.dumps() would build for every response, built once.
+_stdlib_encode = encoders.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer's exact output, from orjson when it is installed. A view
+    picks the library with a subclass setting ``backend`` to 'orjson' or
+    'stdlib'; the default, None, follows JSON_BACKEND.
+
+    Money keeps its format because the values are DRF's either way:
+    DecimalFields render as strings, and bare Decimals (the dashboard's
+    totals) go through DRF's conversion to float. Pretty printing and
+    non-default COMPACT_JSON, UNICODE_JSON or STRICT_JSON, which only the
+    stdlib can match, use JSONRenderer itself.
+    """
+    backend = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.get_indent(accepted_media_type, renderer_context or {}) is not None
+                or not self.compact or self.ensure_ascii or not self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if json_backend(self.backend) == 'orjson':
+            try:
+                ret = orjson.dumps(data, default=_drf_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+            except orjson.JSONEncodeError:
+                # Integers past 64 bits, keys that are not strings and the
+                # like, which the stdlib takes.
+                return super().render(data, accepted_media_type, renderer_context)
+            if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+                ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+            return ret
+
+        ret = _stdlib_encode(data)
+        if '\u2028' in ret or '\u2029' in ret:
+            ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
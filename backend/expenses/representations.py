@@ -0,0 +1,204 @@
+"""
+Serializer-free representations for the read paths.
+
+Building a serializer per row (field binding, ``get_attribute``, a
+``to_representation`` call per field) costs far more than the query on a
+large expense list. A ``Representation`` reads the serializer's fields once
+and compiles them into a converter per field; the views then fetch plain
+``values()`` rows, related names joined in, and map them to the exact
+dicts the serializer would return. ``expenses.tests.test_representations``
+holds the two to the same bytes.
+
+Only the field types the serializers here use are compiled; any other
+field falls back to its own ``to_representation``.
+"""
+import datetime
+import decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from expense_tracker.metrics import timed_serialization
+
+from .serializers import ExpenseSerializer
+
+# What to do with a field whose related object is missing, as
+# Field.get_attribute does: leave the field out, or write null.
+SKIP, NULL = 'skip', 'null'
+
+
+def _decimal_converter(field):
+    if not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) or field.localize:
+        return field.to_representation
+    if field.decimal_places is None:
+        return '{:f}'.format
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    # str() is '{:f}' unless the exponent is positive or the value is below
+    # 1e-6, neither of which a quantized value with up to 6 places can be.
+    text = str if 0 <= field.decimal_places <= 6 else '{:f}'.format
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return text(value.quantize(quantum, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field, tz):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    tz = field.timezone if hasattr(field, 'timezone') else tz
+    utc = tz is datetime.timezone.utc or getattr(tz, 'key', None) in ('UTC', 'Etc/UTC')
+
+    def convert(value):
+        if utc and value.tzinfo is datetime.timezone.utc:
+            # As the database returns them: astimezone() would change
+            # nothing, and the naive isoformat() skips the offset lookup.
+            return value.replace(tzinfo=None).isoformat() + 'Z'
+        if tz is not None:
+            value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field, tz):
+    """A function of a field's non-null value returning its representation; None when that is the value itself."""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return None if field.pk_field is None else field.pk_field.to_representation
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field, tz)
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return datetime.date.isoformat
+        return field.to_representation
+    if type(field) is serializers.IntegerField:
+        return int
+    if type(field) is serializers.CharField:
+        return str
+    return field.to_representation
+
+
+class Representation:
+    """
+    ``serializer_class``'s output for rows of ``rows(queryset)``.
+
+    Sources may follow one foreign key (``category.name``); when it is null
+    the field is left out or null, as the serializer does.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._compiled = {}
+
+    @cached_property
+    def fields(self):
+        return self.serializer_class().fields
+
+    @cached_property
+    def values(self):
+        """The ``values()`` names of the fields' sources, then any foreign keys they follow."""
+        names = ['__'.join(field.source_attrs) for field in self.fields.values()]
+        for field in self.fields.values():
+            if len(field.source_attrs) == 2 and field.source_attrs[0] not in names:
+                names.append(field.source_attrs[0])
+        return tuple(names)
+
+    def rows(self, queryset):
+        return queryset.values(*self.values)
+
+    def compile(self, tz):
+        """``(name, key, related_key, missing, converter)`` for each field."""
+        compiled = []
+        for (name, field), key in zip(self.fields.items(), self.values):  # fields come first
+            if field.write_only:
+                continue
+            if field.source == '*' or len(field.source_attrs) > 2:
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name} has no values() representation')
+            related_key, missing = None, None
+            if len(field.source_attrs) == 2:
+                related_key = field.source_attrs[0]
+                if field.default is not empty:
+                    raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name} has a default')
+                missing = NULL if field.allow_null else SKIP
+            compiled.append((name, key, related_key, missing, _converter(field, tz)))
+        return compiled
+
+    def _compiled_fields(self):
+        # DateTimeFields render in the current time zone; resolve it once
+        # per call rather than per value.
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        if tz not in self._compiled:
+            self._compiled[tz] = self.compile(tz)
+        return self._compiled[tz]
+
+    def one(self, row):
+        return self.many([row])[0]
+
+    def many(self, rows):
+        with timed_serialization():
+            return self._many(rows)
+
+    def _many(self, rows):
+        fields = self._compiled_fields()
+        data = []
+        for row in rows:
+            item = {}
+            for name, key, related_key, missing, convert in fields:
+                value = row[key]
+                if value is None:
+                    if related_key is not None and row[related_key] is None and missing is SKIP:
+                        continue
+                    item[name] = None
+                elif convert is None:
+                    item[name] = value
+                else:
+                    item[name] = convert(value)
+            data.append(item)
+        return data
+
+
+expense_representation = Representation(ExpenseSerializer)
+
+
+class RepresentationReadMixin:
+    """
+    ``list`` and ``retrieve`` from ``values()`` rows mapped by the view's
+    ``representation`` rather than through its serializer. The queryset,
+    filters, pagination and permissions are the view's own.
+    """
+    representation = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.representation.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.representation.many(page))
+        return Response(self.representation.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.representation.rows(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        return Response(self.representation.one(row))
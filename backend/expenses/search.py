@@ -0,0 +1,267 @@
+"""
+Full-text search over expense descriptions.
+
+SQLite keeps an FTS5 external-content table over ``expenses_expense``
+(descriptions are not stored twice) that triggers keep in step with every
+insert, update and delete, including the raw executemany() writes of the
+bulk and import paths. ``user_id`` is an indexed FTS column, so a query
+is restricted to one user inside the index. PostgreSQL uses a GIN index
+on ``to_tsvector('simple', expense_search_unaccent(description))`` next to
+the user_id index. unaccent() itself is only STABLE, since its dictionary
+could change, so an index expression needs the IMMUTABLE wrapper; queries
+go through the same wrapper, so both sides drop accents alike.
+
+All words of a query must match; the last one, still being typed, as a
+prefix. PostgreSQL ranks with ts_rank. On SQLite, bm25 would need every
+user's postings of each term for its document frequencies, so matches are
+taken newest first and the first EXPENSE_SEARCH_CANDIDATES are ranked by
+a simpler term-frequency score: an older match beyond that window is not
+returned however well it scores. Other databases fall back to
+``icontains``.
+
+SQLite drops a table's triggers when a migration rebuilds it (any
+AlterField on Expense does), so after every ``migrate`` ensure_installed()
+checks for them and, if one is missing, reinstalls them and repopulates
+the index. Bulk loads go through the triggers like every other write:
+they are shared by all connections, so dropping them for one load would
+leave other writers' rows unindexed.
+"""
+import math
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'expenses_expense_fts'
+FTS_TRIGGERS = {f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_update'}
+POSTGRESQL_INDEX = 'expense_description_search_idx'
+POSTGRESQL_UNACCENT = 'expense_search_unaccent'
+POSTGRESQL_VECTOR = f"to_tsvector('simple', {POSTGRESQL_UNACCENT}(description))"
+POSTGRESQL_QUERY = f"to_tsquery('simple', {POSTGRESQL_UNACCENT}(%s))"
+# The migration that installs the index; before it, or once it is
+# unapplied, there is nothing to keep installed.
+INSTALLED_BY = ('expenses', '0008_expense_search_index')
+# The longest prefix kept in the FTS prefix index (prefix='2 3' below).
+PREFIX_INDEX_LENGTH = 3
+# A single letter is matched as a word, not as the prefix of most words.
+MIN_PREFIX_LENGTH = 2
+MAX_TERMS = 8
+TERM = re.compile(r'[^\W_]+')
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, user_id,
+        content='expenses_expense', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, user_id)
+        VALUES (new.id, new.description, new.user_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, user_id)
+        VALUES ('delete', old.id, old.description, old.user_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF description, user_id ON expenses_expense BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, user_id)
+        VALUES ('delete', old.id, old.description, old.user_id);
+        INSERT INTO {FTS_TABLE}(rowid, description, user_id)
+        VALUES (new.id, new.description, new.user_id);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [f'DROP TRIGGER IF EXISTS {trigger}' for trigger in sorted(FTS_TRIGGERS)] + [
+    f'DROP TABLE IF EXISTS {FTS_TABLE}'
+]
+POSTGRESQL_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA public',
+    # Schema-qualified, so the result cannot depend on the search_path.
+    f"""
+    CREATE OR REPLACE FUNCTION {POSTGRESQL_UNACCENT}(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    f"CREATE INDEX IF NOT EXISTS {POSTGRESQL_INDEX} ON expenses_expense USING gin ({POSTGRESQL_VECTOR})",
+]
+POSTGRESQL_UNINSTALL = [
+    f'DROP INDEX IF EXISTS {POSTGRESQL_INDEX}',
+    f'DROP FUNCTION IF EXISTS {POSTGRESQL_UNACCENT}(text)',
+]
+INSTALL = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRESQL_INSTALL}
+UNINSTALL = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRESQL_UNINSTALL}
+
+
+def install(schema_editor):
+    for sql in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def missing_objects(using='default'):
+    """The index's tables, triggers or indexes missing from database ``using``."""
+    db = connections[using]
+    with db.cursor() as cursor:
+        if db.vendor == 'sqlite':
+            expected = FTS_TRIGGERS | {FTS_TABLE}
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+                [f'{FTS_TABLE}%']
+            )
+        elif db.vendor == 'postgresql':
+            expected = {POSTGRESQL_INDEX, POSTGRESQL_UNACCENT}
+            cursor.execute(
+                'SELECT indexname FROM pg_indexes WHERE indexname = %s '
+                'UNION SELECT proname FROM pg_proc WHERE proname = %s',
+                [POSTGRESQL_INDEX, POSTGRESQL_UNACCENT]
+            )
+        else:
+            return set()
+        return expected - {row[0] for row in cursor.fetchall()}
+
+
+def ensure_installed(using='default', **kwargs):
+    """
+    Reinstall whatever part of the index a migration dropped, and
+    repopulate it; return what was missing. Connected to post_migrate.
+    """
+    if INSTALLED_BY not in MigrationRecorder(connections[using]).applied_migrations():
+        return set()
+    missing = missing_objects(using)
+    if missing:
+        db = connections[using]
+        with transaction.atomic(using=using), db.cursor() as cursor:
+            for sql in INSTALL[db.vendor]:
+                cursor.execute(sql)
+    return missing
+
+
+def _fold(text):
+    # What FTS5's unicode61 tokenizer does with remove_diacritics: fold case
+    # and drop combining marks.
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search_terms(text):
+    """The folded words of ``text``; punctuation never reaches the index query."""
+    return TERM.findall(_fold(text or ''))[:MAX_TERMS]
+
+
+def _sqlite_match(terms, user_id=None, prefix_length=None):
+    # Earlier terms are whole words; the last one is what is still being
+    # typed and matches as a prefix. Prefixes longer than the FTS prefix
+    # index make FTS5 merge the doclists of every matching word, which is
+    # slow for common words, so the caller may shorten the prefix to
+    # ``prefix_length`` and check the full one itself.
+    *words, last = terms
+    if len(last) < MIN_PREFIX_LENGTH:
+        words, last = terms, None
+    elif prefix_length:
+        last = last[:prefix_length]
+    phrases = [f'"{word}"' for word in words] + ([f'"{last}"*'] if last else [])
+    expression = 'description : (' + ' '.join(phrases) + ')'
+    if user_id is not None:
+        expression = f'user_id : "{int(user_id)}" AND {expression}'
+    return expression
+
+
+def _postgresql_query(terms):
+    *words, last = terms
+    if len(last) < MIN_PREFIX_LENGTH:
+        return ' & '.join(terms)
+    return ' & '.join(words + [f'{last}:*'])
+
+
+def _score(description, terms):
+    # A small tf/length score in place of bm25, whose document frequencies
+    # would cost a pass over every user's postings of each term.
+    words = TERM.findall(_fold(description))
+    *whole, last = terms
+    score = sum(words.count(term) for term in whole)
+    score += sum(1 for word in words if word.startswith(last))
+    return score / math.sqrt(len(words) or 1)
+
+
+def _sqlite_ranked_ids(user_id, terms, limit):
+    # Stream matches newest first, which FTS5 does without computing
+    # anything per match, keep the first EXPENSE_SEARCH_CANDIDATES whose
+    # last word really has the typed prefix, then rank those.
+    last = terms[-1]
+    candidates = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, description FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC',
+            [_sqlite_match(terms, user_id, PREFIX_INDEX_LENGTH)]
+        )
+        while len(candidates) < settings.EXPENSE_SEARCH_CANDIDATES:
+            rows = cursor.fetchmany(settings.EXPENSE_SEARCH_CANDIDATES)
+            if not rows:
+                break
+            for pk, description in rows:
+                if len(last) <= PREFIX_INDEX_LENGTH or any(
+                    word.startswith(last) for word in TERM.findall(_fold(description))
+                ):
+                    candidates.append((_score(description, terms), pk))
+    candidates = candidates[:settings.EXPENSE_SEARCH_CANDIDATES]
+    # sorted() is stable, so equal scores stay newest first.
+    return [pk for score, pk in sorted(candidates, key=lambda candidate: -candidate[0])[:limit]]
+
+
+def _postgresql_ranked_ids(user_id, terms, limit):
+    query = _postgresql_query(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM expenses_expense WHERE user_id = %s AND {POSTGRESQL_VECTOR} @@ {POSTGRESQL_QUERY} "
+            f"ORDER BY ts_rank({POSTGRESQL_VECTOR}, {POSTGRESQL_QUERY}) DESC, id DESC LIMIT %s",
+            [user_id, query, query, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_expenses(queryset, user_id, terms, limit):
+    """
+    ``user_id``'s expenses from ``queryset`` that match every term, best
+    match first.
+    """
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        ids = _sqlite_ranked_ids(user_id, terms, limit)
+    elif connection.vendor == 'postgresql':
+        ids = _postgresql_ranked_ids(user_id, terms, limit)
+    else:
+        return list(matching(queryset.filter(user_id=user_id), terms)[:limit])
+    expenses = queryset.in_bulk(ids)
+    return [expenses[pk] for pk in ids if pk in expenses]
+
+
+def matching(queryset, terms):
+    """Filter an Expense queryset (of any users) to rows matching every term."""
+    if connection.vendor == 'sqlite':
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_sqlite_match(terms)]
+        ))
+    if connection.vendor == 'postgresql':
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT id FROM expenses_expense WHERE {POSTGRESQL_VECTOR} @@ {POSTGRESQL_QUERY}",
+            [_postgresql_query(terms)]
+        ))
+    for term in terms:
+        queryset = queryset.filter(description__icontains=term)
+    return queryset
@@ -0,0 +1,58 @@
+"""
+Default categories.
+
+DEFAULT_CATEGORIES is the one set every account starts with. Categories
+are written with a single ``bulk_create(ignore_conflicts=True)`` for any
+number of users, so seeding is idempotent: the (user, name) unique
+constraint skips the categories a user already has, including one created
+concurrently.
+"""
+from django.db import transaction
+
+from .cache import bump_data_version
+from .models import Category
+
+DEFAULT_CATEGORIES = (
+    'Food & Dining',
+    'Transportation',
+    'Shopping',
+    'Entertainment',
+    'Bills & Utilities',
+    'Health & Medical',
+    'Travel',
+    'Education',
+    'Personal Care',
+    'Others',
+)
+
+
+def seed_default_categories(user_ids, names=DEFAULT_CATEGORIES, check_existing=True):
+    """
+    Give each of ``user_ids`` the categories in ``names`` it does not have
+    yet. Return the number of categories created.
+
+    With ``check_existing`` the users' current categories are read first,
+    so the count is exact and only users that gained a category have their
+    cached responses invalidated. Pass False for users known to have none,
+    such as one just registered, to save that query.
+    """
+    user_ids = list(user_ids)
+    missing = [(user_id, name) for user_id in user_ids for name in names]
+    if check_existing:
+        existing = set(
+            Category.objects.filter(user_id__in=user_ids, name__in=names)
+            .order_by().values_list('user_id', 'name')
+        )
+        missing = [pair for pair in missing if pair not in existing]
+    if not missing:
+        return 0
+
+    with transaction.atomic():
+        # bulk_create sends no post_save, so invalidate the users' caches here.
+        Category.objects.bulk_create(
+            [Category(user_id=user_id, name=name) for user_id, name in missing],
+            ignore_conflicts=True
+        )
+        for user_id in {user_id for user_id, name in missing}:
+            transaction.on_commit(lambda user_id=user_id: bump_data_version(user_id))
+    return len(missing)
@@ -5,11 +5,33 @@ from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.db.models import Sum
 from datetime import datetime
+from expense_tracker.metrics import timed_serialization
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedDataMixin:
+    """
+    Count building ``.data`` as the request's serialization time (see
+    expense_tracker.metrics); set ``list_serializer_class`` to
+    TimedListSerializer for ``many=True``.
+    """
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class CategorySerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name']
+        list_serializer_class = TimedListSerializer
 
     def create(self, validated_data):
         try:
@@ -34,7 +56,7 @@ class CategorySerializer(serializers.ModelSerializer):
         except Exception as e:
             raise serializers.ValidationError(str(e))
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(TimedDataMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
 
@@ -45,9 +67,11 @@ class ExpenseSerializer(serializers.ModelSerializer):
             'category_name', 'date', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'category_name']
+        list_serializer_class = TimedListSerializer
 
     def validate_category(self, value):
-        if value.user != self.context['request'].user:
+        # Compare ids so validation doesn't fetch the category's user.
+        if value is not None and value.user_id != self.context['request'].user.pk:
             raise serializers.ValidationError("Invalid category selected.")
         return value
 
@@ -64,7 +88,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class DashboardStatsSerializer(serializers.Serializer):
+class DashboardStatsSerializer(TimedDataMixin, serializers.Serializer):
     total_expenses = serializers.DecimalField(max_digits=10, decimal_places=2)
     monthly_expenses = serializers.DecimalField(max_digits=10, decimal_places=2)
     category_expenses = serializers.ListField(
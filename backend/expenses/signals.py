@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import bump_data_version
+from .models import Expense, Category
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_user_data_version(sender, instance, **kwargs):
+    # Bump only once the write is visible to other connections, otherwise a
+    # concurrent reader could cache pre-write data under the new version.
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_data_version(user_id))
@@ -0,0 +1,112 @@
+"""
+Delta sync for offline clients.
+
+A sync token carries a watermark ``t``: the client has everything changed
+before it. Each response pages through the expenses changed since ``t``
+in (updated_at, id) order; only the final page also carries the changed
+categories and the ids deleted since ``t``, so deletes are applied after
+every upsert. The final page's token moves the watermark to the response
+time minus EXPENSE_SYNC_SAFETY_WINDOW seconds: a transaction that was
+still open, whose rows carry an earlier updated_at, becomes visible within
+that window and is picked up next time. Rows in the window are sent
+twice, which is harmless for upserts.
+
+Tombstones are pruned after EXPENSE_TOMBSTONE_RETENTION_DAYS by
+``manage.py prune_tombstones``, which gunicorn.conf.py runs daily (or cron
+where it is disabled). A token whose watermark is older than that may
+have missed deletes, so it is refused with ExpiredToken, which the view
+answers with 410 Gone: the client has to throw its copy away and sync
+from scratch, without a token.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Category, Tombstone
+
+TOKEN_SALT = 'expenses.sync'
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def encode_token(watermark, cursor=None):
+    payload = {'t': watermark.isoformat() if watermark else None}
+    if cursor:
+        payload['c'] = [cursor[0].isoformat(), cursor[1]]
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(token):
+    """Return ``(watermark, cursor)``; both are None for a full sync."""
+    if not token:
+        return None, None
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        watermark = parse_datetime(payload['t']) if payload['t'] else None
+        cursor = None
+        if 'c' in payload:
+            cursor = (parse_datetime(payload['c'][0]), int(payload['c'][1]))
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken('Invalid sync token')
+    if watermark and watermark < timezone.now() - timedelta(days=settings.EXPENSE_TOMBSTONE_RETENTION_DAYS):
+        raise ExpiredToken('Sync token has expired; discard local data and sync again without one')
+    return watermark, cursor
+
+
+def changes_since(user, expenses, token, page_size=None):
+    """
+    One page of changes for ``user``. ``expenses`` is the base queryset of
+    the user's expenses (with whatever select_related the caller needs).
+    """
+    watermark, cursor = decode_token(token)
+    page_size = page_size or settings.EXPENSE_SYNC_PAGE_SIZE
+    now = timezone.now()
+
+    changed = expenses.order_by('updated_at', 'id')
+    if cursor:
+        updated_at, pk = cursor
+        changed = changed.filter(
+            Q(updated_at__gte=updated_at)
+            & (Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+        )
+    elif watermark:
+        changed = changed.filter(updated_at__gte=watermark)
+    changed = list(changed[:page_size + 1])
+
+    if len(changed) > page_size:
+        changed = changed[:page_size]
+        last = changed[-1]
+        return {
+            'expenses': changed,
+            'categories': [],
+            'deleted': {'expenses': [], 'categories': []},
+            'has_more': True,
+            'next': encode_token(watermark, (last.updated_at, last.pk)),
+        }
+
+    categories = Category.objects.filter(user=user)
+    deleted = {'expenses': [], 'categories': []}
+    if watermark:
+        categories = categories.filter(updated_at__gte=watermark)
+        tombstones = Tombstone.objects.filter(user=user, deleted_at__gte=watermark).values_list(
+            'kind', 'object_id'
+        )
+        for kind, object_id in tombstones:
+            deleted['expenses' if kind == Tombstone.Kind.EXPENSE else 'categories'].append(object_id)
+    return {
+        'expenses': changed,
+        'categories': list(categories),
+        'deleted': deleted,
+        'has_more': False,
+        'next': encode_token(now - timedelta(seconds=settings.EXPENSE_SYNC_SAFETY_WINDOW)),
+    }
@@ -0,0 +1,171 @@
+"""
+Synthetic accounts for benchmarks and load tests.
+
+Each generated user gets most of DEFAULT_CATEGORIES (plus an occasional
+uncategorized expense), and expenses whose frequency, amount and wording
+depend on the category: many small Food & Dining purchases, a monthly
+rent-sized bill, rare but large Travel. Amounts are log-normal around a
+per-category median, and everything is reproducible from ``seed``.
+
+Rows are written with bulk_create, or on SQLite as multi-row INSERTs of
+plain tuples, then the rollups are rebuilt once instead of per row. The search index follows the rows
+through its triggers, as it does for every other writer.
+"""
+import itertools
+import math
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .bulk import INSERT_FIELDS
+from .cache import bump_data_version
+from .models import Category, Expense, ExpenseRollup
+from .seeding import DEFAULT_CATEGORIES, seed_default_categories
+
+# name: (relative frequency, median amount, spread of log(amount), description words)
+CATEGORY_PROFILES = {
+    'Food & Dining': (30, 18, 0.6, ['Coffee', 'Lunch', 'Dinner', 'Groceries', 'Bakery', 'Takeaway pizza', 'Sushi']),
+    'Transportation': (15, 12, 0.7, ['Bus ticket', 'Metro card', 'Taxi', 'Fuel', 'Parking', 'Train ticket']),
+    'Shopping': (12, 45, 0.9, ['Shoes', 'T-shirt', 'Headphones', 'Books', 'Kitchenware', 'Gift']),
+    'Entertainment': (8, 25, 0.7, ['Cinema', 'Concert tickets', 'Streaming subscription', 'Video game']),
+    'Bills & Utilities': (6, 90, 0.5, ['Electricity bill', 'Water bill', 'Internet', 'Phone plan', 'Rent']),
+    'Health & Medical': (4, 40, 0.8, ['Pharmacy', 'Dentist', 'Doctor visit', 'Gym membership']),
+    'Travel': (2, 220, 0.9, ['Flight', 'Hotel', 'Car rental', 'Travel insurance']),
+    'Education': (2, 60, 0.8, ['Online course', 'Textbook', 'Workshop']),
+    'Personal Care': (5, 22, 0.6, ['Haircut', 'Cosmetics', 'Toiletries']),
+    'Others': (3, 30, 1.0, ['Miscellaneous', 'Donation', 'Fee', 'Repair']),
+}
+UNCATEGORIZED_SHARE = 0.05
+CENTS = Decimal('0.01')
+PLACES = ['downtown', 'at the mall', 'online', 'near work', 'with friends', 'weekly', 'for the trip']
+
+
+def create_users(count, prefix, password, start=1):
+    """Create ``count`` users named ``<prefix><n>``; return their ids in order."""
+    usernames = [f'{prefix}{index}' for index in range(start, start + count)]
+    # One hash for all: hashing a password per user would dominate the run.
+    password_hash = make_password(password)
+    User.objects.bulk_create(
+        [User(username=username, email=f'{username}@example.com', password=password_hash)
+         for username in usernames],
+        batch_size=1000
+    )
+    ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    return [ids[username] for username in usernames]
+
+
+class ExpenseGenerator:
+    def __init__(self, seed=None, years=2, today=None):
+        self.random = random.Random(seed)
+        self.end = today or date.today()
+        self.days = max(int(years * 365), 1)
+
+    def category_mix(self):
+        """The default categories one user has: all common ones, some rare ones."""
+        names = [name for name in DEFAULT_CATEGORIES if self.random.random() < 0.6 + CATEGORY_PROFILES[name][0] / 30]
+        return names or ['Others']
+
+    def rows(self, categories, count):
+        """
+        Yield ``count`` ``(category_id, amount, description, date)`` tuples;
+        ``categories`` maps category name to id.
+        """
+        names = list(categories)
+        profiles = [
+            (categories[name], math.log(CATEGORY_PROFILES[name][1])) + CATEGORY_PROFILES[name][2:]
+            for name in names
+        ]
+        weights = list(itertools.accumulate(CATEGORY_PROFILES[name][0] for name in names))
+        rng = self.random
+        for _ in range(count):
+            category_id, log_median, spread, words = rng.choices(profiles, cum_weights=weights)[0]
+            amount = Decimal(max(math.exp(rng.gauss(log_median, spread)), 0.5)).quantize(CENTS)
+            description = rng.choice(words)
+            if rng.random() < 0.4:
+                description = f'{description} {rng.choice(PLACES)}'
+            if rng.random() < UNCATEGORIZED_SHARE:
+                category_id = None
+            yield category_id, amount, description, self.end - timedelta(days=rng.randrange(self.days))
+
+
+def _insert_rows(user_id, rows, now):
+    if connection.vendor != 'sqlite':
+        Expense.objects.bulk_create(
+            (Expense(user_id=user_id, category_id=category_id, amount=amount, description=description,
+                     date=day, created_at=now, updated_at=now)
+             for category_id, amount, description, day in rows),
+            batch_size=5000
+        )
+        return
+    # Plain tuples, as model instances would be most of the cost at this
+    # volume, in one multi-row INSERT per batch. SQLite prepares it once for
+    # all full batches, and the search trigger flushes the FTS index once
+    # per statement rather than once per row. Nothing needs the new ids.
+    timestamp = connection.ops.adapt_datetimefield_value(now)
+    rows = [(user_id, category_id, str(amount), description, day.isoformat(), timestamp, timestamp)
+            for category_id, amount, description, day in rows]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(Expense._meta.get_field(name).column) for name in INSERT_FIELDS)
+    row = f"({', '.join(['%s'] * len(INSERT_FIELDS))})"
+    batch_size = connection.features.max_query_params // len(INSERT_FIELDS)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {quote(Expense._meta.db_table)} ({columns}) VALUES {', '.join([row] * len(batch))}",
+                [value for values in batch for value in values]
+            )
+
+
+def generate(user_ids, expenses_per_user, years=2, seed=None, chunk_size=50000, progress=None):
+    """
+    Give each user a category mix and ``expenses_per_user`` expenses; return
+    the number of expenses created.
+
+    Each chunk is one transaction. A user's rollups are rebuilt once, after
+    its last chunk.
+    """
+    generator = ExpenseGenerator(seed, years)
+    created = 0
+    with _bulk_load_pragmas():
+        for user_id in user_ids:
+            seed_default_categories([user_id], generator.category_mix())
+            categories = dict(
+                Category.objects.filter(user_id=user_id, name__in=CATEGORY_PROFILES).values_list('name', 'pk')
+            )
+            remaining = expenses_per_user
+            while remaining > 0:
+                size = min(chunk_size, remaining)
+                with transaction.atomic():
+                    _insert_rows(user_id, list(generator.rows(categories, size)), timezone.now())
+                remaining -= size
+                created += size
+                if progress:
+                    progress(created)
+            ExpenseRollup.objects.rebuild_for_user(user_id)
+            bump_data_version(user_id)
+    return created
+
+
+@contextmanager
+def _bulk_load_pragmas():
+    # SQLite's default 2 MB page cache makes every index insert a cache
+    # miss once the tables outgrow it; give this connection 256 MB.
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA cache_size = -262144')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {int(previous)}')
@@ -0,0 +1,56 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from authentication.stateless import forget_user_status, tokens_for_user, user_status
+from expenses.models import Category, Expense
+
+
+class ExpenseAPITestCase(TestCase):
+    """
+    A user with a few categories and expenses spread over several months,
+    plus an API client authenticated the way the frontend is (JWT bearer).
+    """
+    expenses_per_category = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 'correct-horse-battery')
+        cls.other_user = User.objects.create_user('bob', 'bob@example.com', 'correct-horse-battery')
+        cls.categories = [
+            Category.objects.create(user=cls.user, name=name)
+            for name in ('Food & Dining', 'Transportation', 'Shopping')
+        ]
+        cls.empty_category = Category.objects.create(user=cls.user, name='Travel')
+        Category.objects.create(user=cls.other_user, name='Food & Dining')
+
+        for index in range(cls.expenses_per_category):
+            for category in cls.categories + [None]:
+                Expense.objects.create(
+                    user=cls.user,
+                    category=category,
+                    amount=Decimal('12.50') + index,
+                    description=f'Expense {index}',
+                    date=date(2024, 1 + index % 6, 1 + index)
+                )
+
+    def setUp(self):
+        cache.clear()
+        forget_user_status()
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        token = tokens_for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        # As on a worker that has seen the user within JWT_USER_STATUS_TTL,
+        # so query budgets count what a request costs in steady state.
+        user_status(user.pk)
+        return client
+
+    def any_expense(self):
+        return Expense.objects.filter(user=self.user).first()
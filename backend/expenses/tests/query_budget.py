@@ -0,0 +1,50 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+from expenses.benchmarking import route_names
+
+# Savepoints only show up because TestCase wraps each test in a transaction.
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryBudgetMixin:
+    """
+    Per-endpoint query budgets for a test case.
+
+    Subclasses set ``urlconf`` and ``query_budgets``, a mapping of
+    ``(route name, HTTP method)`` to the most queries that request may run.
+    ``assertQueryBudget`` resolves the route from the path, so a budget can't
+    be checked against the wrong endpoint, and ``test_every_route_has_a_budget``
+    fails as soon as a route is added to ``urlconf`` without one.
+    """
+    urlconf = None
+    query_budgets = {}
+
+    def assertQueryBudget(self, method, path, data=None, client=None, format='json', **extra):
+        route = resolve(path.split('?')[0]).url_name
+        key = (route, method.lower())
+        self.assertIn(key, self.query_budgets, f'No query budget for {method.upper()} {route}')
+
+        client = client or self.client
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method.lower())(path, data, format=format, **extra)
+            if response.streaming:
+                # Streamed bodies run their queries as they are consumed.
+                response.streaming_content = list(response.streaming_content)
+        queries = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith(TRANSACTION_CONTROL)
+        ]
+        budget = self.query_budgets[key]
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f'{method.upper()} {path} ran {len(queries)} queries (budget {budget}):\n'
+            + '\n'.join(queries)
+        )
+        return response
+
+    def test_every_route_has_a_budget(self):
+        budgeted = {route for route, method in self.query_budgets}
+        self.assertEqual(route_names(self.urlconf) - budgeted, set())
@@ -0,0 +1,229 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import include, path, resolve
+from rest_framework.test import APIClient
+
+from authentication.stateless import forget_user_status, tokens_for_user
+from expense_tracker.metrics import QueryTimer
+from expenses import async_views, urls as expense_urls
+from expenses.cache import bump_data_version
+from expenses.models import Category, Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+# The API's URLs under SERVER_MODE=asgi, for AsgiRoutingTests.
+urlpatterns = [
+    path('api/', include(expense_urls.asgi_urlpatterns + expense_urls.urlpatterns)),
+]
+
+
+def _cursor(link):
+    return parse_qs(urlparse(link).query)['cursor'][0] if link else None
+
+
+class AsyncReadViewTests(ExpenseAPITestCase):
+    """The async views answer exactly like the DRF views they mirror."""
+
+    def assertSameList(self, sync_path, async_path):
+        expected = self.client.get(sync_path)
+        response = self.client.get(async_path)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data, expected_data = response.json(), expected.json()
+        if isinstance(expected_data, dict) and 'results' in expected_data:
+            # Same pages, but the links point at each view's own path.
+            self.assertEqual(data['results'], expected_data['results'])
+            self.assertEqual(_cursor(data['next']), _cursor(expected_data['next']))
+            self.assertEqual(_cursor(data['previous']), _cursor(expected_data['previous']))
+        else:
+            self.assertEqual(data, expected_data)
+        return data
+
+    def test_expense_list(self):
+        data = self.assertSameList('/api/expenses/?page_size=4', '/api/async/expenses/?page_size=4')
+        self.assertEqual(len(data['results']), 4)
+        cursor = _cursor(data['next'])
+        self.assertSameList(f'/api/expenses/?page_size=4&cursor={cursor}', f'/api/async/expenses/?page_size=4&cursor={cursor}')
+
+    def test_expense_list_filters_and_orderings(self):
+        category = self.categories[0].pk
+        for query in (f'category={category}', 'uncategorized=true', 'ordering=-amount', 'month=2024-03',
+                      'paginate=false', 'amount_min=14&ordering=amount'):
+            with self.subTest(query):
+                self.assertSameList(f'/api/expenses/?{query}', f'/api/async/expenses/?{query}')
+
+    def test_expense_list_errors(self):
+        for query in ('ordering=description', 'month=March', 'month=9999-12', f'category={2 ** 64}', 'cursor=nonsense'):
+            with self.subTest(query):
+                self.assertSameList(f'/api/expenses/?{query}', f'/api/async/expenses/?{query}')
+
+    def test_category_list(self):
+        data = self.assertSameList('/api/categories/', '/api/async/categories/')
+        self.assertEqual(len(data), 4)
+
+    def test_dashboard(self):
+        response = self.client.get('/api/async/expenses/dashboard/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        # It shares the DRF view's cache entry.
+        expected = self.client.get('/api/expenses/dashboard/')
+        self.assertEqual(expected['X-Cache'], 'HIT')
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(self.client.get('/api/async/expenses/dashboard/')['X-Cache'], 'HIT')
+
+    def test_conditional_get(self):
+        response = self.client.get('/api/async/expenses/')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/async/expenses/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_authentication(self):
+        response = APIClient().get('/api/async/expenses/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), APIClient().get('/api/expenses/').json())
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+        response = APIClient().get('/api/async/categories/', HTTP_AUTHORIZATION='Bearer nonsense')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+    def test_read_only(self):
+        response = self.client.post('/api/async/expenses/', {'amount': '1.00'}, format='json')
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, HEAD')
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 24)
+
+    async def test_served_by_the_asgi_handler(self):
+        token = await _access_token(self.user)
+        response = await AsyncClient().get(
+            '/api/async/expenses/dashboard/', headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(json.loads(response.content)['total_expenses'], 360.0)
+        # The async metrics middleware still sees the queries, run in other threads.
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries"')
+
+
+@override_settings(ROOT_URLCONF='expenses.tests.test_async_views')
+class AsgiRoutingTests(ExpenseAPITestCase):
+    """With SERVER_MODE=asgi the frontend's endpoints read through the async views."""
+
+    def test_reads_are_async(self):
+        for path_, view in (('/api/expenses/', async_views.expense_list),
+                            ('/api/expenses/dashboard/', async_views.dashboard_stats),
+                            ('/api/categories/', async_views.category_list)):
+            with self.subTest(path_):
+                match = resolve(path_)
+                self.assertIs(match.func.__wrapped__, view)
+                self.assertEqual(match.url_name, resolve(path_, 'expense_tracker.urls').url_name)
+
+        response = self.client.get('/api/expenses/?page_size=4')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(self.client.get('/api/expenses/dashboard/').json()['total_expenses'], 360.0)
+        self.assertEqual(len(self.client.get('/api/categories/').json()), 4)
+
+    def test_writes_go_to_the_viewsets(self):
+        response = self.client.post('/api/expenses/', {
+            'amount': '4.20', 'description': 'Tea', 'date': '2024-07-01', 'category': self.categories[0].pk
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post('/api/categories/', {'name': 'Health'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.client.post('/api/expenses/dashboard/').status_code, 405)
+        self.assertEqual(self.client.put('/api/expenses/', {}, format='json').status_code, 405)
+        # Routes the async views do not cover are unchanged.
+        pk = self.any_expense().pk
+        self.assertEqual(self.client.get(f'/api/expenses/{pk}/').status_code, 200)
+
+
+class AsgiExportTests(ExpenseAPITestCase):
+    async def test_export_streams_asynchronously(self):
+        token = await _access_token(self.user)
+        for export_format in ('csv', 'ndjson'):
+            with self.subTest(export_format):
+                response = await AsyncClient().get(
+                    f'/api/expenses/export/?format={export_format}', headers={'Authorization': f'Bearer {token}'}
+                )
+                self.assertEqual(response.status_code, 200)
+                # Not read into a list by the ASGI handler first.
+                self.assertTrue(response.is_async)
+                content = b''.join([block async for block in response.streaming_content])
+                self.assertEqual(content, await sync_to_async(self.wsgi_export)(export_format))
+
+    def wsgi_export(self, export_format):
+        response = self.client.get(f'/api/expenses/export/?format={export_format}')
+        self.assertFalse(response.is_async)
+        return b''.join(response.streaming_content)
+
+
+async def _access_token(user):
+    return str(tokens_for_user(user).access_token)
+
+
+@override_settings(ASYNC_PARALLEL_READS=True)
+class ParallelReadTests(TransactionTestCase):
+    """Outside a transaction, the dashboard's reads run on connections of their own."""
+
+    def setUp(self):
+        forget_user_status()
+        self.user = User.objects.create_user('carol', 'carol@example.com', 'correct-horse-battery')
+        category = Category.objects.create(user=self.user, name='Food & Dining')
+        for day in range(1, 8):
+            Expense.objects.create(
+                user=self.user, category=category if day % 2 else None,
+                amount=Decimal('10.25') * day, description=f'Lunch {day}', date=date(2024, 5, day)
+            )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for_user(self.user).access_token}')
+        self.addCleanup(async_views.close_read_connections)
+
+    def test_dashboard(self):
+        with QueryTimer(None).active() as timer:
+            response = self.client.get('/api/async/expenses/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        # Authentication, the data version, then both reads, counted in
+        # their own threads.
+        self.assertEqual(timer.count, 4)
+
+        bump_data_version(self.user.pk)
+        with override_settings(ASYNC_PARALLEL_READS=False):
+            serial = self.client.get('/api/async/expenses/dashboard/')
+        self.assertEqual(serial['X-Cache'], 'MISS')
+        self.assertEqual(response.json(), serial.json())
+        self.assertEqual(response.json()['total_expenses'], 287.0)
+
+    # 0, so each read hands its connection back, with DATABASE_POOL.
+    @override_settings(ASYNC_READ_CONN_MAX_AGE=600)
+    def test_read_threads_keep_their_connections(self):
+        closed = []
+        backend = type(connections['default'])
+        close = backend.close
+
+        def counting_close(wrapper):
+            if threading.current_thread().name.startswith('async-read'):
+                closed.append(threading.current_thread().name)
+            close(wrapper)
+
+        # Fresh read threads, connecting as under ASGI, where request threads
+        # must not keep connections.
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='async-read-test')
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(async_views.close_read_connections, executor, 2)
+        with mock.patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0}), \
+                mock.patch.object(backend, 'close', counting_close), \
+                mock.patch.object(async_views, 'read_executor', executor):
+            for _ in range(4):
+                bump_data_version(self.user.pk)
+                self.assertEqual(self.client.get('/api/async/expenses/dashboard/')['X-Cache'], 'MISS')
+        self.assertEqual(closed, [])
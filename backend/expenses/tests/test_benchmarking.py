@@ -0,0 +1,82 @@
+import io
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+
+from expenses.benchmarking import (
+    MARK_DATE, InProcessTarget, default_scenarios, percentile, run_benchmark, uncovered_routes
+)
+from expenses.models import Category, Expense, ExpenseRollup
+from expenses.search import search_expenses, search_terms
+from expenses.synthetic import create_users, generate
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class BenchmarkTests(ExpenseAPITestCase):
+    def test_every_route_has_a_scenario(self):
+        self.assertEqual(uncovered_routes(default_scenarios()), set())
+
+    def test_percentile(self):
+        self.assertEqual(percentile([4, 1, 3, 2], 0.5), 2.5)
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.99), 4.96)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_run_in_process(self):
+        # Rows that look like the benchmark's own but were there before it ran.
+        kept = [
+            Expense.objects.create(user=self.user, amount=1, description='Benchmark 0', date=MARK_DATE),
+            Category.objects.create(user=self.user, name='benchmark-kept'),
+        ]
+        password_hash = self.user.password
+        report = run_benchmark(
+            self.user, 'correct-horse-battery', InProcessTarget(self.user), iterations=2, warmup=0, throwaway=True
+        )
+        self.assertEqual(report['meta']['target'], 'client')
+        self.assertEqual(report['meta']['expenses'], Expense.objects.filter(user=self.user).count())
+        for label, result in report['results'].items():
+            with self.subTest(label):
+                self.assertTrue(all(int(status) < 400 for status in result['statuses']), result['statuses'])
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+                self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+                self.assertIsNotNone(result['queries'])
+        self.assertGreater(report['peak_rss_kb'], 0)
+
+        # Everything the write scenarios created is gone again, and only that.
+        self.assertEqual(list(Expense.objects.filter(date=MARK_DATE)), kept[:1])
+        self.assertEqual(list(Category.objects.filter(name__startswith='benchmark-')), kept[1:])
+        self.assertFalse(User.objects.filter(username__startswith='benchmark-').exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, password_hash)
+
+    def test_writes_need_a_throwaway_database(self):
+        target = InProcessTarget(self.user)
+        with self.assertRaisesRegex(ValueError, 'throwaway'):
+            run_benchmark(self.user, 'correct-horse-battery', target, iterations=1, warmup=0)
+        with self.assertRaisesRegex(CommandError, '--throwaway'):
+            call_command('benchmark_endpoints', user='alice', iterations=1, warmup=0, stdout=io.StringIO())
+        self.assertFalse(Expense.objects.filter(date=MARK_DATE).exists())
+
+        reads = [scenario for scenario in default_scenarios() if not scenario.writes]
+        report = run_benchmark(self.user, 'correct-horse-battery', target, reads, iterations=1, warmup=0)
+        self.assertEqual(len(report['results']), len(reads))
+
+
+class SyntheticDataTests(TransactionTestCase):
+    def test_generate(self):
+        user_ids = create_users(2, 'synthetic', 'synthetic-password')
+        self.assertEqual(generate(user_ids, 300, years=1, seed=7, chunk_size=120), 600)
+
+        for user_id in user_ids:
+            self.assertEqual(Expense.objects.filter(user_id=user_id).count(), 300)
+            rollups = ExpenseRollup.objects.filter(user_id=user_id)
+            self.assertEqual(sum(rollups.values_list('expense_count', flat=True)), 300)
+        self.assertTrue(User.objects.get(pk=user_ids[0]).check_password('synthetic-password'))
+
+        # The rows went through the search index's triggers.
+        expense = Expense.objects.filter(user_id=user_ids[0]).first()
+        word = expense.description.split()[0]
+        self.assertTrue(search_expenses(Expense.objects.all(), user_ids[0], search_terms(word), 5))
+        Expense.objects.create(user_id=user_ids[0], amount=1, description='Zeppelin ride', date=expense.date)
+        self.assertEqual(len(search_expenses(Expense.objects.all(), user_ids[0], ['zeppelin'], 5)), 1)
@@ -0,0 +1,86 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class BulkCreateTests(ExpenseAPITestCase):
+    def test_ids_match_the_items_across_batches(self):
+        items = [
+            {
+                'amount': f'{index % 7 + 1}.25',
+                'description': f'Imported {index}',
+                'category': self.categories[index % 3].pk if index % 4 else None,
+                'date': f'2024-0{1 + index % 9}-15',
+            }
+            for index in range(700)
+        ]
+        response = self.client.post('/api/expenses/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 700)
+
+        ids = response.json()['ids']
+        self.assertEqual(len(set(ids)), 700)
+        rows = Expense.objects.in_bulk(ids)
+        for pk, item in zip(ids, items):
+            expense = rows[pk]
+            self.assertEqual(
+                (expense.user_id, expense.description, expense.amount, expense.category_id, expense.date.isoformat()),
+                (self.user.pk, item['description'], Decimal(item['amount']), item['category'], item['date'])
+            )
+
+    @skipUnless(connection.vendor == 'sqlite', 'Only SQLite before 3.35 inserts without RETURNING')
+    def test_ids_without_insert_returning(self):
+        items = [{'amount': f'{index + 1}.00', 'description': f'Old SQLite {index}', 'date': '2024-02-01'}
+                 for index in range(5)]
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock,
+            return_value=False
+        ):
+            response = self.client.post('/api/expenses/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        rows = Expense.objects.in_bulk(response.json()['ids'])
+        self.assertEqual(
+            [rows[pk].description for pk in response.json()['ids']], [item['description'] for item in items]
+        )
+
+    def test_repeated_values_are_validated_like_the_first(self):
+        items = [
+            {'amount': '-1.00', 'description': 'Refund', 'date': '2024-01-01'},
+            {'amount': '-1.00', 'description': 'Refund', 'date': '2024-01-01'},
+            {'amount': 1, 'description': 'Coin', 'date': '2024-01-01'},
+            {'amount': True, 'description': 'Coin', 'date': '2024-13-01'},
+        ]
+        response = self.client.post('/api/expenses/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(errors[0], errors[1])
+        self.assertIn('amount', errors[0])
+        self.assertEqual(errors[2], {})
+        self.assertEqual(set(errors[3]), {'amount', 'date'})
+        self.assertFalse(Expense.objects.filter(description__in=['Refund', 'Coin']).exists())
+
+        response = self.client.post('/api/expenses/bulk/', items[2:3] * 2, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Expense.objects.filter(description='Coin').values_list('amount', 'date')),
+            [(Decimal('1.00'), date(2024, 1, 1))] * 2
+        )
+
+
+class BulkUpdateTests(ExpenseAPITestCase):
+    @skipUnless(connection.features.has_select_for_update, 'Rows are locked with SELECT ... FOR UPDATE')
+    def test_rows_are_locked_before_they_are_read(self):
+        expenses = Expense.objects.filter(user=self.user).order_by('pk')[:2]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                '/api/expenses/bulk/', [{'id': expense.pk, 'description': 'Locked'} for expense in expenses],
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries))
@@ -0,0 +1,122 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from expenses.cache import bump_data_version, cache_stats, get_data_version, get_or_compute
+from expenses.models import Category, Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class VersionedCacheTests(ExpenseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return {'computed': self.computed}
+
+    def lookups(self, name):
+        return cache_stats().get(name, {'hits': 0, 'misses': 0})
+
+    def test_hits_and_misses(self):
+        before = self.lookups('test-entry')
+        self.assertEqual(get_or_compute('test-entry', self.user.pk, self.compute), ({'computed': 1}, False))
+        self.assertEqual(get_or_compute('test-entry', self.user.pk, self.compute), ({'computed': 1}, True))
+        # Entries are per user and per vary value.
+        self.assertEqual(get_or_compute('test-entry', self.other_user.pk, self.compute), ({'computed': 2}, False))
+        self.assertEqual(get_or_compute('test-entry', self.user.pk, self.compute, vary='2024-03'),
+                         ({'computed': 3}, False))
+        after = self.lookups('test-entry')
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 3))
+
+    def test_a_new_version_misses(self):
+        get_or_compute('test-entry', self.user.pk, self.compute)
+        version = get_data_version(self.user.pk)
+        bump_data_version(self.user.pk)
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+        self.assertEqual(get_or_compute('test-entry', self.user.pk, self.compute), ({'computed': 2}, False))
+        # Another user's entries are untouched.
+        get_or_compute('test-entry', self.other_user.pk, self.compute)
+        bump_data_version(self.user.pk)
+        self.assertEqual(get_or_compute('test-entry', self.other_user.pk, self.compute), ({'computed': 3}, True))
+
+    def assertBumps(self, write, user=None):
+        user = user or self.user
+        version = get_data_version(user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = write()
+        if hasattr(response, 'status_code'):
+            self.assertLess(response.status_code, 300, response.content)
+        self.assertNotEqual(get_data_version(user.pk), version)
+
+    def test_every_write_path_bumps_the_version(self):
+        expense = self.any_expense()
+
+        def edit():
+            expense.amount = Decimal('99.00')
+            expense.save()
+
+        def move():
+            Expense.objects.filter(pk=self.any_expense().pk).update(user=self.other_user)
+
+        writes = [
+            ('create', lambda: Expense.objects.create(
+                user=self.user, amount=Decimal('1.00'), description='New', date=date(2024, 7, 1))),
+            ('save', edit),
+            ('queryset update', lambda: Expense.objects.filter(user=self.user, category=None).update(
+                category=self.empty_category)),
+            ('queryset delete', lambda: Expense.objects.filter(user=self.user, date__month=6).delete()),
+            ('delete', lambda: Expense.objects.filter(user=self.user).first().delete()),
+            ('category create', lambda: Category.objects.create(user=self.user, name='Health')),
+            ('category delete', lambda: Category.objects.get(user=self.user, name='Health').delete()),
+            ('API create', lambda: self.client.post('/api/expenses/', {
+                'amount': '2.00', 'description': 'Tea', 'date': '2024-07-02'}, format='json')),
+            ('API bulk create', lambda: self.client.post('/api/expenses/bulk/', [
+                {'amount': '3.00', 'description': 'Bus', 'date': '2024-07-03'}], format='json')),
+            ('API bulk update', lambda: self.client.patch('/api/expenses/bulk/', [
+                {'id': self.any_expense().pk, 'amount': '4.00'}], format='json')),
+            ('import', lambda: self.client.post('/api/expenses/import/', {
+                'file': SimpleUploadedFile('s.csv', b'date,description,amount\n2024-07-04,Lunch,5.00\n'),
+                'amount_sign': 'positive'}, format='multipart')),
+        ]
+        for name, write in writes:
+            with self.subTest(name):
+                self.assertBumps(write)
+        with self.subTest('move to another user'):
+            self.assertBumps(move, self.other_user)
+
+    def test_no_stale_dashboard_after_an_update(self):
+        first = self.client.get('/api/expenses/dashboard/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/expenses/dashboard/')['X-Cache'], 'HIT')
+
+        expense = self.any_expense()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/expenses/{expense.pk}/',
+                                         {'amount': str(expense.amount + 100)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        second = self.client.get('/api/expenses/dashboard/')
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(second.json()['total_expenses'], first.json()['total_expenses'] + 100)
+
+    def test_a_write_in_another_worker_invalidates(self):
+        # Each gunicorn worker has its own local-memory cache.
+        def worker(name):
+            return override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': name,
+            }})
+
+        with worker('worker-a'):
+            first = self.client.get('/api/expenses/dashboard/')
+            self.assertEqual(self.client.get('/api/expenses/dashboard/')['X-Cache'], 'HIT')
+        with worker('worker-b'), self.captureOnCommitCallbacks(execute=True):
+            expense = self.any_expense()
+            self.client.patch(f'/api/expenses/{expense.pk}/', {'amount': str(expense.amount + 100)}, format='json')
+        with worker('worker-a'):
+            second = self.client.get('/api/expenses/dashboard/')
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertEqual(second.json()['total_expenses'], first.json()['total_expenses'] + 100)
@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class ConditionalGetTests(ExpenseAPITestCase):
+    def get(self, path, etag=None, last_modified=None):
+        headers = {}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        if last_modified:
+            headers['HTTP_IF_MODIFIED_SINCE'] = last_modified
+        return self.client.get(path, **headers)
+
+    def assertNotModified(self, path):
+        response = self.get(path)
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as context:
+            cached = self.get(path, etag=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        # Only the validator query; no user lookup and no list query.
+        self.assertEqual(len(context.captured_queries), 1)
+        return response
+
+    def assertModifiedBy(self, path, change):
+        response = self.get(path)
+        change()
+        changed = self.get(path, etag=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def test_unchanged_lists_are_not_modified(self):
+        for path in ('/api/expenses/', '/api/expenses/?page_size=5&month=2024-02', '/api/categories/'):
+            with self.subTest(path=path):
+                self.assertNotModified(path)
+
+    def test_pages_and_filters_have_their_own_etags(self):
+        first = self.get('/api/expenses/')
+        self.assertNotEqual(first['ETag'], self.get('/api/expenses/?page_size=5')['ETag'])
+        self.assertEqual(self.get('/api/expenses/?page_size=5', etag=first['ETag']).status_code, 200)
+
+    def test_expense_writes_change_the_etag(self):
+        self.assertModifiedBy('/api/expenses/', lambda: self.client.post('/api/expenses/', {
+            'amount': '3.00', 'description': 'Tea', 'date': '2024-06-01'
+        }, format='json'))
+        self.assertModifiedBy('/api/expenses/', lambda: self.client.patch(
+            f'/api/expenses/{self.any_expense().pk}/', {'description': 'Renamed'}, format='json'
+        ))
+        self.assertModifiedBy('/api/expenses/', lambda: self.client.delete(
+            f'/api/expenses/{self.any_expense().pk}/'
+        ))
+        self.assertModifiedBy('/api/expenses/', lambda: Expense.objects.filter(
+            pk=self.any_expense().pk
+        ).delete())
+
+    def test_category_writes_change_both_etags(self):
+        category = self.categories[0]
+        for path in ('/api/expenses/', '/api/categories/'):
+            with self.subTest(path=path):
+                self.assertModifiedBy(path, lambda: self.client.put(
+                    f'/api/categories/{category.pk}/', {'name': f'Renamed for {path}'}, format='json'
+                ))
+        self.assertModifiedBy('/api/categories/', lambda: self.client.delete(
+            f'/api/categories/{self.empty_category.pk}/'
+        ))
+
+    def test_other_users_writes_do_not_change_the_etag(self):
+        response = self.get('/api/expenses/')
+        self.client_for(self.other_user).post('/api/categories/', {'name': 'Gifts'}, format='json')
+        self.assertEqual(self.get('/api/expenses/', etag=response['ETag']).status_code, 304)
+
+    def test_if_modified_since(self):
+        response = self.get('/api/categories/')
+        self.assertEqual(self.get('/api/categories/', last_modified=response['Last-Modified']).status_code, 304)
+        self.client.delete(f'/api/categories/{self.empty_category.pk}/')
+        changed = self.get('/api/categories/', etag=response['ETag'], last_modified=response['Last-Modified'])
+        self.assertEqual(changed.status_code, 200)
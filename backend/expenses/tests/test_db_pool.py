@@ -0,0 +1,103 @@
+import threading
+import time
+import unittest
+
+from django.db import OperationalError, connection, connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from expense_tracker import pool as pool_module
+from expense_tracker.metrics import registry
+
+
+class StubPool:
+    name = 'expenses'
+
+    def get_stats(self):
+        return {'pool_min': 1, 'pool_max': 2, 'pool_size': 2, 'pool_available': 1, 'requests_num': 5,
+                'requests_wait_ms': 1500, 'connections_num': 2}
+
+
+class PoolMetricsTests(SimpleTestCase):
+    def test_metrics_report_pools(self):
+        pool_module._pools['test-metrics'] = StubPool()
+        self.addCleanup(pool_module._pools.pop, 'test-metrics')
+
+        text = registry.render()
+        self.assertRegex(text, r'db_pool_connections\{database="expenses",state="in_use",pid="\d+"\} 1\n')
+        self.assertRegex(text, r'db_pool_max_connections\{database="expenses",pid="\d+"\} 2\n')
+        self.assertRegex(text, r'db_pool_checkouts_total\{database="expenses",pid="\d+"\} 5\n')
+        self.assertRegex(text, r'db_pool_wait_seconds_total\{database="expenses",pid="\d+"\} 1.500000\n')
+        self.assertRegex(text, r'db_pool_timeouts_total\{database="expenses",pid="\d+"\} 0\n')
+
+
+@unittest.skipUnless(
+    connection.settings_dict['ENGINE'] == 'expense_tracker.pooled_postgresql',
+    'Needs a Postgres DATABASE_URL and DATABASE_POOL=True',
+)
+class PooledPostgresTests(TransactionTestCase):
+    """Runs against a real server: DATABASE_URL=postgres://... DATABASE_POOL=True."""
+
+    def backend_pid(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def pool(self):
+        return connection.pool(connection.get_connection_params())
+
+    def test_requests_share_connections(self):
+        self.backend_pid()
+        connection.close()
+        connects = pool_module.stats(self.pool())['connects']
+        pids = []
+
+        def request():
+            pids.append(self.backend_pid())
+            connections['default'].close()
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        max_size = connection.settings_dict['POOL']['MAX_SIZE']
+        self.assertLessEqual(len(set(pids)), max_size)
+        self.assertLessEqual(pool_module.stats(self.pool())['connects'], max(connects, max_size))
+
+    def test_open_transaction_is_rolled_back(self):
+        connection.set_autocommit(False)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        with self.assertLogs('psycopg.pool', 'WARNING'):
+            connection.close()
+        self.assertTrue(connection.get_autocommit())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertFalse(connection.connection.info.transaction_status)
+
+    def test_dropped_connections_are_replaced(self):
+        self.backend_pid()
+        connection.close()
+        failures = pool_module.stats(self.pool())['ping_failures']
+        with connections['default']._nodb_cursor() as cursor:
+            cursor.execute(
+                'SELECT array_agg(pid) FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()',
+                [connection.settings_dict['NAME']]
+            )
+            dead = cursor.fetchone()[0]
+            cursor.execute('SELECT pg_terminate_backend(pid) FROM unnest(%s::integer[]) AS pid', [dead])
+        time.sleep(0.1)
+        self.assertNotIn(self.backend_pid(), dead)
+        self.assertGreater(pool_module.stats(self.pool())['ping_failures'], failures)
+
+    def test_pool_timeout_is_a_database_error(self):
+        connection.close()
+        pool = self.pool()
+        held = [pool.getconn() for _ in range(pool.max_size)]
+        self.addCleanup(lambda: [pool.putconn(conn) for conn in held])
+        timeout, pool.timeout = pool.timeout, 0.01
+        self.addCleanup(setattr, pool, 'timeout', timeout)
+        timeouts = pool_module.stats(pool)['timeouts']
+        with self.assertRaises(OperationalError):
+            self.backend_pid()
+        self.assertEqual(pool_module.stats(pool)['timeouts'], timeouts + 1)
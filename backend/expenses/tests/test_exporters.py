@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from expenses.exporters import EXPORT_COLUMNS, export_rows, stream_csv, stream_ndjson
+from expenses.models import Category, Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class ExportTests(ExpenseAPITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.bills = Category.objects.create(user=cls.user, name='Bills, "Utilities"')
+        cls.tricky = Expense.objects.create(
+            user=cls.user, category=cls.bills, amount=Decimal('1234.50'), date=date(2024, 8, 1),
+            description='Rent, "August"\nsecond line ünïcode'
+        )
+        cls.small = Expense.objects.create(
+            user=cls.user, amount=Decimal('0.05'), date=date(2024, 8, 2), description='Gum'
+        )
+
+    def export(self, export_format, query=''):
+        response = self.client.get(f'/api/expenses/export/?format={export_format}&{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def csv_rows(self, query=''):
+        _, content = self.export('csv', query)
+        return list(csv.DictReader(io.StringIO(content, newline='')))
+
+    def ndjson_rows(self, query=''):
+        _, content = self.export('ndjson', query)
+        self.assertTrue(content == '' or content.endswith('\n'))
+        return [json.loads(line) for line in content.splitlines()]
+
+    def expected_ids(self, queryset):
+        return list(queryset.filter(user=self.user).order_by('-date', '-created_at', '-id').values_list('pk', flat=True))
+
+    def test_csv(self):
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="expenses-\d{4}-\d\d-\d\d\.csv"$')
+        self.assertEqual(content.split('\r\n', 1)[0], ','.join(EXPORT_COLUMNS))
+
+        rows = self.csv_rows()
+        self.assertEqual([int(row['id']) for row in rows], self.expected_ids(Expense.objects.all()))
+        self.assertEqual(rows[1], {
+            'id': str(self.tricky.pk), 'date': '2024-08-01', 'description': 'Rent, "August"\nsecond line ünïcode',
+            'amount': '1234.50', 'category': str(self.bills.pk), 'category_name': 'Bills, "Utilities"',
+            'created_at': self.api_datetime(self.tricky, 'created_at'),
+            'updated_at': self.api_datetime(self.tricky, 'updated_at'),
+        })
+        # Uncategorised: empty cells.
+        self.assertEqual((rows[0]['amount'], rows[0]['category'], rows[0]['category_name']), ('0.05', '', ''))
+        self.assertIn('"Rent, ""August""\nsecond line ünïcode"', content)
+
+    def test_ndjson(self):
+        response, content = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('ünïcode', content)
+
+        rows = self.ndjson_rows()
+        self.assertEqual([row['id'] for row in rows], self.expected_ids(Expense.objects.all()))
+        self.assertEqual(list(rows[1]), list(EXPORT_COLUMNS))
+        self.assertEqual(rows[1], {
+            'id': self.tricky.pk, 'date': '2024-08-01', 'description': 'Rent, "August"\nsecond line ünïcode',
+            'amount': '1234.50', 'category': self.bills.pk, 'category_name': 'Bills, "Utilities"',
+            'created_at': self.api_datetime(self.tricky, 'created_at'),
+            'updated_at': self.api_datetime(self.tricky, 'updated_at'),
+        })
+        self.assertEqual((rows[0]['amount'], rows[0]['category'], rows[0]['category_name']), ('0.05', None, None))
+
+    def api_datetime(self, expense, field):
+        # The export formats datetimes as the API does.
+        return self.client.get(f'/api/expenses/{expense.pk}/').json()[field]
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_datetimes_in_the_current_time_zone(self):
+        row = self.ndjson_rows()[1]
+        self.assertTrue(row['created_at'].endswith('+05:30'))
+        self.assertEqual(row['created_at'], self.api_datetime(self.tricky, 'created_at'))
+
+    def test_filters(self):
+        category = self.categories[0]
+        for query, queryset in (
+            ('month=2024-03', Expense.objects.filter(date__year=2024, date__month=3)),
+            (f'category={category.pk}', Expense.objects.filter(category=category)),
+            ('uncategorized=true&amount_min=15', Expense.objects.filter(category=None, amount__gte=15)),
+            # Exports are always newest first.
+            ('ordering=amount', Expense.objects.all()),
+        ):
+            with self.subTest(query):
+                expected = self.expected_ids(queryset)
+                self.assertEqual([int(row['id']) for row in self.csv_rows(query)], expected)
+                self.assertEqual([row['id'] for row in self.ndjson_rows(query)], expected)
+
+        response = self.client.get('/api/expenses/export/?format=ndjson&month=9999-12')
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty(self):
+        self.assertEqual(self.export('csv', 'month=1999-01')[1], ','.join(EXPORT_COLUMNS) + '\r\n')
+        self.assertEqual(self.export('ndjson', 'month=1999-01')[1], '')
+
+        # Another user sees only their own (no) expenses.
+        self.client = self.client_for(self.other_user)
+        self.assertEqual(self.csv_rows(), [])
+        self.assertEqual(self.ndjson_rows(), [])
+
+    def test_blocks_join_to_the_same_output(self):
+        for streamer in (stream_csv, stream_ndjson):
+            with self.subTest(streamer.__name__):
+                whole = ''.join(streamer(export_rows(self.user)))
+                blocks = list(streamer(export_rows(self.user), rows_per_block=5))
+                self.assertGreater(len(blocks), 5)
+                self.assertEqual(''.join(blocks), whole)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('export_expenses', format='ndjson', output_dir=directory, user='alice', stdout=io.StringIO())
+            with open(os.path.join(directory, 'alice.ndjson'), encoding='utf-8') as export:
+                self.assertEqual([json.loads(line)['id'] for line in export],
+                                 self.expected_ids(Expense.objects.all()))
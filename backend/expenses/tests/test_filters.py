@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class ExpenseFilterTests(ExpenseAPITestCase):
+    def list_ids(self, query):
+        response = self.client.get(f'/api/expenses/?paginate=false&{query}')
+        self.assertEqual(response.status_code, 200, response.json())
+        return [expense['id'] for expense in response.json()]
+
+    def expected_ids(self, queryset):
+        return list(queryset.filter(user=self.user).values_list('pk', flat=True))
+
+    def test_month(self):
+        self.assertEqual(
+            self.list_ids('month=2024-03'),
+            self.expected_ids(Expense.objects.filter(date__year=2024, date__month=3))
+        )
+
+    def test_date_range_is_inclusive(self):
+        self.assertEqual(
+            self.list_ids('date_after=2024-02-02&date_before=2024-04-04'),
+            self.expected_ids(Expense.objects.filter(date__range=('2024-02-02', '2024-04-04')))
+        )
+
+    def test_categories_and_uncategorized(self):
+        first, second = self.categories[:2]
+        self.assertEqual(
+            self.list_ids(f'category={first.pk}&category={second.pk}'),
+            self.expected_ids(Expense.objects.filter(category__in=[first, second]))
+        )
+        self.assertEqual(
+            self.list_ids(f'category={first.pk}&uncategorized=true'),
+            self.expected_ids(Expense.objects.filter(category=first) | Expense.objects.filter(category=None))
+        )
+        self.assertEqual(
+            self.list_ids('uncategorized=true'),
+            self.expected_ids(Expense.objects.filter(category=None))
+        )
+
+    def test_amount_range_and_ordering(self):
+        self.assertEqual(
+            self.list_ids('amount_min=13.50&amount_max=15.50&ordering=amount'),
+            self.expected_ids(
+                Expense.objects.filter(amount__range=(Decimal('13.50'), Decimal('15.50'))).order_by('amount', 'id')
+            )
+        )
+
+    def test_cursor_pages_follow_ordering(self):
+        ids, url = [], '/api/expenses/?page_size=5&ordering=-amount'
+        while url:
+            response = self.client.get(url)
+            ids.extend(expense['id'] for expense in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(ids, self.expected_ids(Expense.objects.order_by('-amount', '-id')))
+
+    def test_invalid_values(self):
+        for query in ('month=2024-13', 'date_after=yesterday', 'amount_min=abc', 'category=food',
+                      'uncategorized=maybe', 'ordering=description'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/expenses/?{query}')
+                self.assertEqual(response.status_code, 400)
+
+    def test_out_of_range_values(self):
+        for query, field in (('month=9999-12', 'month'), ('month=0000-01', 'month'), ('month=10000-01', 'month'),
+                             (f'category={2 ** 63}', 'category'), (f'category=1,-{2 ** 63 + 1}', 'category'),
+                             ('category=99999999999999999999999', 'category')):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/expenses/?{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()), [field])
+        self.assertEqual(self.list_ids('month=9999-11'), [])
+        self.assertEqual(self.list_ids(f'category={2 ** 63 - 1}'), [])
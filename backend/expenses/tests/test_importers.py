@@ -0,0 +1,230 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from expenses.importers import (
+    ImportRowError, StatementImporter, guess_format, parse_amount, parse_date, read_statement
+)
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+CSV = b'''\xef\xbb\xbfTransaction Date,Narration,Debit,Category
+2024-03-01,"Coffee, large",3.50,Food & Dining
+02/03/2024,"Said ""hi""",12,
+2024-03-03,Refund,-5.00,Shopping
+'''
+
+OFX = b'''OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240301120000[-5:EST]
+<TRNAMT>-42.10
+<NAME>Grocery store
+<MEMO>Card 1234
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240302<TRNAMT>1000.00<MEMO>Salary</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+'''
+
+QIF = b'''!Type:Bank
+D1/15'24
+T-1,234.56
+PRent
+LBills & Utilities:Rent
+^
+D03/02/2024
+U-7.00
+MBus ticket
+^
+'''
+
+
+def rows(content, statement_format):
+    return list(read_statement(io.BytesIO(content), statement_format))
+
+
+class ParserTests(SimpleTestCase):
+    def test_csv(self):
+        self.assertEqual(rows(CSV, 'csv'), [
+            {'date': '2024-03-01', 'description': 'Coffee, large', 'amount': '3.50', 'category': 'Food & Dining'},
+            {'date': '02/03/2024', 'description': 'Said "hi"', 'amount': '12', 'category': ''},
+            {'date': '2024-03-03', 'description': 'Refund', 'amount': '-5.00', 'category': 'Shopping'},
+        ])
+
+    def test_csv_without_required_columns(self):
+        with self.assertRaisesMessage(ImportRowError, "CSV header has no 'amount' column"):
+            rows(b'date,description\n2024-03-01,Coffee\n', 'csv')
+
+    def test_malformed_csv(self):
+        content = b'date,description,amount\n2024-03-01,"' + b'x' * 200000 + b'",1\n'
+        with self.assertRaisesMessage(ImportRowError, 'Malformed CSV at line'):
+            rows(content, 'csv')
+
+    def test_ofx(self):
+        self.assertEqual(rows(OFX, 'ofx'), [
+            {'date': '20240301', 'description': 'Grocery store', 'amount': '-42.10', 'category': None},
+            {'date': '20240302', 'description': 'Salary', 'amount': '1000.00', 'category': None},
+        ])
+
+    def test_qif(self):
+        self.assertEqual(rows(QIF, 'qif'), [
+            {'date': "1/15'24", 'description': 'Rent', 'amount': '-1,234.56', 'category': 'Bills & Utilities'},
+            {'date': '03/02/2024', 'description': 'Bus ticket', 'amount': '-7.00', 'category': None},
+        ])
+
+    def test_guess_format(self):
+        self.assertEqual([guess_format(name) for name in ('a.OFX', 'b.qif', 'c.csv', 'd.txt', 'noext')],
+                         ['ofx', 'qif', 'csv', 'csv', 'csv'])
+
+
+class DateAndAmountTests(SimpleTestCase):
+    def test_dates(self):
+        for value, expected in (
+            ('2024-03-01', date(2024, 3, 1)), (' 20240301 ', date(2024, 3, 1)), ('12/31/2024', date(2024, 12, 31)),
+            ('31.12.2024', date(2024, 12, 31)), ('13-01-2024', date(2024, 1, 13)), ("1/15'24", date(2024, 1, 15)),
+            ("15/1'24", date(2024, 1, 15)), ('02/02/2024', date(2024, 2, 2)),
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(parse_date(value), expected)
+        for value in ('', None, '2024-02-30', '31/31/2024', 'yesterday'):
+            with self.subTest(value=value), self.assertRaisesMessage(ImportRowError, 'Unrecognised date'):
+                parse_date(value)
+
+    def test_ambiguous_dates_need_an_order(self):
+        for value, day_first, month_first in (
+            ('02/03/2024', date(2024, 3, 2), date(2024, 2, 3)),
+            ("1/5'24", date(2024, 5, 1), date(2024, 1, 5)),
+            ('05.01.2024', date(2024, 1, 5), date(2024, 5, 1)),
+        ):
+            with self.subTest(value=value):
+                with self.assertRaisesMessage(ImportRowError, 'Ambiguous date'):
+                    parse_date(value)
+                self.assertEqual(parse_date(value, date_order='dmy'), day_first)
+                self.assertEqual(parse_date(value, date_order='mdy'), month_first)
+        # An order is followed, not just preferred; year-first dates read one way.
+        with self.assertRaises(ImportRowError):
+            parse_date('12/31/2024', date_order='dmy')
+        self.assertEqual(parse_date('2024-01-05', date_order='dmy'), date(2024, 1, 5))
+        self.assertEqual(parse_date('02/03/2024', date_formats=['%m/%d/%Y']), date(2024, 2, 3))
+
+    def test_amounts(self):
+        self.assertEqual(parse_amount('1,234.567', False), Decimal('1234.57'))
+        self.assertEqual(parse_amount(' 12 ', False), Decimal('12.00'))
+        self.assertEqual(parse_amount('-42.10', True), Decimal('42.10'))
+        # Deposits and zero amounts are not expenses.
+        self.assertIsNone(parse_amount('42.10', True))
+        self.assertIsNone(parse_amount('-3', False))
+        self.assertIsNone(parse_amount('0.00', False))
+        self.assertIsNone(parse_amount('0.001', False))
+        self.assertEqual(parse_amount('99999999.99', False), Decimal('99999999.99'))
+        for value in ('abc', '', None, 'NaN', '-nan', 'sNaN', 'Infinity', '-Infinity', 'inf'):
+            for debits_negative in (False, True):
+                with self.subTest(value=value, debits_negative=debits_negative):
+                    with self.assertRaisesMessage(ImportRowError, 'Unrecognised amount'):
+                        parse_amount(value, debits_negative)
+        for value in ('100000000', '1e999999', '-1e999999', '1E+30'):
+            with self.subTest(value=value), self.assertRaisesMessage(ImportRowError, 'Amount too large'):
+                parse_amount(value, value.startswith('-'))
+
+
+class StatementImporterTests(ExpenseAPITestCase):
+    def imported(self):
+        return list(Expense.objects.filter(user=self.user, date__gte=date(2025, 1, 1))
+                    .order_by('date').values_list('description', flat=True))
+
+    def statement(self, count):
+        return [
+            {'date': f'2025-01-{day:02d}', 'description': f'Row {day}', 'amount': '1.00', 'category': None}
+            for day in range(1, count + 1)
+        ]
+
+    def test_categories_and_errors(self):
+        importer = StatementImporter(self.user, debits_negative=False, date_order='dmy')
+        stats = importer.run(read_statement(io.BytesIO(CSV), 'csv'))
+        self.assertEqual(stats, {'rows': 3, 'imported': 2, 'skipped': 1, 'failed': 0})
+        coffee = Expense.objects.get(user=self.user, description='Coffee, large')
+        self.assertEqual((coffee.amount, coffee.category), (Decimal('3.50'), self.categories[0]))
+
+        stats = importer.run([{'date': 'soon', 'description': 'Bad', 'amount': '1', 'category': None}])
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(importer.errors, [{'row': 1, 'error': "Unrecognised date: 'soon'"}])
+
+    def test_ambiguous_csv_dates_fail_without_an_order(self):
+        importer = StatementImporter(self.user, debits_negative=False)
+        stats = importer.run(read_statement(io.BytesIO(CSV), 'csv'))
+        self.assertEqual(stats, {'rows': 3, 'imported': 1, 'skipped': 1, 'failed': 1})
+        self.assertTrue(importer.errors[0]['error'].startswith("Ambiguous date: '02/03/2024'"))
+
+    def test_resume_a_partial_import(self):
+        statement = self.statement(7)
+
+        def interrupted():
+            yield from statement[:5]
+            raise ConnectionResetError('upload cut off')
+
+        checkpoints = []
+        importer = StatementImporter(self.user, chunk_size=2, debits_negative=False, progress=checkpoints.append)
+        with self.assertRaises(ConnectionResetError):
+            importer.run(interrupted())
+        # Two chunks were committed; the fifth row was not.
+        self.assertEqual([checkpoint['rows'] for checkpoint in checkpoints], [2, 4])
+        self.assertEqual(importer.stats['rows'], 4)
+        self.assertEqual(self.imported(), ['Row 1', 'Row 2', 'Row 3', 'Row 4'])
+
+        resumed = StatementImporter(self.user, chunk_size=2, debits_negative=False)
+        stats = resumed.run(statement, resume_from=importer.stats['rows'])
+        self.assertEqual((stats['rows'], stats['imported']), (7, 3))
+        self.assertEqual(self.imported(), [f'Row {day}' for day in range(1, 8)])
+
+    def test_checkpoint_covers_rows_that_were_not_imported(self):
+        statement = self.statement(3) + [{'date': '2025-01-09', 'description': '', 'amount': '1', 'category': None}]
+        stats = StatementImporter(self.user, chunk_size=2, debits_negative=False).run(statement)
+        self.assertEqual((stats['rows'], stats['imported'], stats['failed']), (4, 3, 1))
+
+
+class ImportAPITests(ExpenseAPITestCase):
+    def upload(self, content, name, **data):
+        return self.client.post('/api/expenses/import/', {'file': SimpleUploadedFile(name, content), **data},
+                                format='multipart')
+
+    def test_qif_with_two_digit_years(self):
+        response = self.upload(QIF, 'statement.qif')
+        self.assertEqual(response.status_code, 201, response.json())
+        self.assertEqual((response.json()['imported'], response.json()['failed']), (2, 0))
+        rent = Expense.objects.get(user=self.user, description='Rent')
+        self.assertEqual((rent.date, rent.amount), (date(2024, 1, 15), Decimal('1234.56')))
+
+    def test_qif_dates_are_month_first(self):
+        qif = b"!Type:Bank\nD1/5'24\nT-3.00\nPBus\n^\nD1/5'24\nT-4.00\nPTram\n^\n"
+        self.assertEqual(self.upload(qif, 'statement.qif').json()['imported'], 2)
+        self.assertEqual(Expense.objects.get(user=self.user, description='Bus').date, date(2024, 1, 5))
+        self.upload(qif.replace(b'Bus', b'Taxi'), 'statement.qif', date_order='dmy')
+        self.assertEqual(Expense.objects.get(user=self.user, description='Taxi').date, date(2024, 5, 1))
+        self.assertEqual(self.upload(qif, 'statement.qif', date_order='ymd').status_code, 400)
+
+    def test_bad_amounts_fail_their_row_only(self):
+        content = (b'date,description,amount\n2024-03-01,A,NaN\n2024-03-01,B,Infinity\n'
+                   b'2024-03-01,C,1e999999\n2024-03-01,D,-sNaN\n2024-03-01,E,2.50\n')
+        response = self.upload(content, 'statement.csv', amount_sign='positive')
+        self.assertEqual(response.status_code, 201, response.json())
+        self.assertEqual((response.json()['imported'], response.json()['failed']), (1, 4))
+        self.assertEqual([error['row'] for error in response.json()['errors']], [1, 2, 3, 4])
+
+    def test_malformed_csv_is_a_bad_request(self):
+        content = b'date,description,amount\n2024-03-01,Coffee,3\n2024-03-02,"' + b'x' * 200000 + b'",1\n'
+        response = self.upload(content, 'statement.csv', amount_sign='positive')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['error'].startswith('Malformed CSV'))
+        # The row before it was still in an uncommitted chunk.
+        self.assertEqual((response.json()['imported'], response.json()['resume_from']), (0, 0))
+        self.assertFalse(Expense.objects.filter(user=self.user, description='Coffee').exists())
+
+    def test_resume_from_the_returned_checkpoint(self):
+        response = self.upload(CSV, 'statement.csv', amount_sign='positive', date_order='dmy', resume_from='1')
+        self.assertEqual(response.json()['imported'], 1)
+        self.assertFalse(Expense.objects.filter(user=self.user, description='Coffee, large').exists())
+        self.assertTrue(Expense.objects.filter(user=self.user, description='Said "hi"').exists())
@@ -0,0 +1,91 @@
+import io
+import json
+import logging
+
+from django.test import SimpleTestCase
+
+from expense_tracker.log import (
+    BackgroundHandler, JSONFormatter, SampledDebugFilter, dropped_records, parse_levels, parse_sample_rates
+)
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('expense_tracker.tests.pipeline')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.addCleanup(setattr, self.logger, 'propagate', True)
+
+    def handler(self, **kwargs):
+        stream = io.StringIO()
+        handler = BackgroundHandler(stream, **kwargs)
+        handler.setFormatter(JSONFormatter())
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        self.addCleanup(handler.close)
+        return handler, stream
+
+    def lines(self, handler, stream):
+        handler.close()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_json_lines_from_the_listener_thread(self):
+        handler, stream = self.handler()
+        owners = ['alice']
+        self.logger.info('Password reset OTP queued for %s', owners, extra={'user_id': 7})
+        owners.append('bob')
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.exception('Import failed')
+
+        first, second = self.lines(handler, stream)
+        self.assertEqual(
+            {key: first[key] for key in ('level', 'logger', 'message', 'user_id')},
+            {'level': 'INFO', 'logger': 'expense_tracker.tests.pipeline',
+             'message': "Password reset OTP queued for ['alice']", 'user_id': 7}
+        )
+        self.assertRegex(first['time'], r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3}\+00:00$')
+        self.assertEqual((second['level'], second['message']), ('ERROR', 'Import failed'))
+        self.assertIn('ValueError: boom', second['exc_info'])
+
+    def test_full_queue_drops_records(self):
+        handler, stream = self.handler(queue_size=2)
+        # Nothing takes records off the queue once the listener is stopped.
+        handler.close()
+        before = dropped_records()
+        for index in range(5):
+            self.logger.warning('Slow query %s', index)
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(dropped_records() - before, 3)
+        self.assertEqual(handler.queue.qsize(), 2)
+
+    def test_filtered_records_are_never_formatted(self):
+        class Unprintable:
+            def __str__(self):
+                raise AssertionError('formatted')
+
+        handler, stream = self.handler()
+        self.logger.setLevel(logging.INFO)
+        self.logger.debug('User found: %s', Unprintable())
+        self.assertEqual(self.lines(handler, stream), [])
+
+
+class SampledDebugFilterTests(SimpleTestCase):
+    def record(self, name, level=logging.DEBUG):
+        return logging.LogRecord(name, level, __file__, 1, 'message', None, None)
+
+    def test_samples_debug_records_per_logger(self):
+        sampler = SampledDebugFilter({'api': 10, 'api.outbox': 1})
+        kept = [sampler.filter(self.record('api.views')) for _ in range(100)]
+        self.assertEqual(kept.count(True), 10)
+        self.assertTrue(kept[0])
+        self.assertTrue(all(sampler.filter(self.record('api.views', logging.INFO)) for _ in range(20)))
+        self.assertTrue(all(sampler.filter(self.record('api.outbox')) for _ in range(20)))
+        self.assertTrue(all(sampler.filter(self.record('expenses.views')) for _ in range(20)))
+
+    def test_environment_values(self):
+        self.assertEqual(parse_levels('api=debug, django.db.backends=DEBUG,,bad'),
+                         {'api': 'DEBUG', 'django.db.backends': 'DEBUG'})
+        self.assertEqual(parse_sample_rates('api=10'), {'api': 10})
+        self.assertEqual(parse_sample_rates(''), {})
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import tempfile
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from expense_tracker.metrics import registry
+from expenses.tests.base import ExpenseAPITestCase
+
+SERVER_TIMING = re.compile(
+    r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=([\d.]+), app;dur=[\d.]+, render;dur=([\d.]+), '
+    r'total;dur=[\d.]+'
+)
+
+
+class RequestMetricsTests(ExpenseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_server_timing_header(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/expenses/')
+        match = SERVER_TIMING.fullmatch(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        self.assertEqual(int(match.group(1)), 2)
+        # Serializing and rendering this short list can take under the 0.1 ms shown.
+        self.assertGreaterEqual(float(match.group(2)), 0)
+        self.assertGreaterEqual(float(match.group(3)), 0)
+
+    def test_serialization_is_timed_apart_from_its_queries(self):
+        self.client.get('/api/expenses/')
+        self.client.get('/api/categories/')
+        stats = registry.snapshot()
+        for route in ('expense-list', 'category-list'):
+            self.assertGreater(stats[(route, 'GET')].serialize_seconds, 0)
+            self.assertLess(
+                stats[(route, 'GET')].serialize_seconds + stats[(route, 'GET')].db_seconds,
+                stats[(route, 'GET')].seconds
+            )
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_server_timing_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/expenses/'))
+
+    def test_latency_is_aggregated_per_route(self):
+        self.client.get('/api/expenses/')
+        self.client.get('/api/expenses/')
+        self.client.get('/api/expenses/dashboard/')
+        self.client.get('/api/expenses/999999/')
+
+        stats = registry.snapshot()
+        self.assertEqual(stats[('expense-list', 'GET')].count, 2)
+        self.assertEqual(stats[('expense-list', 'GET')].statuses, {200: 2})
+        self.assertEqual(stats[('expense-dashboard-stats', 'GET')].count, 1)
+        self.assertEqual(stats[('expense-detail', 'GET')].statuses, {404: 1})
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/expenses/')
+        scraper = APIClient()
+        self.assertEqual(scraper.get('/metrics').status_code, 401)
+        for authorization in ('Bearer wrong', 'Bearer secre', 'Bearer secret2', 'secret'):
+            self.assertEqual(scraper.get('/metrics', HTTP_AUTHORIZATION=authorization).status_code, 401)
+
+        response = scraper.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertRegex(body, r'http_request_duration_seconds_bucket\{route="expense-list",method="GET",pid="\d+",le="\+Inf"\} 1')
+        self.assertRegex(body, r'http_request_db_queries_total\{route="expense-list",method="GET",pid="\d+"\} 2')
+
+        self.client.get('/api/expenses/dashboard/')
+        self.client.get('/api/expenses/dashboard/')
+        body = scraper.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('# TYPE response_cache_requests_total counter', body)
+        self.assertRegex(body, r'response_cache_requests_total\{cache="dashboard",result="hit",pid="\d+"\} [1-9]')
+        self.assertRegex(body, r'response_cache_requests_total\{cache="dashboard",result="miss",pid="\d+"\} [1-9]')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_reports_every_worker(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # What another worker wrote.
+        with open(os.path.join(directory.name, 'metrics-1.json'), 'w') as f:
+            json.dump({
+                'pid': 1,
+                'routes': [['expense-list', 'GET', {
+                    'buckets': [1] + [0] * 13, 'count': 1, 'seconds': 0.004, 'db_seconds': 0.001, 'queries': 2,
+                    'serialize_seconds': 0.001, 'render_seconds': 0.001, 'statuses': {'200': 1}
+                }]],
+                'log_records_dropped': 0,
+                'cache': {},
+                'pools': [],
+            }, f)
+
+        # The scrape writes this worker's file itself; the background
+        # writer would outlive the directory.
+        with override_settings(METRICS_DIR=directory.name), mock.patch.object(registry, '_start_writer'):
+            self.client.get('/api/expenses/')
+            body = APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn(f'metrics-{os.getpid()}.json', os.listdir(directory.name))
+        self.assertEqual(body.count('# TYPE http_responses_total counter'), 1)
+        self.assertIn('http_responses_total{route="expense-list",method="GET",status="200",pid="1"} 1', body)
+        self.assertIn(
+            f'http_responses_total{{route="expense-list",method="GET",status="200",pid="{os.getpid()}"}} 1', body
+        )
+        self.assertIn('http_request_serialize_seconds_total{route="expense-list",method="GET",pid="1"} 0.001000', body)
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_metrics_endpoint_is_hidden_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('expense_tracker.metrics', 'WARNING') as logs:
+            self.client.get('/api/expenses/')
+        self.assertIn('Slow query', logs.output[0])
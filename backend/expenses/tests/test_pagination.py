@@ -0,0 +1,118 @@
+import base64
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.test import override_settings
+from django.utils import timezone
+
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class CursorPaginationTests(ExpenseAPITestCase):
+    def all_ids(self, query=''):
+        response = self.client.get(f'/api/expenses/?paginate=false&{query}')
+        self.assertEqual(response.status_code, 200)
+        return [expense['id'] for expense in response.json()]
+
+    def walk(self, url, link='next'):
+        """Follow ``link`` from ``url``, returning the pages' ids and the last page's data."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            data = response.json()
+            pages.append([expense['id'] for expense in data['results']])
+            url = data[link]
+            self.assertLess(len(pages), 50)
+        return pages, data
+
+    def test_opt_in(self):
+        self.assertIsInstance(self.client.get('/api/expenses/').json(), list)
+        for query in ('paginate=true', 'page_size=5', 'paginate=1&page_size=5'):
+            with self.subTest(query):
+                self.assertEqual(set(self.client.get(f'/api/expenses/?{query}').json()),
+                                 {'next', 'previous', 'results'})
+        with override_settings(EXPENSE_PAGINATE_BY_DEFAULT=True):
+            self.assertIn('results', self.client.get('/api/expenses/').json())
+            self.assertIsInstance(self.client.get('/api/expenses/?paginate=false').json(), list)
+
+    @override_settings(EXPENSE_PAGE_SIZE=7, EXPENSE_MAX_PAGE_SIZE=10)
+    def test_page_sizes(self):
+        for query, size in (('paginate=true', 7), ('page_size=3', 3), ('page_size=0', 7),
+                            ('page_size=many', 7), ('page_size=1000', 10)):
+            with self.subTest(query):
+                self.assertEqual(len(self.client.get(f'/api/expenses/?{query}').json()['results']), size)
+
+    def test_round_trip(self):
+        expected = self.all_ids()
+        pages, last = self.walk('/api/expenses/?page_size=5')
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 4])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertIsNone(last['next'])
+
+        # And back again from the last page.
+        back, first = self.walk(last['previous'], link='previous')
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNone(first['previous'])
+
+    def test_round_trip_with_filters_and_ordering(self):
+        for query in (f'category={self.categories[0].pk}', 'ordering=amount', 'ordering=-amount',
+                      'ordering=date', 'month=2024-03&ordering=-amount'):
+            with self.subTest(query):
+                pages, last = self.walk(f'/api/expenses/?page_size=3&{query}')
+                flat = sum(pages, [])
+                # The plain list leaves ties unordered; the pages break them by id.
+                self.assertEqual(sorted(flat), sorted(self.all_ids(query)))
+                self.assertEqual(len(flat), len(set(flat)))
+                if last['previous']:
+                    back, _ = self.walk(last['previous'], link='previous')
+                    self.assertEqual(back, pages[-2::-1])
+
+    def test_ties_on_date_and_created_at(self):
+        # Ties on every ordering column but id, as a bulk import produces.
+        created_at = timezone.now()
+        ids = [
+            Expense.objects.create(user=self.user, amount=Decimal('5.00'), description=f'Tie {index}',
+                                   date=date(2024, 9, 9)).pk
+            for index in range(7)
+        ]
+        Expense.objects.filter(pk__in=ids).update(created_at=created_at)
+        pages, last = self.walk('/api/expenses/?page_size=2&month=2024-09')
+        self.assertEqual(sum(pages, []), sorted(ids, reverse=True))
+        back, _ = self.walk(last['previous'], link='previous')
+        self.assertEqual(sum(reversed(back), []) + pages[-1], sorted(ids, reverse=True))
+
+        # Amounts tie across the fixture's categories.
+        pages, _ = self.walk('/api/expenses/?page_size=4&ordering=amount')
+        flat = sum(pages, [])
+        self.assertEqual(len(flat), len(set(flat)))
+        self.assertEqual(sorted(flat), sorted(self.all_ids('ordering=amount')))
+        amounts = dict(Expense.objects.filter(pk__in=flat).values_list('pk', 'amount'))
+        self.assertEqual(flat, sorted(flat, key=lambda pk: (amounts[pk], pk)))
+
+    def test_links_are_https_behind_the_proxy(self):
+        response = self.client.get('/api/expenses/?page_size=5', HTTP_HOST='api.example.com',
+                                   HTTP_X_FORWARDED_PROTO='https')
+        self.assertTrue(response.json()['next'].startswith('https://api.example.com/api/expenses/?'))
+        response = self.client.get('/api/expenses/?page_size=5')
+        self.assertTrue(response.json()['next'].startswith('http://testserver/'))
+
+    def test_links_keep_paging_without_the_flag(self):
+        data = self.client.get('/api/expenses/?paginate=true&page_size=5').json()
+        self.assertNotIn('paginate=', data['next'])
+        self.assertIn('results', self.client.get(data['next']).json())
+
+    def test_invalid_cursors(self):
+        for cursor in ('nonsense', '!!!', _token({'p': ['2024-01-01']}), _token({'p': ['not a date', None, 1]}),
+                       _token({'q': []}), _token(['2024-01-01']), _token({'p': ['2024-01-01', 'x', 'y']}),
+                       _token({'p': ['2024-01-01', '2024-01-01T00:00:00Z', 2 ** 63]})):
+            with self.subTest(cursor):
+                response = self.client.get(f'/api/expenses/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
@@ -0,0 +1,119 @@
+import marshal
+import sys
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.models import RequestProfile
+from expense_tracker.profiling import StackSampler, load_stats
+from expenses.tests.base import ExpenseAPITestCase
+
+
+def _inner():
+    time.sleep(0.05)
+
+
+def _outer():
+    _inner()
+
+
+@override_settings(PROFILE_TOKEN='secret', PROFILE_SAMPLE_RATE=0)
+class RequestProfilingTests(ExpenseAPITestCase):
+    def test_token_profiles_the_request(self):
+        response = self.client.get('/api/expenses/dashboard/', HTTP_X_PROFILE='secret')
+        self.assertEqual(response.status_code, 200)
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.route, 'expense-dashboard-stats')
+        self.assertEqual(profile.trigger, RequestProfile.TOKEN)
+        self.assertEqual(profile.user_id, self.user.pk)
+        self.assertEqual(profile.status_code, 200)
+        self.assertGreater(profile.queries, 0)
+        self.assertGreater(profile.duration_ms, profile.db_ms)
+
+        functions = {name for _, _, name in load_stats(bytes(profile.stats)).stats}
+        self.assertIn('dashboard_stats', functions)
+        for line in profile.stacks.splitlines():
+            self.assertRegex(line, r'^inner \(handlers/exception\.py:\d+\);.+ \d+$')
+
+    def test_unprofiled_requests_are_untouched(self):
+        response = self.client.get('/api/expenses/', HTTP_X_PROFILE='wrong')
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.get('/api/expenses/')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_can_profile_with_any_value(self):
+        staff = User.objects.create_user('carol', 'carol@example.com', 'correct-horse-battery', is_staff=True)
+        response = self.client_for(staff).get('/api/categories/', HTTP_X_PROFILE='1')
+        self.assertIn('X-Profile-Id', response)
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.trigger, profile.route, profile.user_id), (RequestProfile.STAFF, 'category-list', staff.pk))
+
+    def test_auth_views_are_profiled(self):
+        response = APIClient().post(
+            '/api/auth/login/', {'username': 'alice', 'password': 'correct-horse-battery'},
+            format='json', HTTP_X_PROFILE='secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(RequestProfile.objects.get().route, 'login')
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sampling_only_covers_the_api_views(self):
+        response = self.client.get('/api/expenses/')
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.get('/api/')
+        self.assertEqual(list(RequestProfile.objects.values_list('route', 'trigger')),
+                         [('expense-list', RequestProfile.SAMPLED)])
+
+    @override_settings(PROFILE_KEEP=2)
+    def test_old_profiles_are_deleted(self):
+        for _ in range(4):
+            self.client.get('/api/expenses/', HTTP_X_PROFILE='secret')
+        self.assertEqual(RequestProfile.objects.count(), 2)
+
+    def test_save_failure_does_not_fail_the_request(self):
+        with mock.patch.object(RequestProfile.objects, 'create', side_effect=RuntimeError('disk full')), \
+                self.assertLogs('expense_tracker.profiling', 'ERROR'):
+            response = self.client.get('/api/expenses/', HTTP_X_PROFILE='secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_downloads(self):
+        self.client.get('/api/expenses/dashboard/', HTTP_X_PROFILE='secret')
+        profile = RequestProfile.objects.get()
+        admin = User.objects.create_superuser('root', 'root@example.com', 'correct-horse-battery')
+        browser = APIClient()
+        browser.force_login(admin)
+
+        self.assertContains(browser.get('/admin/api/requestprofile/'), '/api/expenses/dashboard/')
+        self.assertContains(browser.get(f'/admin/api/requestprofile/{profile.pk}/change/'), 'dashboard_stats')
+
+        response = browser.get(f'/admin/api/requestprofile/{profile.pk}/download/prof/')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="profile-{profile.pk}.prof"')
+        self.assertEqual(marshal.loads(response.content), marshal.loads(bytes(profile.stats)))
+
+        response = browser.get(f'/admin/api/requestprofile/{profile.pk}/download/collapsed/')
+        self.assertEqual(response.content.decode(), profile.stacks)
+
+        self.assertEqual(APIClient().get(f'/admin/api/requestprofile/{profile.pk}/download/prof/').status_code, 302)
+
+
+class StackSamplerTests(ExpenseAPITestCase):
+    def test_samples_the_stack_below_the_root(self):
+        sampler = StackSampler(threading.get_ident(), sys._getframe(), 0.001)
+        sampler.start()
+        try:
+            _outer()
+        finally:
+            sampler.stop()
+
+        lines = [line.rsplit(' ', 1) for line in sampler.collapsed().splitlines()]
+        stack, count = max(lines, key=lambda line: int(line[1]))
+        self.assertRegex(stack, r'^_outer \(tests/test_profiling\.py:\d+\);_inner \(tests/test_profiling\.py:\d+\)$')
+        self.assertGreater(int(count), 10)
@@ -0,0 +1,162 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+from expenses.tests.query_budget import QueryBudgetMixin
+
+
+class ExpenseQueryBudgetTests(QueryBudgetMixin, ExpenseAPITestCase):
+    urlconf = 'expenses.urls'
+    # Authentication reads no rows: the client's user status is cached (see
+    # ExpenseAPITestCase.client_for).
+    query_budgets = {
+        ('api-root', 'get'): 0,
+        ('expense-list', 'get'): 2,
+        ('expense-list', 'post'): 4,
+        ('expense-detail', 'get'): 1,
+        ('expense-detail', 'patch'): 8,
+        ('expense-detail', 'delete'): 8,
+        ('expense-bulk', 'post'): 6,
+        ('expense-bulk', 'patch'): 7,
+        ('expense-import-statement', 'post'): 6,
+        ('expense-export', 'get'): 1,
+        ('expense-search', 'get'): 2,
+        ('expense-changes', 'get'): 3,
+        ('expense-dashboard-stats', 'get'): 3,
+        ('category-list', 'get'): 2,
+        ('category-list', 'post'): 1,
+        ('category-detail', 'get'): 1,
+        ('category-detail', 'put'): 2,
+        ('category-detail', 'delete'): 8,
+        ('async-expense-list', 'get'): 2,
+        ('async-expense-dashboard-stats', 'get'): 3,
+        ('async-category-list', 'get'): 2,
+    }
+
+    def add_expenses(self, count):
+        Expense.objects.bulk_create(
+            Expense(
+                user=self.user,
+                category=self.categories[index % len(self.categories)],
+                amount=Decimal('5.00'),
+                description='Extra',
+                date=date(2024, 2, 1)
+            )
+            for index in range(count)
+        )
+
+    def test_api_root(self):
+        self.assertQueryBudget('get', '/api/')
+
+    def test_expense_list(self):
+        self.assertQueryBudget('get', '/api/expenses/')
+        self.assertQueryBudget('get', '/api/expenses/?paginate=false')
+
+    def test_expense_list_filtered(self):
+        categories = ','.join(str(category.pk) for category in self.categories[:2])
+        self.assertQueryBudget(
+            'get',
+            f'/api/expenses/?month=2024-03&category={categories}&uncategorized=true&amount_min=1'
+        )
+
+    def test_expense_list_does_not_grow_with_rows(self):
+        self.add_expenses(50)
+        self.assertQueryBudget('get', '/api/expenses/?paginate=false')
+        self.assertQueryBudget('get', '/api/expenses/?page_size=500')
+
+    def test_expense_create(self):
+        self.assertQueryBudget('post', '/api/expenses/', {
+            'amount': '20.00',
+            'description': 'Lunch',
+            'category': self.categories[0].pk,
+            'date': '2024-03-04',
+        })
+
+    def test_expense_retrieve(self):
+        self.assertQueryBudget('get', f'/api/expenses/{self.any_expense().pk}/')
+
+    def test_expense_update(self):
+        self.assertQueryBudget('patch', f'/api/expenses/{self.any_expense().pk}/', {
+            'category': self.categories[1].pk,
+            'date': '2023-12-31',
+        })
+
+    def test_expense_destroy(self):
+        self.assertQueryBudget('delete', f'/api/expenses/{self.any_expense().pk}/')
+
+    def test_bulk_create(self):
+        items = [
+            {
+                'amount': f'{index + 1}.50',
+                'description': f'Imported {index}',
+                'category': self.categories[index % len(self.categories)].pk,
+                'date': f'2024-0{1 + index % 3}-15',
+            }
+            for index in range(60)
+        ]
+        response = self.assertQueryBudget('post', '/api/expenses/bulk/', items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['ids']), 60)
+
+    def test_bulk_update(self):
+        ids = list(Expense.objects.filter(user=self.user).values_list('pk', flat=True))
+        items = [{'id': pk, 'amount': '3.00', 'category': self.categories[0].pk} for pk in ids]
+        response = self.assertQueryBudget('patch', '/api/expenses/bulk/', items)
+        self.assertEqual(response.status_code, 200)
+
+    def test_import_statement(self):
+        rows = ''.join(
+            f'2024-0{1 + index % 3}-15,Imported {index},{index + 1}.50,{self.categories[index % 3].name}\n'
+            for index in range(60)
+        )
+        upload = SimpleUploadedFile('statement.csv', f'date,description,amount,category\n{rows}'.encode())
+        response = self.assertQueryBudget('post', '/api/expenses/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 60)
+
+    def test_export_does_not_grow_with_rows(self):
+        self.add_expenses(50)
+        for export_format in ('csv', 'ndjson'):
+            response = self.assertQueryBudget('get', f'/api/expenses/export/?format={export_format}')
+            self.assertEqual(response.status_code, 200)
+
+    def test_search(self):
+        self.add_expenses(50)
+        response = self.assertQueryBudget('get', '/api/expenses/search/?q=ext&limit=100')
+        self.assertEqual(len(response.data), 50)
+
+    def test_changes(self):
+        self.add_expenses(50)
+        response = self.assertQueryBudget('get', '/api/expenses/changes/')
+        self.client.delete(f'/api/expenses/{self.any_expense().pk}/')
+        self.assertQueryBudget('get', f"/api/expenses/changes/?since={response.data['next']}")
+
+    def test_dashboard(self):
+        self.add_expenses(50)
+        self.assertQueryBudget('get', '/api/expenses/dashboard/')
+
+    def test_category_list(self):
+        self.assertQueryBudget('get', '/api/categories/')
+
+    def test_category_create(self):
+        self.assertQueryBudget('post', '/api/categories/', {'name': 'Gifts'})
+
+    def test_category_retrieve(self):
+        self.assertQueryBudget('get', f'/api/categories/{self.categories[0].pk}/')
+
+    def test_category_update(self):
+        self.assertQueryBudget('put', f'/api/categories/{self.categories[0].pk}/', {'name': 'Eating out'})
+
+    def test_category_destroy(self):
+        self.assertQueryBudget('delete', f'/api/categories/{self.empty_category.pk}/')
+        self.assertQueryBudget('delete', f'/api/categories/{self.categories[0].pk}/')
+
+    def test_async_reads(self):
+        self.add_expenses(50)
+        self.assertQueryBudget('get', '/api/async/expenses/')
+        self.assertQueryBudget('get', '/api/async/expenses/?paginate=false')
+        self.assertQueryBudget('get', '/api/async/expenses/dashboard/')
+        self.assertQueryBudget('get', '/api/async/categories/')
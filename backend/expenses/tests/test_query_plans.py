@@ -0,0 +1,192 @@
+import json
+from datetime import date
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from expenses.models import Expense
+from expenses.tests.base import ExpenseAPITestCase
+
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class QueryPlanTests(ExpenseAPITestCase):
+    """
+    Drive each endpoint, EXPLAIN every statement it ran and fail if any of
+    them needs a full table scan or a temporary sort.
+    """
+
+    def assertIndexed(self, method, path, data=None, format='json', allow_sort=False):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path, data, format=format)
+            if response.streaming:
+                response.streaming_content = list(response.streaming_content)
+        self.assertLess(response.status_code, 400, response.getvalue())
+        self.assertPlansIndexed(context, f'{method.upper()} {path}', allow_sort)
+        return response
+
+    def assertPlansIndexed(self, context, label, allow_sort=False):
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+                continue
+            problems = self.plan_problems(sql)
+            if allow_sort:
+                problems = [problem for problem in problems if not problem.startswith('Sort ')]
+            self.assertFalse(
+                problems,
+                f"{label} ran an unindexed query:\n{sql}\n" + '\n'.join(problems)
+            )
+
+    def plan_problems(self, sql):
+        if connection.vendor == 'sqlite':
+            return self._sqlite_plan_problems(sql)
+        if connection.vendor == 'postgresql':
+            return self._postgresql_plan_problems(sql)
+        self.skipTest(f'No plan checks for {connection.vendor}')
+
+    def _sqlite_plan_problems(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        return [
+            detail for detail in details
+            if (detail.startswith('SCAN ') and not self._sqlite_indexed_scan(detail))
+            or 'TEMP B-TREE' in detail
+        ]
+
+    @staticmethod
+    def _sqlite_indexed_scan(detail):
+        # FTS5 reports a MATCH as a "scan" of the virtual table with an 'M'
+        # constraint in its index string; it is an index lookup.
+        return detail == 'SCAN CONSTANT ROW' or (
+            'VIRTUAL TABLE INDEX' in detail and ':M' in detail
+        )
+
+    def _postgresql_plan_problems(self, sql):
+        # Tiny test tables make sequential scans and sorts look cheap, so
+        # forbid them; the planner only falls back to one if no index fits.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            cursor.execute('RESET enable_seqscan')
+            cursor.execute('RESET enable_sort')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        problems = []
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] in ('Seq Scan', 'Sort', 'Incremental Sort'):
+                problems.append(f"{node['Node Type']} on {node.get('Relation Name', '?')}")
+            nodes.extend(node.get('Plans', []))
+        return problems
+
+    def test_expense_list(self):
+        self.assertIndexed('get', '/api/expenses/')
+
+    def test_expense_list_cursor_page(self):
+        response = self.assertIndexed('get', '/api/expenses/?page_size=5')
+        self.assertIndexed('get', response.json()['next'])
+
+    def test_expense_list_unpaginated(self):
+        self.assertIndexed('get', '/api/expenses/?paginate=false')
+
+    def test_expense_list_filters(self):
+        first, second = (category.pk for category in self.categories[:2])
+        for query in (
+            'month=2024-03',
+            'date_after=2024-02-01&date_before=2024-04-30',
+            f'category={first}',
+            f'category={first}&month=2024-03',
+            f'category={first},{second}',
+            f'category={first}&uncategorized=true',
+            'uncategorized=true',
+            'uncategorized=true&ordering=date',
+            'amount_min=13&amount_max=15&ordering=amount',
+            'amount_min=13&ordering=-amount',
+            'ordering=amount',
+            'ordering=date&month=2024-02',
+        ):
+            with self.subTest(query=query):
+                response = self.assertIndexed('get', f'/api/expenses/?page_size=2&{query}')
+                if response.json()['next']:
+                    self.assertIndexed('get', response.json()['next'])
+
+    def test_expense_search(self):
+        # Ranking by ts_rank on PostgreSQL sorts the matches, which only
+        # an index may find.
+        self.assertIndexed('get', '/api/expenses/search/?q=expen 3', allow_sort=True)
+
+    def test_expense_retrieve(self):
+        self.assertIndexed('get', f'/api/expenses/{self.any_expense().pk}/')
+
+    def test_expense_create(self):
+        self.assertIndexed('post', '/api/expenses/', {
+            'amount': '20.00',
+            'description': 'Lunch',
+            'category': self.categories[0].pk,
+            'date': '2024-03-04',
+        })
+
+    def test_expense_update_moves_category_and_month(self):
+        expense = self.any_expense()
+        self.assertIndexed('patch', f'/api/expenses/{expense.pk}/', {
+            'category': self.categories[1].pk,
+            'date': date(2023, 12, 31).isoformat(),
+        })
+
+    def test_expense_destroy(self):
+        self.assertIndexed('delete', f'/api/expenses/{self.any_expense().pk}/')
+
+    def test_expense_bulk_create(self):
+        self.assertIndexed('post', '/api/expenses/bulk/', [
+            {'amount': '9.99', 'description': 'Imported', 'category': category.pk, 'date': '2024-05-02'}
+            for category in self.categories
+        ])
+
+    def test_expense_bulk_update(self):
+        ids = Expense.objects.filter(user=self.user).values_list('pk', flat=True)[:10]
+        self.assertIndexed('patch', '/api/expenses/bulk/', [
+            {'id': pk, 'date': '2022-02-02', 'category': self.categories[2].pk} for pk in ids
+        ])
+
+    def test_expense_import(self):
+        statement = 'date,description,amount,category\n' + ''.join(
+            f'2024-05-02,Imported,9.99,{category.name}\n' for category in self.categories
+        )
+        self.assertIndexed('post', '/api/expenses/import/', {
+            'file': SimpleUploadedFile('statement.csv', statement.encode()),
+        }, format='multipart')
+
+    def test_expense_export(self):
+        self.assertIndexed('get', '/api/expenses/export/?format=csv')
+
+    def test_expense_changes(self):
+        response = self.assertIndexed('get', '/api/expenses/changes/')
+        self.client.delete(f'/api/expenses/{self.any_expense().pk}/')
+        self.assertIndexed('get', f"/api/expenses/changes/?since={response.data['next']}")
+
+    def test_dashboard(self):
+        self.assertIndexed('get', '/api/expenses/dashboard/')
+
+    def test_category_list(self):
+        self.assertIndexed('get', '/api/categories/')
+
+    def test_category_retrieve(self):
+        self.assertIndexed('get', f'/api/categories/{self.categories[0].pk}/')
+
+    def test_category_destroy(self):
+        self.assertIndexed('delete', f'/api/categories/{self.empty_category.pk}/')
+
+    def test_category_destroy_in_use(self):
+        path = f'/api/categories/{self.categories[0].pk}/'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(path)
+        # Refused, but the check that refuses it must be indexed too.
+        self.assertEqual(response.status_code, 400)
+        self.assertPlansIndexed(context, f'DELETE {path}')
@@ -0,0 +1,122 @@
+import io
+import uuid
+from datetime import date, datetime, time, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from expenses.benchmarking import json_payload
+from expenses.parsers import FastJSONParser
+from expenses.renderers import FastJSONRenderer, json_backend
+from expenses.tests.base import ExpenseAPITestCase
+
+BACKENDS = ('orjson', 'stdlib')
+
+
+def _renderer(backend):
+    renderer = FastJSONRenderer()
+    renderer.backend = backend
+    return renderer
+
+
+def _parser(backend):
+    parser = FastJSONParser()
+    parser.backend = backend
+    return parser
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    payloads = {
+        'expenses': json_payload(20),
+        'dashboard': {
+            'total_expenses': Decimal('1234.50'), 'monthly_expenses': Decimal('0.10'),
+            'category_expenses': [{'category__name': 'Café', 'total': Decimal('99999999.99')}],
+        },
+        'types': {
+            'aware': datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2024, 3, 1, 12, 30), 'date': date(2024, 3, 1), 'time': time(9, 5),
+            'uuid': uuid.UUID(int=7), 'error': ErrorDetail('Invalid category selected.', code='invalid'),
+            'numbers': [0, -1, 2 ** 63, 1.5, True, None],
+        },
+        'separators': {'description': 'Line\u2028break\u2029 ünïcode 😀 "quoted" \\ </script>'},
+        'non-str keys': {1: 'one', None: 'none'},
+    }
+
+    def test_renders_like_json_renderer(self):
+        for backend in BACKENDS:
+            for name, payload in self.payloads.items():
+                with self.subTest(backend=backend, payload=name):
+                    self.assertEqual(_renderer(backend).render(payload), JSONRenderer().render(payload))
+
+    def test_money_keeps_its_format(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                content = _renderer(backend).render(self.payloads['dashboard'])
+                self.assertIn(b'"total_expenses":1234.5,', content)
+                self.assertIn(b'"amount":"0.01"', _renderer(backend).render(self.payloads['expenses']))
+
+    def test_pretty_printing_uses_json_renderer(self):
+        content = _renderer('orjson').render(self.payloads['types'], 'application/json; indent=4')
+        self.assertEqual(content, JSONRenderer().render(self.payloads['types'], 'application/json; indent=4'))
+        self.assertEqual(_renderer('orjson').render(None), b'')
+
+    def test_backend_setting(self):
+        with override_settings(JSON_BACKEND='auto'):
+            self.assertEqual(json_backend(), 'orjson')
+            with mock.patch('expenses.renderers.orjson', None):
+                self.assertEqual(json_backend(), 'stdlib')
+                self.assertEqual(FastJSONRenderer().render({'a': 1}), b'{"a":1}')
+                with self.assertRaises(ImproperlyConfigured):
+                    json_backend('orjson')
+        with override_settings(JSON_BACKEND='stdlib'):
+            self.assertEqual(json_backend(), 'stdlib')
+            self.assertEqual(json_backend('orjson'), 'orjson')
+        with override_settings(JSON_BACKEND='simplejson'), self.assertRaises(ImproperlyConfigured):
+            json_backend()
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def test_parses_like_json_parser(self):
+        body = JSONRenderer().render(json_payload(5)) + b' '
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(_parser(backend).parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+
+    def test_what_orjson_rejects_parses_as_before(self):
+        self.assertEqual(_parser('orjson').parse(io.BytesIO(b'{"id": 18446744073709551616}')),
+                         {'id': 18446744073709551616})
+        for body in (b'{"amount": ', b'{"amount": NaN}', b'\xef\xbb\xbf{}'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    JSONParser().parse(io.BytesIO(body))
+                with self.assertRaises(ParseError) as error:
+                    _parser('orjson').parse(io.BytesIO(body))
+                self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_other_encodings_use_json_parser(self):
+        body = '{"description": "Café"}'.encode('latin-1')
+        parsed = _parser('orjson').parse(io.BytesIO(body), parser_context={'encoding': 'latin-1'})
+        self.assertEqual(parsed, {'description': 'Café'})
+
+
+class FastJSONAPITests(ExpenseAPITestCase):
+    def test_api_renders_and_parses_with_it(self):
+        for path in ('/api/expenses/', '/api/expenses/dashboard/', '/api/categories/', '/api/async/expenses/'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.content, JSONRenderer().render(response.json()))
+
+        response = self.client.post('/api/expenses/', {
+            'amount': '10.05', 'description': 'Lunch ☕', 'category': self.categories[0].pk, 'date': '2024-03-01'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['amount'], response.json()['description']), ('10.05', 'Lunch ☕'))
+
+        response = self.client.post('/api/expenses/', b'{"amount": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error - '))
@@ -0,0 +1,69 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from expenses.models import Expense
+from expenses.representations import Representation, expense_representation
+from expenses.serializers import ExpenseSerializer
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class ExpenseRepresentationContractTests(ExpenseAPITestCase):
+    """expense_representation renders exactly what ExpenseSerializer does."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for amount, description in ((Decimal('0.01'), 'Gum'), (Decimal('99999999.99'), 'Flat ✓ "quoted"'),
+                                    (Decimal('7'), ''), (Decimal('1.5'), 'Line break')):
+            Expense.objects.create(
+                user=cls.user, category=cls.categories[1], amount=amount, description=description, date=date(2024, 2, 29)
+            )
+        # Written at an odd microsecond, as auto_now never lines up with auto_now_add.
+        Expense.objects.filter(description='Gum').update(updated_at=datetime(2024, 3, 1, 0, 0, 0, 7, tzinfo=dt_timezone.utc))
+
+    def assertSameBytes(self, queryset):
+        expected = JSONRenderer().render(ExpenseSerializer(queryset.select_related('category'), many=True).data)
+        self.assertEqual(JSONRenderer().render(expense_representation.many(expense_representation.rows(queryset))), expected)
+
+    def test_every_expense(self):
+        queryset = Expense.objects.filter(user=self.user)
+        self.assertTrue(queryset.filter(category=None).exists())
+        self.assertSameBytes(queryset)
+
+    def test_other_time_zones(self):
+        for zone in ('Europe/Paris', 'America/St_Johns', 'UTC'):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assertSameBytes(Expense.objects.filter(user=self.user))
+        with override_settings(USE_TZ=False):
+            self.assertSameBytes(Expense.objects.filter(user=self.user))
+
+    def test_views(self):
+        expense = Expense.objects.get(description='Gum')
+        response = self.client.get(f'/api/expenses/{expense.pk}/')
+        self.assertEqual(response.content, JSONRenderer().render(ExpenseSerializer(expense).data))
+
+        response = self.client.get('/api/expenses/?paginate=false')
+        expected = ExpenseSerializer(Expense.objects.filter(user=self.user).select_related('category'), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+        response = self.client.get('/api/expenses/dashboard/')
+        recent = Expense.objects.filter(user=self.user).select_related('category').order_by('-date')[:5]
+        self.assertEqual(response.json()['recent_expenses'], ExpenseSerializer(recent, many=True).data)
+
+    def test_retrieve_uses_the_view_queryset(self):
+        other = Expense.objects.create(user=self.other_user, amount=Decimal('5.00'), description='Not yours', date=date(2024, 1, 1))
+        self.assertEqual(self.client.get(f'/api/expenses/{other.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/expenses/nonsense/').status_code, 404)
+
+    def test_unsupported_sources(self):
+        class WholeObject(serializers.Serializer):
+            everything = serializers.CharField(source='*')
+
+        with self.assertRaises(ImproperlyConfigured):
+            Representation(WholeObject).compile(None)
@@ -0,0 +1,154 @@
+from io import StringIO
+from datetime import date
+from decimal import Decimal
+
+from django.core.management import CommandError, call_command
+
+from expenses.models import Expense, ExpenseRollup
+from expenses.tests.base import ExpenseAPITestCase
+
+CENTS = Decimal('0.01')
+
+
+class RollupTests(ExpenseAPITestCase):
+    """Every write path leaves the rollups equal to a fresh aggregate."""
+
+    def rollups(self, user):
+        return {
+            (month, category_id): (total, count)
+            for month, category_id, total, count in ExpenseRollup.objects.filter(user=user).values_list(
+                'month', 'category_id', 'total', 'expense_count'
+            )
+        }
+
+    def assertRollupsMatch(self, *users):
+        for user in users or (self.user, self.other_user):
+            expected = {
+                (row['month'], row['category_id']): (row['total'].quantize(CENTS), row['expense_count'])
+                for row in ExpenseRollup.objects.expected_for_user(user.pk)
+            }
+            self.assertEqual(self.rollups(user), expected)
+
+    def create(self, **fields):
+        return Expense.objects.create(**{
+            'user': self.user, 'amount': Decimal('10.00'), 'description': 'Rollup', 'date': date(2024, 3, 15),
+            **fields
+        })
+
+    def test_fixture(self):
+        self.assertRollupsMatch()
+        self.assertEqual(self.rollups(self.user)[(date(2024, 1, 1), None)], (Decimal('12.50'), 1))
+
+    def test_create(self):
+        self.create(category=self.categories[0])
+        self.create(category=self.empty_category, date=date(2023, 12, 31))
+        self.create(category=None, amount=Decimal('0.01'))
+        self.assertRollupsMatch()
+        self.assertEqual(self.rollups(self.user)[(date(2023, 12, 1), self.empty_category.pk)],
+                         (Decimal('10.00'), 1))
+
+    def test_edit_amount(self):
+        expense = self.create(category=self.categories[1])
+        expense.amount = Decimal('3.33')
+        expense.save()
+        self.assertRollupsMatch()
+
+    def test_recategorise(self):
+        expense = self.create(category=self.categories[0])
+        expense.category = self.empty_category
+        expense.save()
+        self.assertRollupsMatch()
+        expense.category = None
+        expense.save()
+        self.assertRollupsMatch()
+
+    def test_redate_across_months_and_years(self):
+        expense = self.create(category=self.categories[2])
+        for day in (date(2024, 3, 31), date(2024, 4, 1), date(2025, 1, 1), date(2024, 3, 1)):
+            expense.date = day
+            expense.save()
+            self.assertRollupsMatch()
+
+    def test_move_to_another_user(self):
+        expense = self.create(category=None)
+        expense.user = self.other_user
+        expense.save()
+        self.assertRollupsMatch()
+
+    def test_delete_last_expense_of_a_month(self):
+        expense = self.create(date=date(2022, 6, 6), category=self.empty_category)
+        expense.delete()
+        self.assertRollupsMatch()
+        self.assertNotIn((date(2022, 6, 1), self.empty_category.pk), self.rollups(self.user))
+
+    def test_api_writes(self):
+        response = self.client.post('/api/expenses/', {
+            'amount': '7.25', 'description': 'Taxi', 'date': '2024-02-29', 'category': self.categories[1].pk
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertRollupsMatch()
+        pk = response.json()['id']
+        response = self.client.patch(f'/api/expenses/{pk}/', {'date': '2024-05-01', 'amount': '8.00'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertRollupsMatch()
+        self.assertEqual(self.client.delete(f'/api/expenses/{pk}/').status_code, 204)
+        self.assertRollupsMatch()
+
+    def test_bulk_update(self):
+        expenses = Expense.objects.filter(user=self.user, category=self.categories[0])
+        self.assertEqual(expenses.update(amount=Decimal('1.10')), self.expenses_per_category)
+        self.assertRollupsMatch()
+        Expense.objects.filter(user=self.user, category=None).update(category=self.empty_category)
+        self.assertRollupsMatch()
+        Expense.objects.filter(user=self.user, date__month=2).update(date=date(2024, 12, 24))
+        self.assertRollupsMatch()
+        Expense.objects.filter(user=self.user, category=self.categories[1]).update(user=self.other_user)
+        self.assertRollupsMatch()
+
+    def test_bulk_delete(self):
+        # A few (month, category) pairs take one query each; more are batched.
+        Expense.objects.filter(user=self.user, category=self.categories[0], date__month__lte=2).delete()
+        self.assertRollupsMatch()
+        Expense.objects.filter(user=self.user, date__month__gte=4).delete()
+        self.assertRollupsMatch()
+        Expense.objects.filter(user=self.user).delete()
+        self.assertRollupsMatch()
+        self.assertEqual(self.rollups(self.user), {})
+
+    def test_bulk_create_batch(self):
+        expenses = Expense.objects.bulk_create([
+            Expense(user=self.user, amount=Decimal('2.00') + index, description=f'Batch {index}',
+                    date=date(2024, 1 + index % 12, 10), category=self.categories[index % 3])
+            for index in range(24)
+        ])
+        ExpenseRollup.objects.add_expenses(expenses)
+        self.assertRollupsMatch()
+
+
+class RebuildRollupsCommandTests(ExpenseAPITestCase):
+    def drift(self):
+        rollup = ExpenseRollup.objects.filter(user=self.user).first()
+        ExpenseRollup.objects.filter(pk=rollup.pk).update(total=rollup.total + 5, expense_count=99)
+        ExpenseRollup.objects.filter(user=self.user).exclude(pk=rollup.pk).first().delete()
+        ExpenseRollup.objects.create(user=self.user, month=date(1999, 1, 1), total=Decimal('1.00'), expense_count=1)
+
+    def test_verify_reports_drift(self):
+        call_command('rebuild_expense_rollups', '--verify', stdout=StringIO())
+        self.drift()
+        with self.assertRaisesMessage(CommandError, '1 of 2 users have stale rollups'):
+            call_command('rebuild_expense_rollups', '--verify', stdout=StringIO())
+
+    def test_rebuild_repairs_drift(self):
+        expected = set(ExpenseRollup.objects.filter(user=self.user).values_list(
+            'month', 'category_id', 'total', 'expense_count'
+        ))
+        self.drift()
+        call_command('rebuild_expense_rollups', '--user', 'alice', stdout=StringIO())
+        self.assertEqual(set(ExpenseRollup.objects.filter(user=self.user).values_list(
+            'month', 'category_id', 'total', 'expense_count'
+        )), expected)
+        call_command('rebuild_expense_rollups', '--verify', stdout=StringIO())
+
+    def test_unknown_user(self):
+        with self.assertRaisesMessage(CommandError, 'User nobody does not exist'):
+            call_command('rebuild_expense_rollups', '--user', 'nobody')
@@ -0,0 +1,109 @@
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import TransactionTestCase
+
+from expenses.models import Expense
+from expenses.search import FTS_TRIGGERS, ensure_installed, missing_objects, search_expenses
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class ExpenseSearchTests(ExpenseAPITestCase):
+    def search(self, q, client=None):
+        response = (client or self.client).get('/api/expenses/search/', {'q': q})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [expense['description'] for expense in response.data]
+
+    def add(self, description, user=None):
+        return Expense.objects.create(
+            user=user or self.user, amount=Decimal('4.00'), description=description, date=date(2024, 6, 1)
+        )
+
+    def test_every_word_matches_and_the_last_as_a_prefix(self):
+        self.add('Coffee at the station')
+        self.add('Coffee beans')
+        self.assertEqual(sorted(self.search('cof')), ['Coffee at the station', 'Coffee beans'])
+        self.assertEqual(self.search('coffee stat'), ['Coffee at the station'])
+        self.assertEqual(self.search('coffee STATIONS'), [])
+        self.add('Café crème')
+        self.assertEqual(self.search('cafe CREME'), ['Café crème'])
+        self.assertEqual(self.search('tea'), [])
+
+    def test_ranked_by_relevance(self):
+        self.add('Taxi to the airport, with a long wait in traffic')
+        self.add('Taxi taxi')
+        self.assertEqual(self.search('taxi')[0], 'Taxi taxi')
+
+    def test_limited_to_requesting_user(self):
+        self.add('Concert tickets', user=self.other_user)
+        self.assertEqual(self.search('concert'), [])
+        self.assertEqual(self.search('concert', client=self.client_for(self.other_user)), ['Concert tickets'])
+
+    def test_index_follows_writes(self):
+        expense = self.add('Gym membership')
+        self.client.patch('/api/expenses/bulk/', [{'id': expense.pk, 'description': 'Swimming pool'}], format='json')
+        self.assertEqual(self.search('gym'), [])
+        self.assertEqual(self.search('swim'), ['Swimming pool'])
+        self.client.post('/api/expenses/bulk/', [
+            {'amount': '3.00', 'description': 'Swim cap', 'date': '2024-06-02'}
+        ], format='json')
+        self.assertEqual(len(self.search('swim')), 2)
+        expense.delete()
+        self.assertEqual(self.search('swim'), ['Swim cap'])
+
+    def test_query_needs_a_word(self):
+        response = self.client.get('/api/expenses/search/', {'q': '"*()'})
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL drops accents with unaccent()')
+class PostgreSQLSearchTests(ExpenseSearchTests):
+    def test_accents_are_dropped_on_both_sides(self):
+        self.add('Café crème')
+        self.add('Cafe latte')
+        self.add('Smørrebrød')
+        self.assertEqual(sorted(self.search('café')), ['Cafe latte', 'Café crème'])
+        self.assertEqual(sorted(self.search('CAFE')), ['Cafe latte', 'Café crème'])
+        self.assertEqual(self.search('smørre'), ['Smørrebrød'])
+        self.assertEqual(self.search('smorrebrod'), ['Smørrebrød'])
+        self.assertEqual(missing_objects(), set())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite rebuilds the table, and drops its triggers, on AlterField')
+class SearchIndexMigrationTests(TransactionTestCase):
+    def alter_description(self, field):
+        old = Expense._meta.get_field('description')
+        field.set_attributes_from_name('description')
+        field.model = Expense
+        with connection.schema_editor() as schema_editor:
+            schema_editor.alter_field(Expense, old, field)
+        self.addCleanup(self.restore_description, field)
+
+    def restore_description(self, field):
+        with connection.schema_editor() as schema_editor:
+            schema_editor.alter_field(Expense, field, Expense._meta.get_field('description'))
+        ensure_installed()
+
+    def test_migrate_reinstalls_dropped_triggers(self):
+        user = User.objects.create_user('alice', password='correct-horse-battery')
+        Expense.objects.create(user=user, amount=Decimal('4.00'), description='Gym membership', date=date(2024, 6, 1))
+        self.assertEqual(missing_objects(), set())
+
+        self.alter_description(models.CharField(max_length=1000))
+        self.assertEqual(missing_objects(), FTS_TRIGGERS)
+        Expense.objects.create(user=user, amount=Decimal('5.00'), description='Gym towel', date=date(2024, 6, 2))
+
+        call_command('migrate', verbosity=0, interactive=False)
+        self.assertEqual(missing_objects(), set())
+        # Rows written while the triggers were missing were indexed too.
+        found = search_expenses(Expense.objects.all(), user.pk, ['gym'], 5)
+        self.assertEqual(sorted(expense.description for expense in found), ['Gym membership', 'Gym towel'])
+        Expense.objects.create(user=user, amount=Decimal('6.00'), description='Gym shoes', date=date(2024, 6, 3))
+        self.assertEqual(len(search_expenses(Expense.objects.all(), user.pk, ['gym'], 5)), 3)
+
+        # Nothing to do when everything is in place.
+        self.assertEqual(ensure_installed(), set())
@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from expenses.models import Category
+from expenses.seeding import DEFAULT_CATEGORIES, seed_default_categories
+
+
+class SeedDefaultCategoriesTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+
+    def names(self, user):
+        return set(Category.objects.filter(user=user).values_list('name', flat=True))
+
+    def test_seeds_missing_categories_only(self):
+        Category.objects.create(user=self.alice, name='Travel')
+        Category.objects.create(user=self.alice, name='Pets')
+
+        with self.assertNumQueries(4):  # read, savepoint, insert, release
+            created = seed_default_categories([self.alice.pk, self.bob.pk])
+
+        self.assertEqual(created, 2 * len(DEFAULT_CATEGORIES) - 1)
+        self.assertEqual(self.names(self.alice), set(DEFAULT_CATEGORIES) | {'Pets'})
+        self.assertEqual(self.names(self.bob), set(DEFAULT_CATEGORIES))
+        self.assertEqual(seed_default_categories([self.alice.pk, self.bob.pk]), 0)
+
+    def test_conflicts_are_ignored_without_checking(self):
+        Category.objects.create(user=self.alice, name='Travel')
+        seed_default_categories([self.alice.pk], check_existing=False)
+        self.assertEqual(self.names(self.alice), set(DEFAULT_CATEGORIES))
+
+    def test_registration_seeds_defaults(self):
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'carol',
+            'password': 'correct-horse-battery',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.names(User.objects.get(username='carol')), set(DEFAULT_CATEGORIES))
+
+    def test_backfill_command(self):
+        Category.objects.create(user=self.bob, name='Others')
+        out = StringIO()
+        call_command('backfill_default_categories', batch_size=1, stdout=out)
+        self.assertIn(f'Created {2 * len(DEFAULT_CATEGORIES) - 1} default categories for 2 users', out.getvalue())
+        self.assertEqual(self.names(self.alice), set(DEFAULT_CATEGORIES))
+        self.assertEqual(self.names(self.bob), set(DEFAULT_CATEGORIES))
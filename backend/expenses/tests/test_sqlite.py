@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from expense_tracker.sqlite import begin_immediate, pragmas
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite profile')
+class SQLiteProfileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'expenses.sqlite3')
+
+    def connect(self):
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': self.path}, alias='sqlite-profile')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def other_writer_blocked(self):
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError as exc:
+            self.assertIn('locked', str(exc))
+            return True
+        finally:
+            other.close()
+        return False
+
+    @override_settings(SQLITE_TUNED=True, SQLITE_MMAP_SIZE=1 << 20, SQLITE_CACHE_KB=4096, SQLITE_BUSY_TIMEOUT_MS=2500)
+    def test_tuned_connections(self):
+        wrapper = self.connect()
+        self.assertEqual(
+            [self.pragma(wrapper, name) for name in ('journal_mode', 'synchronous', 'mmap_size', 'cache_size',
+                                                     'busy_timeout')],
+            ['wal', 1, 1 << 20, -4096, 2500]
+        )
+        self.assertEqual(wrapper.execute_wrappers.count(begin_immediate), 1)
+
+        # A transaction holds the write lock from its BEGIN.
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        self.assertTrue(self.other_writer_blocked())
+        wrapper.rollback()
+        wrapper.set_autocommit(True)
+        self.assertFalse(self.other_writer_blocked())
+
+    @override_settings(SQLITE_TUNED=False)
+    def test_untuned_connections(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertNotIn(begin_immediate, wrapper.execute_wrappers)
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        self.assertFalse(self.other_writer_blocked())
+        wrapper.rollback()
+        wrapper.set_autocommit(True)
+
+    def test_in_memory_databases_keep_their_journal(self):
+        self.assertFalse(any('journal_mode' in statement or 'mmap_size' in statement
+                             for statement in pragmas(in_memory=True)))
+        self.assertIn('PRAGMA journal_mode = WAL', pragmas())
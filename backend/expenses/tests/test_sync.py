@@ -0,0 +1,82 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import override_settings
+from django.utils import timezone
+
+from expenses.models import Expense, Tombstone
+from expenses.tests.base import ExpenseAPITestCase
+
+
+class DeltaSyncTests(ExpenseAPITestCase):
+    def sync(self, since=None):
+        """Follow every page of one sync; return the pages and the final token."""
+        pages, params = [], {'since': since} if since else {}
+        while True:
+            response = self.client.get('/api/expenses/changes/', params)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data)
+            params = {'since': response.data['next']}
+            if not response.data['has_more']:
+                return pages, response.data['next']
+
+    def test_full_sync_without_token(self):
+        pages, token = self.sync()
+        self.assertEqual(
+            {expense['id'] for expense in pages[-1]['expenses']},
+            set(Expense.objects.filter(user=self.user).values_list('pk', flat=True))
+        )
+        self.assertEqual(len(pages[-1]['categories']), 4)
+
+    @override_settings(EXPENSE_SYNC_PAGE_SIZE=5)
+    def test_pages_cover_rows_sharing_a_timestamp(self):
+        Expense.objects.filter(user=self.user).update(updated_at=timezone.now())
+        pages, token = self.sync()
+        ids = [expense['id'] for page in pages for expense in page['expenses']]
+        self.assertEqual(sorted(ids), sorted(Expense.objects.filter(user=self.user).values_list('pk', flat=True)))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(all(not page['categories'] for page in pages[:-1]))
+
+    def test_incremental_sync_returns_only_changes(self):
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(minutes=1)):
+            _, token = self.sync()
+            pages, token = self.sync(token)
+        self.assertEqual(pages[-1]['expenses'], [])
+        self.assertEqual(pages[-1]['deleted'], {'expenses': [], 'categories': []})
+
+        later = timezone.now() + timedelta(minutes=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            edited = self.any_expense()
+            self.client.patch(f'/api/expenses/{edited.pk}/', {'description': 'Edited'}, format='json')
+            removed = Expense.objects.filter(user=self.user).exclude(pk=edited.pk).first()
+            self.client.delete(f'/api/expenses/{removed.pk}/')
+            self.client.delete(f'/api/categories/{self.empty_category.pk}/')
+            pages, token = self.sync(token)
+
+        self.assertEqual([expense['id'] for expense in pages[-1]['expenses']], [edited.pk])
+        self.assertEqual(pages[-1]['deleted'], {'expenses': [removed.pk], 'categories': [self.empty_category.pk]})
+
+    def test_other_users_changes_are_not_included(self):
+        _, token = self.sync()
+        other = self.client_for(self.other_user)
+        other.post('/api/expenses/', {'amount': '1.00', 'description': 'Other', 'date': '2024-01-01'}, format='json')
+        pages, _ = self.sync(token)
+        self.assertNotIn('Other', [expense['description'] for expense in pages[-1]['expenses']])
+
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/expenses/changes/', {'since': 'nonsense'}).status_code, 400)
+        _, token = self.sync()
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=31)):
+            response = self.client.get('/api/expenses/changes/', {'since': token})
+        self.assertEqual(response.status_code, 410)
+        self.assertIn('sync again without one', response.json()['error'])
+
+    def test_prune_tombstones(self):
+        from django.core.management import CommandError, call_command
+        self.client.delete(f'/api/expenses/{self.any_expense().pk}/')
+        Tombstone.objects.create(user=self.user, kind=Tombstone.Kind.EXPENSE, object_id=1,
+                                 deleted_at=timezone.now() - timedelta(days=40))
+        call_command('prune_tombstones', verbosity=0, stdout=mock.MagicMock())
+        self.assertEqual(Tombstone.objects.count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('prune_tombstones', days=1, verbosity=0, stdout=mock.MagicMock())
@@ -1,11 +1,37 @@
 from rest_framework.routers import DefaultRouter
+from django.conf import settings
 from django.urls import path, include
+from . import async_views
 from .views import ExpenseViewSet, CategoryViewSet
 
 router = DefaultRouter()
 router.register(r'expenses', ExpenseViewSet, basename='expense')
 router.register(r'categories', CategoryViewSet, basename='category')
 
+# With SERVER_MODE=asgi, reads of these endpoints go to the async views
+# (see expenses.async_views); writes still go to the viewsets. Same names
+# as the router's routes, so metrics and reverse() see no difference.
+asgi_urlpatterns = [
+    path('expenses/', async_views.read_or_sync(
+        async_views.expense_list,
+        ExpenseViewSet.as_view({'get': 'list', 'post': 'create'}, basename='expense', detail=False)
+    ), name='expense-list'),
+    path('expenses/dashboard/', async_views.read_or_sync(
+        async_views.dashboard_stats,
+        ExpenseViewSet.as_view({'get': 'dashboard_stats'}, basename='expense', detail=False)
+    ), name='expense-dashboard-stats'),
+    path('categories/', async_views.read_or_sync(
+        async_views.category_list,
+        CategoryViewSet.as_view({'get': 'list', 'post': 'create'}, basename='category', detail=False)
+    ), name='category-list'),
+]
+
 urlpatterns = [
     path('', include(router.urls)),
+    # Async variants of the read endpoints, for ASGI (see expenses.async_views)
+    path('async/expenses/', async_views.expense_list, name='async-expense-list'),
+    path('async/expenses/dashboard/', async_views.dashboard_stats, name='async-expense-dashboard-stats'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
 ]
+if settings.SERVER_MODE == 'asgi':
+    urlpatterns = asgi_urlpatterns + urlpatterns
@@ -1,21 +1,39 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncMonth
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime
-from calendar import monthrange
-from .models import Expense, Category
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from .models import Expense, Category, ExpenseRollup
+from .bulk import bulk_create_expenses, bulk_update_expenses, check_batch_size
+from .cache import get_or_compute
+from .conditional import ConditionalListMixin
+from .exporters import CONTENT_TYPES, aiterate_blocks, stream_export
+from .filters import ExpenseFilterBackend
+from .importers import (
+    DATE_ORDERS, DEBITS_NEGATIVE, DEFAULT_DATE_ORDER, FORMATS, ImportRowError, StatementImporter, guess_format,
+    read_statement
+)
+from .pagination import ExpenseCursorPagination
+from .renderers import CSVRenderer, NDJSONRenderer
+from .representations import RepresentationReadMixin, expense_representation
+from .search import search_expenses, search_terms
 from .serializers import ExpenseSerializer, CategorySerializer, DashboardStatsSerializer
+from .sync import ExpiredToken, InvalidToken, changes_since
 import logging
 
 logger = logging.getLogger(__name__)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
+    conditional_include_expenses = False
 
     def get_queryset(self):
         return Category.objects.filter(user=self.request.user)
@@ -32,7 +50,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
                 headers=headers
             )
         except Exception as e:
-            logger.error(f"Error creating category: {str(e)}")
+            logger.error("Error creating category: %s", e)
             return Response(
                 {"error": str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -42,7 +60,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         try:
             return super().update(request, *args, **kwargs)
         except Exception as e:
-            logger.error(f"Error updating category: {str(e)}")
+            logger.error("Error updating category: %s", e)
             return Response(
                 {"error": str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -59,67 +77,253 @@ class CategoryViewSet(viewsets.ModelViewSet):
             instance.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
-            logger.error(f"Error deleting category: {str(e)}")
+            logger.error("Error deleting category: %s", e)
             return Response(
                 {"error": str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ConditionalListMixin, RepresentationReadMixin, viewsets.ModelViewSet):
     serializer_class = ExpenseSerializer
+    representation = expense_representation
     permission_classes = [IsAuthenticated]
+    pagination_class = ExpenseCursorPagination
+    filter_backends = [ExpenseFilterBackend]
 
     def get_queryset(self):
-        return Expense.objects.filter(user=self.request.user)
+        return Expense.objects.filter(user=self.request.user).select_related('category')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+    def bulk(self, request):
+        """
+        POST a list of expenses to create them all, or PATCH a list of
+        partial expenses (each with its ``id``) to update them all. Nothing
+        is written unless every item is valid; otherwise the response lists
+        the errors for each item, in order.
+        """
+        error = check_batch_size(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            expenses, errors = bulk_create_expenses(request, request.data)
+        else:
+            expenses, errors = bulk_update_expenses(request, request.data)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return Response(
+                {"created": len(expenses), "ids": [expense.pk for expense in expenses]},
+                status=status.HTTP_201_CREATED
+            )
+        return Response({"updated": len(expenses), "ids": [expense.pk for expense in expenses]})
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_statement(self, request):
+        """
+        Import a CSV, OFX or QIF statement uploaded as ``file``.
+
+        Dates such as 02/03/2024 are read in ``date_order`` ('dmy' or
+        'mdy'); QIF defaults to month-first, and without an order a CSV
+        row whose date reads both ways fails.
+
+        Rows are committed in chunks. If the import fails part way, the
+        response carries ``resume_from``: upload the same file again with
+        that value to continue after the last committed row.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        statement_format = request.data.get('format') or guess_format(upload.name)
+        if statement_format not in FORMATS:
+            return Response(
+                {"error": f"Unsupported format: {statement_format}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            resume_from = int(request.data.get('resume_from') or 0)
+        except ValueError:
+            return Response({"error": "resume_from must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        amount_sign = request.data.get('amount_sign') or (
+            'negative' if DEBITS_NEGATIVE[statement_format] else 'positive'
+        )
+        if amount_sign not in ('negative', 'positive'):
+            return Response(
+                {"error": "amount_sign must be 'negative' or 'positive'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        date_order = request.data.get('date_order') or DEFAULT_DATE_ORDER[statement_format]
+        if date_order is not None and date_order not in DATE_ORDERS:
+            return Response(
+                {"error": "date_order must be 'dmy' or 'mdy'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        importer = StatementImporter(
+            request.user,
+            create_categories=request.data.get('create_categories', '').lower() in ('true', '1', 'yes', 'on'),
+            debits_negative=amount_sign == 'negative',
+            date_order=date_order,
+        )
+        try:
+            stats = importer.run(read_statement(upload, statement_format), resume_from=resume_from)
+        except ImportRowError as e:
+            # The statement itself is unreadable from here on; what came
+            # before it is committed.
+            return Response(
+                {"error": str(e), "imported": importer.stats['imported'], "resume_from": importer.stats['rows']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error("Error importing statement: %s", e)
+            return Response(
+                {"error": "Import failed", "imported": importer.stats['imported'], "resume_from": importer.stats['rows']},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(
+            {**stats, "errors": importer.errors},
+            status=status.HTTP_201_CREATED if stats['imported'] else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream the user's expenses as CSV (the default) or NDJSON, chosen
+        with ``?format=`` or the Accept header. The list's filters apply;
+        rows always come newest first.
+        """
+        export_format = request.accepted_renderer.format
+        queryset = self.filter_queryset(Expense.objects.filter(user=request.user))
+        blocks = (
+            block.encode('utf-8') for block in stream_export(request.user, export_format, queryset=queryset)
+        )
+        if isinstance(request._request, ASGIRequest):
+            blocks = aiterate_blocks(blocks)
+        response = StreamingHttpResponse(blocks, content_type=CONTENT_TYPES[export_format])
+        filename = f"expenses-{timezone.now().date().isoformat()}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Ranked full-text search of the user's expense descriptions. Every
+        word of ``q`` must match, as a prefix; ``limit`` caps the results.
+        On SQLite only the newest EXPENSE_SEARCH_CANDIDATES matches are
+        ranked, so an older match can be missing even when it would rank
+        first; see expenses.search.
+        """
+        terms = search_terms(request.query_params.get('q'))
+        if not terms:
+            return Response({"error": "Enter a search term with q"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', settings.EXPENSE_SEARCH_LIMIT))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.EXPENSE_MAX_PAGE_SIZE))
+
+        expenses = search_expenses(self.get_queryset(), request.user.pk, terms, limit)
+        return Response(self.get_serializer(expenses, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request):
+        """
+        Expenses and categories created, updated or deleted since the sync
+        token in ``since`` (everything when it is omitted). Follow ``next``
+        while ``has_more`` is true and keep the last ``next`` for the
+        following sync; see expenses.sync. A token older than
+        EXPENSE_TOMBSTONE_RETENTION_DAYS gets 410 Gone: deletes since then
+        may be forgotten, so the client must replace its copy with a full
+        sync.
+        """
+        try:
+            page = changes_since(request.user, self.get_queryset(), request.query_params.get('since'))
+        except InvalidToken as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredToken as e:
+            return Response({"error": str(e)}, status=status.HTTP_410_GONE)
+        return Response({
+            "expenses": ExpenseSerializer(page['expenses'], many=True).data,
+            "categories": CategorySerializer(page['categories'], many=True).data,
+            "deleted": page['deleted'],
+            "has_more": page['has_more'],
+            "next": page['next'],
+        })
+
     @action(detail=False, methods=['get'], url_path='dashboard')
     def dashboard_stats(self, request):
         try:
-            # Get user's expenses
-            user_expenses = Expense.objects.filter(user=request.user)
-            
-            # Calculate total expenses
-            total_expenses = user_expenses.aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-
-            # Calculate this month's expenses
             now = timezone.now()
-            this_month_expenses = user_expenses.filter(
-                date__year=now.year,
-                date__month=now.month
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            # Get category-wise expenses
-            category_expenses = user_expenses.values('category__name').annotate(
-                total=Sum('amount')
-            ).order_by('-total')
-
-            # Get monthly trend (last 6 months)
-            monthly_trend = user_expenses.annotate(
-                month=TruncMonth('date')
-            ).values('month').annotate(
-                total=Sum('amount')
-            ).order_by('-month')[:6]
-
-            # Get recent expenses
-            recent_expenses = user_expenses.order_by('-date')[:5]
-
-            data = {
-                'total_expenses': total_expenses,
-                'monthly_expenses': this_month_expenses,
-                'category_expenses': category_expenses,
-                'monthly_trend': monthly_trend,
-                'recent_expenses': ExpenseSerializer(recent_expenses, many=True).data
-            }
-
-            return Response(data)
+            current_month = date(now.year, now.month, 1)
+            # Served from the per-user versioned cache; any Expense/Category
+            # write for this user changes the version, so hits are never stale.
+            data, hit = get_or_compute(
+                'dashboard',
+                request.user.pk,
+                lambda: self._dashboard_data(request.user, current_month),
+                vary=current_month.isoformat()
+            )
+            response = Response(data)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response
         except Exception as e:
-            logger.error(f"Error fetching dashboard stats: {str(e)}")
+            logger.error("Error fetching dashboard stats: %s", e)
             return Response(
                 {"error": "Failed to fetch dashboard statistics"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    def _dashboard_data(self, user, current_month):
+        return dashboard_data(
+            dashboard_rollups(user), list(recent_expenses(user)), current_month
+        )
+
+
+def dashboard_rollups(user):
+    # Totals come from the per-month/category rollups kept up to date by
+    # Expense writes, so the dashboard never scans the expense table.
+    return ExpenseRollup.objects.filter(user=user).values_list('month', 'category__name', 'total')
+
+
+def recent_expenses(user):
+    return expense_representation.rows(Expense.objects.filter(user=user).order_by('-date'))[:5]
+
+
+def dashboard_data(rollups, recent, current_month):
+    """The dashboard from the rows of dashboard_rollups() and recent_expenses()."""
+    total_expenses = 0
+    this_month_expenses = 0
+    by_category = defaultdict(Decimal)
+    by_month = defaultdict(Decimal)
+    for month, category_name, total in rollups:
+        total_expenses += total
+        if month == current_month:
+            this_month_expenses += total
+        by_category[category_name] += total
+        by_month[month] += total
+
+    # Get category-wise expenses
+    category_expenses = sorted(
+        ({'category__name': name, 'total': total} for name, total in by_category.items()),
+        key=lambda item: item['total'],
+        reverse=True
+    )
+
+    # Get monthly trend (last 6 months)
+    monthly_trend = [
+        {'month': month, 'total': by_month[month]}
+        for month in sorted(by_month, reverse=True)[:6]
+    ]
+
+    return {
+        'total_expenses': total_expenses,
+        'monthly_expenses': this_month_expenses,
+        'category_expenses': category_expenses,
+        'monthly_trend': monthly_trend,
+        'recent_expenses': expense_representation.many(recent)
+    }
@@ -0,0 +1,138 @@
+"""
+gunicorn settings, read from the working directory (backend/) at start.
+
+SERVER_MODE=wsgi, the default, serves expense_tracker.wsgi with sync
+workers: each worker handles one request at a time, including the time a
+slow client takes to send it. SERVER_MODE=asgi serves expense_tracker.asgi
+with uvicorn workers, which interleave many connections per process; the
+async read views (expenses.async_views) then wait on the database without
+holding a thread. Everything else gunicorn takes from its usual
+environment (PORT, WEB_CONCURRENCY, GUNICORN_CMD_ARGS).
+
+The deploy runs one service with one start command, so the master also
+runs ``manage.py process_outbox`` (see api.outbox) as a child process and
+restarts it if it exits; without it queued email, password reset OTPs
+included, is never sent. Set OUTBOX_WORKER=False where the worker runs as
+its own process (the Procfile's ``worker``). The master also runs
+``manage.py prune_tombstones`` once a day (TOMBSTONE_PRUNE_INTERVAL seconds), which
+keeps delta sync's deletion records (see expenses.sync) from growing for
+ever; set TOMBSTONE_PRUNER=False where cron runs it instead.
+
+Workers write their request metrics to METRICS_DIR, so that /metrics,
+which reaches one worker per scrape, reports all of them (see
+expense_tracker.metrics). Unless METRICS_DIR names a directory, each start
+makes a fresh one; an exited worker's file is deleted.
+"""
+import glob
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'expense_tracker.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'expense_tracker.wsgi:application'
+
+OUTBOX_RESTART_DELAY = 5
+TOMBSTONE_PRUNE_INTERVAL = int(os.getenv('TOMBSTONE_PRUNE_INTERVAL', 24 * 60 * 60))
+
+# Set before the workers are forked, so they all inherit it.
+if not os.getenv('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='expense-tracker-metrics-')
+
+
+class OutboxWorker(threading.Thread):
+    def __init__(self, log):
+        super().__init__(name='outbox-worker', daemon=True)
+        self.log = log
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.process = None
+
+    def run(self):
+        while True:
+            with self.lock:
+                if self.stopping.is_set():
+                    return
+                self.process = subprocess.Popen([sys.executable, 'manage.py', 'process_outbox'])
+            # The master may reap the child first, in which case the exit
+            # status is lost and reads as 0.
+            returncode = self.process.wait()
+            if self.stopping.wait(OUTBOX_RESTART_DELAY):
+                return
+            self.log.warning('process_outbox exited with status %s, restarting', returncode)
+
+    def stop(self, timeout=30):
+        with self.lock:
+            self.stopping.set()
+            process = self.process
+        if process is None or process.poll() is not None:
+            return
+        # SIGTERM lets it finish the batch in hand.
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class PeriodicCommand(threading.Thread):
+    """Runs ``manage.py <command>`` at start and then every ``interval`` seconds."""
+
+    def __init__(self, log, command, interval):
+        super().__init__(name=f'{command}-schedule', daemon=True)
+        self.log = log
+        self.command = command
+        self.interval = interval
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.is_set():
+            # As for the outbox worker, a failure may read as status 0.
+            returncode = subprocess.call([sys.executable, 'manage.py', self.command])
+            if returncode:
+                self.log.warning('%s exited with status %s', self.command, returncode)
+            if self.stopping.wait(self.interval):
+                return
+
+    def stop(self):
+        # A run in progress finishes on its own.
+        self.stopping.set()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def on_starting(server):
+    # Files an earlier run's workers left in a named METRICS_DIR.
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], 'metrics-*.json')):
+        _remove(path)
+
+
+def child_exit(server, worker):
+    _remove(os.path.join(os.environ['METRICS_DIR'], f'metrics-{worker.pid}.json'))
+
+
+def when_ready(server):
+    if os.getenv('OUTBOX_WORKER', 'True') == 'True':
+        server.outbox_worker = OutboxWorker(server.log)
+        server.outbox_worker.start()
+    if os.getenv('TOMBSTONE_PRUNER', 'True') == 'True':
+        server.tombstone_pruner = PeriodicCommand(server.log, 'prune_tombstones', TOMBSTONE_PRUNE_INTERVAL)
+        server.tombstone_pruner.start()
+
+
+def on_exit(server):
+    outbox_worker = getattr(server, 'outbox_worker', None)
+    if outbox_worker is not None:
+        outbox_worker.stop()
+    tombstone_pruner = getattr(server, 'tombstone_pruner', None)
+    if tombstone_pruner is not None:
+        tombstone_pruner.stop()
@@ -37,6 +37,8 @@ import { format } from 'date-fns';
 function ExpenseList() {
   const navigate = useNavigate();
   const [expenses, setExpenses] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [filters, setFilters] = useState({ month: '', category: '' });
   const [categories, setCategories] = useState([]);
   const [loading, setLoading] = useState(true);
   const [openSnackbar, setOpenSnackbar] = useState(false);
@@ -57,10 +59,25 @@ function ExpenseList() {
     headers: getAuthHeader(),
   });
 
-  const fetchExpenses = async () => {
+  // Filtering happens server side, so only the matching expenses are fetched.
+  const listUrl = () => {
+    const params = new URLSearchParams({ paginate: 'true' });
+    if (filters.month) params.set('month', filters.month);
+    if (filters.category === 'none') {
+      params.set('uncategorized', 'true');
+    } else if (filters.category) {
+      params.set('category', filters.category);
+    }
+    return `/expenses/?${params.toString()}`;
+  };
+
+  const fetchExpenses = async (url = listUrl(), append = false) => {
     try {
-      const response = await api.get('/expenses/');
-      setExpenses(response.data);
+      const response = await api.get(url);
+      // The list is cursor-paginated; `next` is an absolute URL.
+      const page = Array.isArray(response.data) ? response.data : response.data.results;
+      setExpenses((previous) => (append ? [...previous, ...page] : page));
+      setNextPage(Array.isArray(response.data) ? null : response.data.next);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching expenses:', error);
@@ -88,10 +105,20 @@ function ExpenseList() {
   };
 
   useEffect(() => {
-    fetchExpenses();
     fetchCategories();
   }, []);
 
+  useEffect(() => {
+    fetchExpenses();
+  }, [filters]);
+
+  const handleFilterChange = (field) => (event) => {
+    setFilters({
+      ...filters,
+      [field]: event.target.value,
+    });
+  };
+
   const handleDelete = async (id) => {
     try {
       await api.delete(`/expenses/${id}/`);
@@ -179,6 +206,33 @@ function ExpenseList() {
         Expenses
       </Typography>
 
+      <Box sx={{ display: 'flex', gap: 2, mb: { xs: 2, sm: 3 }, flexWrap: 'wrap' }}>
+        <TextField
+          label="Month"
+          type="month"
+          size="small"
+          value={filters.month}
+          onChange={handleFilterChange('month')}
+          InputLabelProps={{ shrink: true }}
+        />
+        <TextField
+          select
+          label="Category"
+          size="small"
+          value={filters.category}
+          onChange={handleFilterChange('category')}
+          sx={{ minWidth: 200 }}
+        >
+          <MenuItem value="">All categories</MenuItem>
+          <MenuItem value="none">Uncategorized</MenuItem>
+          {categories.map((category) => (
+            <MenuItem key={category.id} value={category.id}>
+              {category.name}
+            </MenuItem>
+          ))}
+        </TextField>
+      </Box>
+
       <Paper 
         elevation={1}
         sx={{ 
@@ -349,6 +403,14 @@ function ExpenseList() {
         </Box>
       </Paper>
 
+      {nextPage && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+          <Button variant="outlined" onClick={() => fetchExpenses(nextPage, true)}>
+            Load more
+          </Button>
+        </Box>
+      )}
+
       <Dialog 
         open={editDialogOpen} 
         onClose={() => setEditDialogOpen(false)}